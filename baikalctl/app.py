@@ -1,52 +1,95 @@
+import json
 import logging
 import os
 import signal
-from contextlib import asynccontextmanager
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import copy_context
+from functools import partial
+from typing import Dict, Iterable, Iterator, List, Literal, Tuple
 
 import arrow
-from fastapi import BackgroundTasks, Depends, FastAPI, Header, HTTPException, Request
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    FastAPI,
+    Header,
+    HTTPException,
+    Request,
+)
+from fastapi.encoders import jsonable_encoder
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from pydantic import BaseModel
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from typing_extensions import Annotated
 
-from . import settings
-from .browser import BrowserException, Session
+from . import reconcile, settings, tracing
+from .browser import BrowserException, SessionConfig
+from .cache import ReadCache, SingleFlight, account_key
+from .dav import DavClient
+from .jobs import JobQueue
+from .lifecycle import DriverManager
+from .metrics import (
+    POOL_CHECKED_OUT,
+    POOL_WAITING,
+    REGISTRY,
+    REQUEST_SECONDS,
+    REQUESTS_IN_FLIGHT,
+)
 from .models import (
     Account,
     AddBookRequest,
     AddBookResponse,
     AddUserRequest,
     AddUserResponse,
+    BatchResponse,
+    BatchResult,
+    Book,
+    BookBatchRequest,
     BooksResponse,
     DeleteBookRequest,
     DeleteBookResponse,
     DeleteUserRequest,
     DeleteUserResponse,
+    DesiredState,
+    HealthResponse,
     InitializeResponse,
+    JobResponse,
+    ReadyResponse,
+    ReconcileResponse,
     ResetResponse,
     ShutdownResponse,
     StatusResponse,
+    TracesResponse,
     UptimeResponse,
+    UserBatchRequest,
     UsersResponse,
 )
+from .pool import BACKENDS, SessionPool
 from .version import __version__
 
 log = logging.getLogger("uvicorn")
 
 
 async def read_security_headers(
+    request: Request,
     x_admin_username: Annotated[str, Header()],
     x_admin_password: Annotated[str, Header()],
     x_api_key: Annotated[str, Header()],
 ):
-    if x_api_key != app.state.session.api_key:
+    if x_api_key != app.state.pool.api_key:
         raise HTTPException(status_code=401, detail="invalid API key")
     if not x_admin_username:
         raise HTTPException(status_code=401, detail="invalid username")
     if not x_admin_password:
         raise HTTPException(status_code=401, detail="missing password")
-    app.state.account = Account(username=x_admin_username, password=x_admin_password)
+    request.state.account = Account(username=x_admin_username, password=x_admin_password)
 
 
 @asynccontextmanager
@@ -54,13 +97,155 @@ async def lifespan(app: FastAPI):
     log.setLevel(settings.LOG_LEVEL)
     log.info(f"baikalctl v{__version__} startup")
     app.state.startup_time = arrow.now()
-    app.state.session = Session()
+    app.state.pool = SessionPool(
+        settings.POOL_SIZE, timeout=settings.POOL_TIMEOUT, factory=BACKENDS[settings.BACKEND], logger=log
+    )
+    pool = app.state.pool
+    POOL_CHECKED_OUT.set_function(lambda: pool.size - len(pool.idle))
+    POOL_WAITING.set_function(lambda: pool.waiting)
+    app.state.traces = tracing.TraceBuffer(settings.TRACE_BUFFER) if settings.TRACING else None
+    app.state.cache = ReadCache(settings.CACHE_TTL, settings.CACHE_SIZE)
+    app.state.flights = SingleFlight()
+    app.state.dav = None
+    if settings.DAV_BOOKS:
+        config = SessionConfig()
+        app.state.dav = DavClient(
+            config.url,
+            settings.DAV_USERNAME,
+            settings.DAV_PASSWORD,
+            cert=config.cert,
+            key=config.key,
+            auth=settings.DAV_AUTH,
+            count_contacts=settings.DAV_COUNT_CONTACTS,
+            pool_size=settings.POOL_SIZE,
+            logger=log,
+        )
+    app.state.jobs = None
+    if settings.JOBS:
+        app.state.jobs = JobQueue(
+            settings.JOBS_DB, workers=settings.JOB_WORKERS, retention=settings.JOB_RETENTION, logger=log
+        )
+        app.state.jobs.start(run_job)
+    app.state.lifecycle = None
+    if settings.LIFECYCLE_INTERVAL > 0:
+        app.state.lifecycle = DriverManager(
+            app.state.pool,
+            interval=settings.LIFECYCLE_INTERVAL,
+            max_rss_mb=settings.RECYCLE_MAX_RSS_MB,
+            max_ops=settings.RECYCLE_MAX_OPS,
+            ping_timeout=settings.PING_TIMEOUT,
+            logger=log,
+        )
+        app.state.lifecycle.start()
+    # account key: (monotonic time, session status) served by /status/
+    app.state.status = {}
+    app.state.ready = threading.Event()
+    app.state.warmup_error = None
+    threading.Thread(target=warm_up, name="warmup", daemon=True).start()
     yield
     log.info("shutdown")
-    app.state.session.shutdown()
+    if app.state.jobs:
+        app.state.jobs.shutdown()
+    if app.state.lifecycle:
+        app.state.lifecycle.shutdown()
+    app.state.pool.shutdown()
+    if app.state.dav:
+        app.state.dav.shutdown()
+
+
+def warm_up():
+    """launch the pooled browsers, and log them in when a warm-up account is configured, then report ready"""
+    try:
+        if settings.PREWARM:
+            admin = None
+            if settings.WARMUP_USERNAME:
+                admin = Account(username=settings.WARMUP_USERNAME, password=settings.WARMUP_PASSWORD)
+            app.state.pool.warm(admin)
+        app.state.ready.set()
+    except Exception as ex:
+        log.error(f"warm-up failed: {repr(ex)}")
+        app.state.warmup_error = f"{ex.__class__.__name__}: {' '.join(map(str, ex.args))}"
+
+
+app = FastAPI(lifespan=lifespan)
+
+# endpoints that act on baikal require the admin and API key headers; probes such as /ready/ do not
+api = APIRouter(dependencies=[Depends(read_security_headers)])
 
 
-app = FastAPI(dependencies=[Depends(read_security_headers)], lifespan=lifespan)
+@app.middleware("http")
+async def measure_request(request: Request, call_next):
+    """time each request until its body has been sent, so streamed NDJSON bodies are measured in full"""
+    REQUESTS_IN_FLIGHT.inc()
+    start = time.perf_counter()
+
+    def observe(status: int):
+        REQUESTS_IN_FLIGHT.dec()
+        # label by route template so path parameters do not create a series per username
+        route = request.scope.get("route")
+        endpoint = route.path if route else "unmatched"
+        REQUEST_SECONDS.labels(request.method, endpoint, str(status)).observe(time.perf_counter() - start)
+
+    try:
+        response = await call_next(request)
+    except BaseException:
+        observe(500)
+        raise
+    body = response.body_iterator
+
+    async def measured_body():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            observe(response.status_code)
+
+    response.body_iterator = measured_body()
+    return response
+
+
+# polled endpoints that would flush the trace buffer
+UNTRACED = ["/metrics", "/health/", "/ready/", "/traces/"]
+
+
+def store_trace(request: Request, trace: tracing.Trace, status: int):
+    route = request.scope.get("route")
+    if route:
+        trace.root.name = f"{request.method} {route.path}"
+    trace.finish(status=status)
+    app.state.traces.add(trace)
+
+
+@app.middleware("http")
+async def trace_request(request: Request, call_next):
+    """record a trace of the session steps behind each request, summarized in a Server-Timing header
+
+    the trace is stored once the body has been sent, so the steps of a streamed NDJSON body are included;
+    the Server-Timing header, sent ahead of the body, covers only the steps up to the first row
+    """
+    if not app.state.traces or any(request.url.path.startswith(path) for path in UNTRACED):
+        return await call_next(request)
+    trace = tracing.start(f"{request.method} {request.url.path}", method=request.method, path=request.url.path)
+    try:
+        response = await call_next(request)
+    except BaseException:
+        store_trace(request, trace, 500)
+        raise
+    finally:
+        tracing.detach(trace)
+    response.headers["Server-Timing"] = trace.server_timing()
+    response.headers["X-Trace-Id"] = trace.id
+    body = response.body_iterator
+
+    async def traced_body():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            store_trace(request, trace, response.status_code)
+
+    response.body_iterator = traced_body()
+    return response
 
 
 @app.exception_handler(BrowserException)
@@ -87,68 +272,376 @@ async def validation_exception_handler(request, exc):
     return PlainTextResponse(str(exc), status_code=400)
 
 
-@app.middleware("http")
-async def logout_after_request(request: Request, call_next):
-    response = await call_next(request)
-    app.state.session.logout()
-    return response
+@contextmanager
+def session(account=None):
+    """check out a pooled browser session for the duration of a request
+
+    sessions stay logged in between requests; the pool prefers one already logged in as account
+    """
+    with app.state.pool.session(account=account) as session:
+        yield session
+
+
+def cached_read(key, account, read, refresh=False):
+    """serve a read from the cache, sharing one execution among identical concurrent misses
+
+    a refresh must observe the server after it was requested, so it never joins a read already in flight
+    """
+    if not refresh:
+        read = partial(app.state.flights.do, (key, account_key(account)), read)
+    return app.state.cache.get(key, account, read, refresh)
+
+
+def read_users(account, refresh=False):
+    def read():
+        with session(account) as s:
+            return s.users(account)
+
+    return cached_read(("users",), account, read, refresh)
+
+
+def read_books(account, username, href=None, refresh=False):
+    """list a user's address books with CardDAV when enabled, else through the session
+
+    href is the user's address book page from book_links, which skips the users page lookup
+    """
+
+    def read():
+        with session(account) as s:
+            if app.state.dav:
+                # the admin login still gates the request; it is free when the session is already logged in
+                s.login(account)
+                return app.state.dav.books(username)
+            if href:
+                return s.books_at(account, username, href)
+            return s.books(account, username)
 
+    return cached_read(("books", username), account, read, refresh)
 
-@app.get("/status/")
-async def get_status() -> StatusResponse:
-    return StatusResponse(request="status", status=app.state.session.status(app.state.account))
 
+def iter_books(account, refresh=False) -> Iterator[Tuple[str, List[Book]]]:
+    """yield (username, address books) for every user in listing order, as the concurrent book page loads complete
 
-@app.post("/reset/")
-async def post_reset() -> ResetResponse:
-    return app.state.session.reset(app.state.account)
+    each worker checks out its own pooled session, so the effective fan-out is bounded by the pool size;
+    closing the iterator early cancels the book pages not yet started
+    """
+    if app.state.dav:
+        links = {user.username: None for user in read_users(account, refresh)}
+    else:
+        with session(account) as s:
+            links = s.book_links(account)
+    fanout = max(1, min(settings.BOOKS_FANOUT, len(links)))
+    # each worker runs in a copy of the request's context so its steps join the request trace
+    contexts = {username: copy_context() for username in links}
+    executor = ThreadPoolExecutor(max_workers=fanout, thread_name_prefix="crawl")
+    try:
+        results = executor.map(
+            lambda username: contexts[username].run(read_books, account, username, links[username], refresh), links
+        )
+        yield from zip(links, results)
+    finally:
+        executor.shutdown(cancel_futures=True)
 
 
-@app.post("/initialize/")
-async def post_initialize() -> InitializeResponse:
-    return app.state.session.initialize(app.state.account)
+def crawl_books(account, refresh=False) -> Dict[str, List[Book]]:
+    """map every user to its address books, loading the users page once and the book pages concurrently"""
+    return dict(iter_books(account, refresh))
 
 
-@app.get("/users/")
-async def get_users() -> UsersResponse:
-    return UsersResponse(users=app.state.session.users(app.state.account))
+NDJSON = "application/x-ndjson"
 
+# list endpoints answer with one JSON document, or with one row per line when asked for NDJSON
+LIST_RESPONSES = {200: {"content": {NDJSON: {}}}}
 
-@app.post("/user/")
-async def post_user(request: AddUserRequest) -> AddUserResponse:
-    return AddUserResponse(user=app.state.session.add_user(app.state.account, request))
 
+def wants_ndjson(request: Request, format: str) -> bool:
+    return format == "ndjson" or NDJSON in request.headers.get("accept", "")
 
-@app.delete("/user/")
-async def delete_user(request: DeleteUserRequest) -> DeleteUserResponse:
-    return app.state.session.delete_user(app.state.account, request)
 
+def gzip_lines(lines: Iterable[str]) -> Iterator[bytes]:
+    # a sync flush after each line lets the client decompress every row as soon as it arrives
+    compressor = zlib.compressobj(wbits=31)
+    for line in lines:
+        yield compressor.compress(line.encode()) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
 
-@app.get("/books/")
-async def get_addressbooks_all() -> BooksResponse:
-    users = app.state.session.users(app.state.account)
-    books = []
-    for user in users:
-        books.extend(app.state.session.books(app.state.account, user.username))
+
+def ndjson_response(request: Request, rows: Iterable[BaseModel]) -> StreamingResponse:
+    """stream rows as newline-delimited JSON while they are produced, gzipped when the client accepts it
+
+    the first row is produced before responding, so a failure to log in or load the first page is answered
+    with the usual error status; a later failure ends the stream with an error object line
+    """
+    rows = iter(rows)
+    first = next(rows, None)
+
+    def lines():
+        try:
+            if first is not None:
+                yield first.model_dump_json() + "\n"
+            for row in rows:
+                yield row.model_dump_json() + "\n"
+        except Exception as ex:
+            log.warning(f"{request.method} {request.url.path} stream failed: {repr(ex)}")
+            error = dict(
+                success=False,
+                request=f"{request.method} {request.url.path}",
+                message=ex.__class__.__name__,
+                detail=" ".join(map(str, ex.args)),
+            )
+            yield json.dumps(error) + "\n"
+
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        return StreamingResponse(gzip_lines(lines()), media_type=NDJSON, headers={"Content-Encoding": "gzip"})
+    return StreamingResponse(lines(), media_type=NDJSON)
+
+
+def add_user(s, account, user):
+    return dict(message="user added", user=s.add_user(account, user))
+
+
+def add_book(s, account, book):
+    book = s.add_book(account, book)
+    return dict(message="address book added", token=book.token, book=book)
+
+
+# mutation name: (request model, operation returning the response fields)
+MUTATIONS = dict(
+    add_user=(AddUserRequest, add_user),
+    delete_user=(DeleteUserRequest, lambda s, account, user: s.delete_user(account, user)),
+    add_book=(AddBookRequest, add_book),
+    delete_book=(DeleteBookRequest, lambda s, account, book: s.delete_book(account, book)),
+)
+
+
+def invalidate(action, item):
+    keys = [("books", item.username)]
+    if action.endswith("_user"):
+        keys.append(("users",))
+    app.state.cache.invalidate(*keys)
+
+
+def mutate(s, account, action, item):
+    try:
+        return MUTATIONS[action][1](s, account, item)
+    finally:
+        invalidate(action, item)
+
+
+def run_mutation(account, action, item, response):
+    """run a mutation on a pooled session, or queue it and answer 202 with the job when the job queue is enabled"""
+    if app.state.jobs:
+        job = app.state.jobs.submit(action, item.model_dump(), account)
+        content = JobResponse(request=action.replace("_", " "), message="job queued", job=job)
+        return JSONResponse(status_code=202, content=jsonable_encoder(content))
+    with session(account) as s:
+        return response(**mutate(s, account, action, item))
+
+
+def run_job(action, payload, account):
+    model, _ = MUTATIONS[action]
+    with session(account) as s:
+        return jsonable_encoder(mutate(s, account, action, model(**payload)))
+
+
+def run_batch(name, account, items):
+    """run (label, action, request) items under one pooled session and login
+
+    a failed item is reported in its result and does not stop the rest of the batch
+    """
+    results = []
+    with session(account) as s:
+        s.login(account)
+        for label, action, item in items:
+            result = dict(action=label, username=item.username, token=getattr(item, "token", None))
+            try:
+                result.update(mutate(s, account, action, item))
+                result["success"] = True
+            except Exception as ex:
+                log.warning(f"{name}: {label} {item.username} failed: {repr(ex)}")
+                result.update(success=False, message=ex.__class__.__name__, detail=" ".join(map(str, ex.args)))
+            results.append(BatchResult(**result))
+    return BatchResponse(request=name, failed=len([r for r in results if not r.success]), results=results)
+
+
+def session_status(account, refresh=False):
+    """return (age, status) of a session's status, refreshing it in the background once older than STATUS_TTL
+
+    the status logs in, so only the first request, or one with refresh set, waits for it
+    """
+    key = account_key(account)
+
+    def read():
+        with session(account) as s:
+            app.state.status[key] = (time.monotonic(), s.status(account))
+        return app.state.status[key]
+
+    def update():
+        try:
+            app.state.flights.do(("status", key), read)
+        except Exception as ex:
+            log.warning(f"status refresh failed: {repr(ex)}")
+
+    current = app.state.status.get(key)
+    if current is None or refresh:
+        current = app.state.flights.do(("status", key), read)
+    elif time.monotonic() - current[0] > settings.STATUS_TTL:
+        threading.Thread(target=update, name="status", daemon=True).start()
+    sampled, status = current
+    return time.monotonic() - sampled, dict(status)
+
+
+# endpoints using the browser are sync so they run in the threadpool, one pooled session each
+
+
+@api.get("/status/")
+def get_status(request: Request, refresh: bool = False) -> StatusResponse:
+    """server status; the session fields were sampled age seconds ago, the pool, cache and queue fields are live"""
+    age, status = session_status(request.state.account, refresh)
+    status["age"] = round(age, 3)
+    status["pool"] = app.state.pool.status()
+    status["cache"] = app.state.cache.status()
+    status["singleflight"] = app.state.flights.status()
+    if app.state.jobs:
+        status["jobs"] = app.state.jobs.status()
+    if app.state.lifecycle:
+        status["lifecycle"] = app.state.lifecycle.status()
+    return StatusResponse(request="status", status=status)
+
+
+@api.post("/reset/")
+def post_reset(request: Request) -> ResetResponse:
+    try:
+        return app.state.pool.reset(request.state.account)
+    finally:
+        app.state.cache.clear()
+        app.state.status.clear()
+
+
+@api.post("/initialize/")
+def post_initialize(request: Request) -> InitializeResponse:
+    try:
+        with session(request.state.account) as s:
+            return s.initialize(request.state.account)
+    finally:
+        app.state.cache.clear()
+        app.state.status.clear()
+
+
+@api.get("/users/", responses=LIST_RESPONSES)
+def get_users(request: Request, format: Literal["json", "ndjson"] = "json") -> UsersResponse:
+    """all users; as NDJSON, one user per line
+
+    the listing is read in full before streaming, so the pooled session is back in the pool while the body is sent
+    """
+    users = read_users(request.state.account)
+    if wants_ndjson(request, format):
+        return ndjson_response(request, users)
+    return UsersResponse(users=users)
+
+
+@api.post("/user/", responses={202: {"model": JobResponse}})
+def post_user(request: Request, user: AddUserRequest) -> AddUserResponse:
+    return run_mutation(request.state.account, "add_user", user, AddUserResponse)
+
+
+@api.delete("/user/", responses={202: {"model": JobResponse}})
+def delete_user(request: Request, user: DeleteUserRequest) -> DeleteUserResponse:
+    return run_mutation(request.state.account, "delete_user", user, DeleteUserResponse)
+
+
+@api.post("/users/batch/")
+def post_users_batch(request: Request, batch: UserBatchRequest) -> BatchResponse:
+    """delete then add users; deletes run first so a batch can replace an account"""
+    items = [("delete", "delete_user", item) for item in batch.delete]
+    items += [("add", "add_user", item) for item in batch.add]
+    return run_batch("batch users", request.state.account, items)
+
+
+@api.get("/books/", responses=LIST_RESPONSES)
+def get_addressbooks_all(request: Request, format: Literal["json", "ndjson"] = "json") -> BooksResponse:
+    """every user's address books; as NDJSON, each user's books are sent as soon as their page is read"""
+    books = iter_books(request.state.account)
+    if wants_ndjson(request, format):
+        return ndjson_response(request, (book for _, user_books in books for book in user_books))
+    return BooksResponse(books=[book for _, user_books in books for book in user_books])
+
+
+@api.get("/books/{username}/", responses=LIST_RESPONSES)
+def get_addressbooks_user(request: Request, username: str, format: Literal["json", "ndjson"] = "json") -> BooksResponse:
+    books = read_books(request.state.account, username)
+    if wants_ndjson(request, format):
+        return ndjson_response(request, books)
     return BooksResponse(books=books)
 
 
-@app.get("/books/{username}/")
-async def get_addressbooks_user(username: str) -> BooksResponse:
-    return BooksResponse(books=app.state.session.books(app.state.account, username))
+@api.post("/book/", responses={202: {"model": JobResponse}})
+def post_address_book(request: Request, book: AddBookRequest) -> AddBookResponse:
+    return run_mutation(request.state.account, "add_book", book, AddBookResponse)
+
+
+@api.post("/books/batch/")
+def post_books_batch(request: Request, batch: BookBatchRequest) -> BatchResponse:
+    """delete then add address books; deletes run first so a batch can replace a book"""
+    items = [("delete", "delete_book", item) for item in batch.delete]
+    items += [("add", "add_book", item) for item in batch.add]
+    return run_batch("batch address books", request.state.account, items)
+
+
+@api.delete("/book/", responses={202: {"model": JobResponse}})
+def delete_book(request: Request, book: DeleteBookRequest) -> DeleteBookResponse:
+    return run_mutation(request.state.account, "delete_book", book, DeleteBookResponse)
+
 
+@api.get("/jobs/{id}/")
+def get_job(id: str, wait: float = 0) -> JobResponse:
+    """job state and timings; wait blocks up to that many seconds for the job to finish"""
+    if not app.state.jobs:
+        raise HTTPException(status_code=404, detail="job queue disabled")
+    job = app.state.jobs.wait(id, min(wait, settings.POOL_TIMEOUT)) if wait > 0 else app.state.jobs.get(id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"job not found: {id}")
+    return JobResponse(job=job)
 
-@app.post("/book/")
-async def post_address_book(request: AddBookRequest) -> AddBookResponse:
-    return AddBookResponse(book=app.state.session.add_book(app.state.account, request))
 
+@api.get("/traces/")
+def get_traces() -> TracesResponse:
+    """summaries of the most recent request traces, newest first"""
+    if not app.state.traces:
+        raise HTTPException(status_code=404, detail="tracing disabled")
+    return TracesResponse(traces=[trace.summary() for trace in app.state.traces.list()])
 
-@app.delete("/book/")
-async def delete_book(request: DeleteBookRequest) -> DeleteBookResponse:
-    return app.state.session.delete_book(app.state.account, request)
 
+@api.get("/traces/{id}/")
+def get_trace(id: str, format: Literal["chrome", "otlp"] = "chrome"):
+    """one trace as Chrome trace event JSON or as an OTLP/JSON export request"""
+    trace = app.state.traces.get(id) if app.state.traces else None
+    if trace is None:
+        raise HTTPException(status_code=404, detail=f"trace not found: {id}")
+    return trace.chrome() if format == "chrome" else trace.otlp()
 
-@app.post("/shutdown/")
+
+@api.post("/reconcile/")
+def post_reconcile(request: Request, state: DesiredState, dry_run: bool = False) -> ReconcileResponse:
+    """converge the server to a desired state with the fewest adds and deletes, from one fresh listing pass"""
+    account = request.state.account
+    current = crawl_books(account, refresh=True)
+    steps = reconcile.plan(state, current)
+    response = ReconcileResponse(
+        dry_run=dry_run,
+        operations=len(steps),
+        estimated_page_loads=reconcile.estimate_page_loads(steps, len(current)),
+        plan=reconcile.describe(steps),
+    )
+    if dry_run or not steps:
+        return response
+    batch = run_batch("reconcile", account, [(action, action, item) for action, item in steps])
+    response.results = batch.results
+    response.failed = batch.failed
+    return response
+
+
+@api.post("/shutdown/")
 async def shutdown(background_tasks: BackgroundTasks) -> ShutdownResponse:
     log.warning("received shutdown request")
     background_tasks.add_task(shutdown_app)
@@ -160,6 +653,49 @@ def shutdown_app():
     os.kill(os.getpid(), signal.SIGINT)
 
 
-@app.get("/uptime/")
+@api.get("/uptime/")
 async def uptime() -> UptimeResponse:
     return dict(message="started " + app.state.startup_time.humanize(arrow.now()))
+
+
+@app.get("/ready/", responses={503: {"model": ReadyResponse}})
+async def ready() -> ReadyResponse:
+    """readiness probe: 503 until the session pool has warmed up"""
+    if app.state.ready.is_set():
+        return ReadyResponse(ready=True, message="ready")
+    response = ReadyResponse(
+        success=False,
+        ready=False,
+        message="warm-up failed" if app.state.warmup_error else "warming up",
+        detail=app.state.warmup_error or "",
+    )
+    return JSONResponse(status_code=503, content=response.model_dump())
+
+
+@app.get("/health/", responses={503: {"model": HealthResponse}})
+async def health() -> HealthResponse:
+    """liveness from in-memory state, cheap enough to poll: never checks out a session or touches a browser
+
+    unhealthy, with 503, when warm-up failed or a started driver has exited
+    """
+    health = app.state.pool.health()
+    health["ready"] = app.state.ready.is_set()
+    health["warmup_error"] = app.state.warmup_error
+    health["queue_depth"] = app.state.jobs.depth() if app.state.jobs else 0
+    if app.state.lifecycle:
+        health["recycles"] = dict(app.state.lifecycle.recycles)
+    healthy = not app.state.warmup_error and all(s["alive"] is not False for s in health["sessions"])
+    response = HealthResponse(healthy=healthy, message="healthy" if healthy else "unhealthy", health=health)
+    if healthy:
+        return response
+    response.success = False
+    return JSONResponse(status_code=503, content=response.model_dump())
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """prometheus exposition of request, session method, navigation, login and driver metrics"""
+    return PlainTextResponse(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
+
+
+app.include_router(api)
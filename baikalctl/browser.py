@@ -1,7 +1,11 @@
 # baikalctl browser puppeteer
 
 import logging
-from typing import Any, Dict, List, Tuple
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+from urllib.parse import urljoin
 
 import arrow
 from bs4 import BeautifulSoup
@@ -12,9 +16,19 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.firefox.firefox_profile import FirefoxProfile
 from selenium.webdriver.support.ui import Select
 
+from . import pages
+from .exceptions import (  # noqa: F401
+    AddFailed,
+    BrowserException,
+    BrowserInterfaceFailure,
+    DeleteFailed,
+    InitFailed,
+    UnexpectedServerResponse,
+)
 from .firefox_profile import Profile
+from .lifecycle import kill, process_tree
+from .metrics import instrument
 from .models import (
-    VALID_TOKEN_CHARS,
     Account,
     AddBookRequest,
     AddUserRequest,
@@ -22,34 +36,24 @@ from .models import (
     DeleteBookRequest,
     DeleteUserRequest,
     User,
+    book_token,
 )
+from .navigation import ADD_USER_PAGE, ADMIN_PAGE, NEW_SUFFIX, USERS_PAGE, Navigator
 from .version import __version__
 
 LOG_SOUP = False
 
-
-class BrowserException(Exception):
-    pass
-
-
-class BrowserInterfaceFailure(BrowserException):
-    pass
-
-
-class InitFailed(BrowserException):
-    pass
-
-
-class AddFailed(BrowserException):
-    pass
-
-
-class DeleteFailed(BrowserException):
-    pass
-
-
-class UnexpectedServerResponse(BrowserException):
-    pass
+# lean mode preferences: the admin UI is read as table text and driven through forms, so images and web
+# fonts are skipped; stylesheets and scripts still load, since the navbar and confirmation alerts use them
+LEAN_PREFERENCES = {
+    "permissions.default.image": 2,
+    "gfx.downloadable_fonts.enabled": False,
+    "browser.display.use_document_fonts": 0,
+    "network.prefetch-next": False,
+    "network.dns.disablePrefetch": True,
+    "browser.cache.disk.enable": True,
+    "browser.cache.check_doc_frequency": 3,
+}
 
 
 class SessionConfig:
@@ -57,6 +61,9 @@ class SessionConfig:
     log_level = "WARNING"
     logger = __name__
     create_profile = False
+    login_ttl = 300
+    lean = False
+    baikal_config = "/var/www/baikal/config/baikal.yaml"
 
     @validate_call
     def __init__(  # noqa: C901
@@ -73,6 +80,9 @@ class SessionConfig:
         logger: str | Any = None,
         debug: bool | None = None,
         api_key: str | None = None,
+        login_ttl: int | None = None,
+        lean: bool | None = None,
+        baikal_config: str | None = None,
     ):
         if url is not None:
             self.__class__.url = url
@@ -96,11 +106,33 @@ class SessionConfig:
             self.__class__.debug = debug
         if api_key is not None:
             self.__class__.api_key = api_key
-
-
+        if login_ttl is not None:
+            self.__class__.login_ttl = login_ttl
+        if lean is not None:
+            self.__class__.lean = lean
+        if baikal_config is not None:
+            self.__class__.baikal_config = baikal_config
+
+
+@instrument(
+    "browser",
+    [
+        "_get",
+        "_follow",
+        "_navigate",
+        "_find_element",
+        "_find_elements",
+        "_set_text",
+        "_click_button",
+        "_click_action",
+        "_click_navbar_link",
+        "_start_driver",
+        "recycle",
+    ],
+)
 class Session:
 
-    def __init__(self, **kwargs):
+    def __init__(self, index=0, **kwargs):
 
         config = SessionConfig(**kwargs)
 
@@ -113,30 +145,125 @@ class Session:
 
         self.logger.info("startup")
         self.driver = None
+        self.nav = Navigator()
+        self.snapshot = (None, None)
         self.logged_in = False
+        self.account = None
+        self.last_used = 0.0
+        # operations served by the current driver
+        self.ops = 0
+        # (driver, thread, answered) of the last health check, which may still be waiting on a hung driver
+        self.pinging = None
+        self.login_ttl = config.login_ttl
+        self.lean = config.lean
         self.startup_time = arrow.now()
         self.reset_time = None
 
         self.url = config.url
+        self.index = index
+        profile_dir = config.profile_dir
+        template = None
+        if index:
+            # pooled sessions each need a private profile; clone it from the primary
+            template = profile_dir
+            profile_dir = f"{profile_dir}.{index}"
         self.profile = Profile(
             config.profile_name,
-            config.profile_dir,
+            profile_dir,
             config.profile_create_timeout,
             config.profile_stabilize_time,
             logger=self.logger,
+            template=template,
+            cert=config.cert,
+            key=config.key,
         )
         self.cert_file = config.cert
         self.key_file = config.key
-        self.profile.AddCert(config.cert, config.key)
         self.debug = config.debug
         self.api_key = config.api_key
 
     def _load_driver(self):
         if not self.driver:
-            self.firefox_options = webdriver.FirefoxOptions()
-            self.firefox_options.profile = FirefoxProfile(self.profile.dir)
-            self.firefox_options.profile.set_preference("security.default_personal_cert", "Select Automatically")
-            self.driver = webdriver.Firefox(options=self.firefox_options)
+            self._start_driver()
+
+    def _start_driver(self):
+        self.firefox_options = webdriver.FirefoxOptions()
+        self.firefox_options.profile = FirefoxProfile(self.profile.dir)
+        self.firefox_options.profile.set_preference("security.default_personal_cert", "Select Automatically")
+        if self.lean:
+            # return from navigation at DOMContentLoaded instead of waiting for every asset
+            self.firefox_options.page_load_strategy = "eager"
+            for name, value in LEAN_PREFERENCES.items():
+                self.firefox_options.profile.set_preference(name, value)
+            # selenium runs each driver on a copy of the profile; keep the cache beside the original
+            cache_dir = Path(f"{self.profile.dir}.cache")
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            self.firefox_options.profile.set_preference("browser.cache.disk.parent_directory", str(cache_dir))
+        self.driver = webdriver.Firefox(options=self.firefox_options)
+        self.ops = 0
+
+    def warm(self, admin: Account | None = None):
+        """launch the browser ahead of the first request, logging in as admin when given"""
+        self.logger.info("warm")
+        self._load_driver()
+        if admin:
+            self.login(admin)
+
+    def alive(self) -> bool | None:
+        """None until the driver is started, then whether its geckodriver process runs; never touches the browser"""
+        if not self.driver:
+            return None
+        return self.driver.service.process.poll() is None
+
+    def driver_pids(self) -> List[int]:
+        """the geckodriver process and its descendants, firefox among them"""
+        if not self.driver:
+            return []
+        return process_tree(self.driver.service.process.pid)
+
+    def ping(self, timeout: float) -> bool:
+        """true when the driver answers a cheap WebDriver command within timeout
+
+        while an earlier check of the same driver is still blocked, it is waited on again instead of starting
+        another thread, so a hung driver holds at most one ping thread until it is recycled
+        """
+        if not self.driver:
+            return True
+        driver = self.driver
+        if self.pinging is None or self.pinging[0] is not driver or not self.pinging[1].is_alive():
+            answered = threading.Event()
+
+            def ping():
+                try:
+                    driver.current_url
+                    answered.set()
+                except WebDriverException:
+                    pass
+
+            thread = threading.Thread(target=ping, name=f"ping-{self.index}", daemon=True)
+            self.pinging = (driver, thread, answered)
+            thread.start()
+        return self.pinging[2].wait(timeout)
+
+    def recycle(self, reason: str, timeout: float = 10):
+        """replace the driver, killing its processes if it does not quit within timeout
+
+        a login held by the old driver is restored on the new one
+        """
+        self.logger.info(f"recycle: {reason}")
+        account = self.account
+        driver, pids = self.driver, self.driver_pids()
+        self.driver = None
+        self.logged_in = False
+        self.account = None
+        self.nav.changed()
+        if driver:
+            quitter = threading.Thread(target=driver.quit, name=f"quit-{self.index}", daemon=True)
+            quitter.start()
+            quitter.join(timeout)
+            if quitter.is_alive():
+                kill(pids)
+        self.warm(account)
 
     def shutdown(self):
         self.logger.info("shutdown")
@@ -145,6 +272,7 @@ class Session:
         if self.driver:
             self.driver.quit()
             self.driver = None
+            self.nav.changed()
 
     @validate_call
     def _find_elements(
@@ -172,6 +300,7 @@ class Session:
             if elements:
                 if click:
                     elements[0].click()
+                    self.nav.loaded()
                 return elements
             if allow_none:
                 return elements
@@ -214,11 +343,22 @@ class Session:
             self._find_elements(name, selector, parent=parent, with_text=with_text, click=True)
         else:
             self._find_element(name, selector, parent=parent, with_text=with_text).click()
+            self.nav.loaded()
+
+    def _snapshot(self):
+        """parse the current page in-process so reading it costs a single webdriver call
+
+        the parse is reused until the page changes
+        """
+        generation, soup = self.snapshot
+        if generation != self.nav.generation:
+            soup = pages.parse(self.driver.page_source)
+            self.snapshot = (self.nav.generation, soup)
+        return soup
 
     @validate_call
     def _check_popups(self, require_none: bool | None = False) -> List[str]:
-        messages = self._find_elements("popup messages", 'html > body [id="message"]', allow_none=True)
-        ret = [message.text for message in messages]
+        ret = pages.messages(self._snapshot())
         if ret and require_none:
             raise UnexpectedServerResponse("\n".join(ret).replace("\n", ": "))
         return ret
@@ -231,14 +371,37 @@ class Session:
             element.send_keys(text)
 
     @validate_call
-    def _get(self, path: str):
+    def _get(self, path: str, relogin: bool | None = True):
+        self._open(self.url + path, relogin)
+
+    @validate_call
+    def _follow(self, href: str, relogin: bool | None = True):
+        self._load_driver()
+        self._open(urljoin(self.driver.current_url, href), relogin)
+
+    def _open(self, url: str, relogin: bool | None = True):
+        if self.nav.current(url):
+            self.logger.debug(f"already at {url}")
+            return
+        self._navigate(url)
+        if relogin and self.logged_in and self._is_login_page():
+            # the server dropped our login; sign in again and repeat the navigation
+            account = self.account
+            self.logger.warning(f"login bounced at {url}; logging in again as '{account.username}'")
+            self.logged_in = False
+            self.account = None
+            self.login(account)
+            self._navigate(url)
+
+    def _navigate(self, url: str):
         self._load_driver()
-        url = self.url + path
         self.logger.info(f"GET {url}")
         try:
             self.driver.get(url)
         except WebDriverException as ex:
+            self.nav.changed()
             raise BrowserInterfaceFailure(ex.msg)
+        self.nav.loaded(url)
 
         if LOG_SOUP:
             soup = BeautifulSoup(self.driver.page_source, "html.parser")
@@ -246,24 +409,51 @@ class Session:
             for line in source.split("\n"):
                 self.logger.debug(line)
 
+    def _is_login_page(self) -> bool:
+        return bool(self.driver.find_elements(By.CSS_SELECTOR, 'body form input[id="login"]'))
+
+    def _login_current(self, admin: Account) -> bool:
+        """true when this session holds a login for admin that has not been idle longer than login_ttl"""
+        return self.logged_in and self.account == admin and time.monotonic() - self.last_used < self.login_ttl
+
     @validate_call
     def login(self, admin: Account):
-        if self.logged_in == admin.username:
+        # every operation starts here; pages loaded by an earlier operation may be stale
+        self.nav.expire()
+        self.ops += 1
+        if self._login_current(admin):
+            self.last_used = time.monotonic()
             return
+        if self.logged_in:
+            self.logout()
+        self._authenticate(admin)
+
+    def _authenticate(self, admin: Account):
         self.logger.info("login")
 
-        self._get("/admin/")
+        self._get(ADMIN_PAGE)
 
         if self.driver.title == "Baïkal Maintainance":
             raise BrowserInterfaceFailure("server not initialized")
 
         self.logger.info(f"connected to {self.driver.title}")
 
+        if not self._is_login_page():
+            # the server still holds an earlier login; end it so these credentials are checked
+            self.logger.info("ending previous server login")
+            self._click_navbar_link("Logout")
+            if not self._is_login_page():
+                raise BrowserInterfaceFailure("logout failed: login page not shown")
+
         self._set_text("login username field", 'body form input[id="login"]', admin.username)
         self._set_text("login password field", 'body form input[id="password"]', admin.password)
         self._click_button("login authenticate button", "body form button", with_text="Authenticate")
         self._check_popups(require_none=True)
+        if self._is_login_page():
+            raise BrowserInterfaceFailure("login rejected")
         self.logged_in = admin.username
+        self.account = admin
+        self.last_used = time.monotonic()
         self.logger.info(f"Successfull login as '{admin.username}'")
 
     @validate_call
@@ -317,15 +507,19 @@ class Session:
     # new
     def logout(self):
         if self.logged_in:
-            self.logger.info("logout")
-            self._get("/admin/")
+            self._logout()
+
+    def _logout(self):
+        self.logger.info("logout")
+        self._get(ADMIN_PAGE, relogin=False)
+        if not self._is_login_page():
             self._click_navbar_link("Logout")
-            self.logged_in = False
+        self.logged_in = False
+        self.account = None
 
     # new
     def _select_user_page(self):
-        self._get("/admin/")
-        self._click_navbar_link("Users and resources")
+        self._get(USERS_PAGE)
 
     # new
     @validate_call
@@ -338,13 +532,12 @@ class Session:
         if label not in links:
             raise BrowserInterfaceFailure(f"navbar link not found: expected={label} links={list(links.keys())}")
         link.click()
+        self.nav.loaded()
 
     # new
     @validate_call
-    def _table_rows(self, name: str, allow_none: bool | None = True):
-        # table = self._find_element(f"{name} table",  "body table", with_classes=["table", name])
-        # tbody = self._find_element(f"{name} table body",  "tbody", parent=table)
-        rows = self._find_elements(f"{name} table body rows", "body table tbody tr", allow_none=True)
+    def _table_rows(self, name: str, allow_none: bool | None = True) -> List[Any]:
+        rows = pages.table_rows(self._snapshot())
         if not rows:
             message = f"no {name} table body rows found"
             if allow_none:
@@ -355,77 +548,53 @@ class Session:
 
     # new
     @validate_call
-    def _parse_user_row(self, row: Any) -> Dict[str, str]:
-        col_username = self._find_element("user table row displayname column", "td.col-username", parent=row)
-        username, _, tail = col_username.text.partition("\n")
-        displayname, _, email = tail.partition(" <")
-        email = email.strip(">")
-        ret = self._parse_row_info("user", row)
-        ret.update(dict(username=username, displayname=displayname, email=email))
-        return ret
+    def _row_action_buttons(self, name: str, row: Any) -> Dict[str, str]:
+        """map action button label to href for a parsed table row"""
+        return pages.row_actions(row)
 
     # new
     @validate_call
-    def _parse_book_row(self, row: Any) -> Dict[str, str]:
-        ret = {}
-        col_displayname = self._find_element("book table row displayname column", "td.col-displayname", parent=row)
-        ret["bookname"] = col_displayname.text
-        col_contacts = self._find_element("book table row contacts column", "td.col-contacts", parent=row)
-        ret["contacts"] = int(col_contacts.text)
-        col_description = self._find_element("book table row description column", "td.col-description", parent=row)
-        ret["description"] = col_description.text
-        data = self._parse_row_info("addressbooks", row)
-        ret.update(data)
-        ret["token"] = ret["uri"].split("/")[-2]
-        return ret
+    def _click_action(self, name: str, href: str):
+        self._find_element(name, f'body table tbody td.col-actions a.btn[href="{href}"]').click()
+        self.nav.loaded()
 
     # new
     @validate_call
-    def _parse_row_info(self, name: str, row: Any) -> Dict[str, str]:
-        actions = self._find_element(f"{name} table row actions column", "td.col-actions", parent=row)
-        popover = self._find_element(f"{name} table row actions popover data", "span.btn.popover-hover", parent=actions)
-        data_content = popover.get_attribute("data-content")
-        soup = BeautifulSoup(data_content, "html.parser")
-        ret = {}
-        last_line = None
-        for line in soup.strings:
-            if last_line == "URI":
-                ret["uri"] = line
-            elif last_line == "User name":
-                ret["username"] = line
-            last_line = line
-        if "uri" not in ret:
-            raise BrowserInterfaceFailure(f"{name} table row info parse failed")
-        return ret
-
-    # new
-    @validate_call
-    def _row_action_buttons(self, name: str, row: Any) -> Dict[str, Any]:
-        actions = self._find_element(f"{name} table row actions column", "td.col-actions", parent=row)
-        action_buttons = self._find_elements(f"{name} table row actions buttons", "a.btn", parent=actions)
-        buttons = {e.text: e for e in action_buttons if e.text}
-        return buttons
+    def users(self, admin: Account) -> List[User]:
+        return list(self.iter_users(admin))
 
-    # new
     @validate_call
-    def users(self, admin: Account) -> List[User]:
+    def iter_users(self, admin: Account) -> Iterator[User]:
+        """yield users as their rows are parsed from one load of the users page"""
         self.logger.info("list_users")
         self.login(admin)
         self._select_user_page()
-        rows = self._table_rows("users")
-        return [User(**self._parse_user_row(row)) for row in rows]
+        for row in self._table_rows("users"):
+            yield User(**pages.parse_user_row(row))
+
+    def _find_row(self, name: str, parse, key: str, value: str) -> Dict[str, Any] | None:
+        """return the parsed row of the current page's table whose key matches value"""
+        for row in self._table_rows(name):
+            parsed = parse(row)
+            if parsed[key] == value:
+                return parsed
+        return None
 
-    # old
     @validate_call
     def add_user(self, admin: Account, request: AddUserRequest) -> User:
+        """add a user in at most PAGE_BUDGET["add_user"] page loads
+
+        the add form page also lists the users, and the submit lands on the updated list
+        """
         self.logger.info(f"add_user {request.username} {request.displayname} ************")
         user = User(**request.model_dump())
         self.login(admin)
-        self._select_user_page()
-        self._click_button("add user button", "body .btn", with_text="+ Add user")
+        self._get(ADD_USER_PAGE)
+        if self._find_row("users", pages.parse_user_row, "username", user.username):
+            raise AddFailed(f"user exists: username={user.username}")
         self._set_text("add user username field", 'body form input[name="data[username]"]', user.username)
         self._set_text("add user displayname field", 'body form input[name="data[displayname]"]', user.displayname)
-        self._set_text("add user email field", 'body form input[name="data[email]"]', user.username)
+        self._set_text("add user email field", 'body form input[name="data[email]"]', user.email or user.username)
         self._set_text("add user password field", 'body form input[name="data[password]"]', request.password)
         self._set_text(
             "add user password confirmation field",
@@ -438,7 +607,9 @@ class Session:
             with_text="Save changes",
         )
         self._check_add_popups("user", f"User {user.username} has been created.")
-        _, parsed = self._find_user_row(user.username, allow_none=False)
+        parsed = self._find_row("users", pages.parse_user_row, "username", user.username)
+        if parsed is None:
+            raise AddFailed(f"added user not found: username={user.username}")
         added = User(**parsed)
         if added.username == request.username and added.displayname == request.displayname:
             return added
@@ -448,8 +619,8 @@ class Session:
 
     @validate_call
     def _check_add_popups(self, name: str, expected: str):
+        # the landing page still shows the form; leave it open since its Close button would cost a page load
         popups = self._check_popups()
-        self._click_button(f"add {name} close button ", "body form .btn", with_text="Close")
         if expected in popups:
             return
         elif popups:
@@ -468,10 +639,10 @@ class Session:
         actions = self._find_user_actions(username)
         if not actions:
             raise DeleteFailed(f"user not found: {username=}")
-        button = actions.get("Delete", None)
-        if not button:
+        href = actions.get("Delete", None)
+        if not href:
             raise BrowserInterfaceFailure("failed to locate Delete button")
-        button.click()
+        self._click_action("user delete button", href)
         self._find_elements(
             "user delete confirmation button",
             "div.alert .btn-danger",
@@ -486,7 +657,7 @@ class Session:
         self._select_user_page()
         rows = self._table_rows("users", allow_none=allow_none)
         for row in rows:
-            user = self._parse_user_row(row)
+            user = pages.parse_user_row(row)
             if user["username"] == username:
                 return row, user
         self.logger.warning(f"user {username} not found")
@@ -496,7 +667,7 @@ class Session:
 
     # new
     @validate_call
-    def _find_user_actions(self, username: str, allow_none: bool | None = True) -> Dict[str, Any]:
+    def _find_user_actions(self, username: str, allow_none: bool | None = True) -> Dict[str, str]:
         row, _ = self._find_user_row(username, allow_none=allow_none)
         if row:
             return self._row_action_buttons("user", row)
@@ -507,7 +678,7 @@ class Session:
     def _select_user_address_books(self, username: str, allow_none: bool | None = True):
         buttons = self._find_user_actions(username, allow_none=allow_none)
         if buttons:
-            buttons["Address Books"].click()
+            self._follow(buttons["Address Books"])
             return True
         return None
 
@@ -520,7 +691,7 @@ class Session:
             return None, None
         rows = self._table_rows("addressbooks")
         for row in rows:
-            parsed = self._parse_book_row(row)
+            parsed = pages.parse_book_row(row)
             if parsed["token"] == token:
                 return row, parsed
         self.logger.warning(f"book {token} not found")
@@ -528,7 +699,7 @@ class Session:
 
     # new
     @validate_call
-    def _find_book_actions(self, username: str, token: str) -> Dict[str, Any]:
+    def _find_book_actions(self, username: str, token: str) -> Dict[str, str]:
         row, _ = self._find_book_row(username, token)
         if row:
             return self._row_action_buttons("addressbook", row)
@@ -542,36 +713,57 @@ class Session:
         if not self._select_user_address_books(username):
             return []
         rows = self._table_rows("addressbooks")
-        ret = [Book(**self._parse_book_row(row)) for row in rows]
+        ret = [Book(**pages.parse_book_row(row)) for row in rows]
+        return ret
+
+    @validate_call
+    def book_links(self, admin: Account) -> Dict[str, str]:
+        """map each username to its address book page href, parsed from a single load of the users page"""
+        self.logger.info("list_address_book_links")
+        self.login(admin)
+        self._select_user_page()
+        ret = {}
+        for row in self._table_rows("users"):
+            ret[pages.parse_user_row(row)["username"]] = pages.address_book_link(row)
         return ret
 
-    # old
+    @validate_call
+    def books_at(self, admin: Account, username: str, href: str) -> List[Book]:
+        """list address books from a page href returned by book_links"""
+        self.logger.info(f"list_address_books {username}")
+        self.login(admin)
+        self._follow(href)
+        return [Book(**pages.parse_book_row(row)) for row in self._table_rows("addressbooks")]
+
     @validate_call
     def add_book(self, admin: Account, request: AddBookRequest) -> Book:
+        """add an address book in at most PAGE_BUDGET["add_book"] page loads
+
+        the users page gives the user's address books URL; its add form page also lists the books,
+        and the submit lands on the updated list
+        """
         self.logger.info(f"add_address_book {request.username} {request.bookname} {request.description}")
         self.login(admin)
-        self._find_user_row(request.username, allow_none=False)
-        token = request.username + "-" + request.bookname
-        token = "".join([c if c in VALID_TOKEN_CHARS else "-" for c in token])
+        token = book_token(request.username, request.bookname)
         book = Book(token=token, **request.model_dump())
 
-        row, _ = self._find_book_row(book.username, book.token)
-        if row is not None:
+        buttons = self._find_user_actions(book.username, allow_none=False)
+        self._follow(buttons["Address Books"] + NEW_SUFFIX)
+        if self._find_row("addressbooks", pages.parse_book_row, "token", book.token):
             raise AddFailed(f"address book exists: username={book.username} token={book.token}")
-
-        self._select_user_address_books(book.username)
-        self._click_button("add address book button", "body .btn", with_text="+ Add address book")
         self._set_text("add book token field", 'body form input[name="data[uri]"]', book.token)
         self._set_text("add book name field", 'body form input[name="data[displayname]"]', book.bookname)
         self._set_text("add book description field", 'body form input[name="data[description]"]', book.description)
         self._click_button("add book save changes button", "body form .btn", with_text="Save changes")
         self._check_add_popups("addressbook", f"Address Book {book.bookname} has been created.")
-        _, parsed = self._find_book_row(request.username, token, allow_none=False)
+        parsed = self._find_row("addressbooks", pages.parse_book_row, "token", book.token)
+        if parsed is None:
+            raise AddFailed(f"added book not found: username={book.username} token={book.token}")
         added = Book(**parsed)
         if (
             added.username == request.username
             and added.bookname == request.bookname
-            and added.description == request.description
+            and (added.description or "") == (request.description or "")
             and added.token == token
         ):
             return added
@@ -590,10 +782,10 @@ class Session:
         if not row:
             raise DeleteFailed(f"book not found: username={request.username} token={request.token}")
         actions = self._row_action_buttons("addressbook", row)
-        button = actions.get("Delete", None)
-        if not button:
+        href = actions.get("Delete", None)
+        if not href:
             raise BrowserInterfaceFailure("failed to locate address book Delete button")
-        button.click()
+        self._click_action("address book delete button", href)
         self._find_elements(
             "book delete confirmation button",
             "div.alert .btn-danger",
@@ -0,0 +1,158 @@
+# baikalctl read cache
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable
+
+from .models import Account
+
+
+def account_key(account: Account) -> str:
+    return hashlib.sha256(f"{account.username}:{account.password}".encode()).hexdigest()
+
+
+class ReadCache:
+    """bounded TTL cache for admin UI reads, invalidated by the writes that change them
+
+    empty results, such as the book list of an unknown user, are cached like any other value
+    """
+
+    def __init__(self, ttl: float, size: int):
+        self.ttl = ttl
+        self.size = size
+        self.lock = threading.Lock()
+        self.entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        # hits are only served to admin credentials that have already passed a login
+        self.accounts: set[str] = set()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        # bumped on every invalidation so a read that raced a write is not stored
+        self.generation = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.size > 0
+
+    def get(self, key: Hashable, account: Account, read: Callable[[], Any], refresh: bool = False) -> Any:
+        """return the cached value for key, calling read() to fill it when missing, expired or refresh is set"""
+        hit, value, generation = self.lookup(key, account, refresh)
+        if hit:
+            return value
+        value = read()
+        self.store(key, account, value, generation)
+        return value
+
+    def lookup(self, key: Hashable, account: Account, refresh: bool = False) -> tuple[bool, Any, int]:
+        """return (hit, value, generation); after a miss, pass the generation to store() with the value read"""
+        if not self.enabled:
+            return False, None, 0
+        key_account = account_key(account)
+        now = time.monotonic()
+        with self.lock:
+            if not refresh and key_account in self.accounts and key in self.entries:
+                expires, value = self.entries[key]
+                if expires > now:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value, self.generation
+                del self.entries[key]
+            self.misses += 1
+            return False, None, self.generation
+
+    def store(self, key: Hashable, account: Account, value: Any, generation: int):
+        """cache a value read after lookup() returned generation, unless an invalidation happened since"""
+        if not self.enabled:
+            return
+        with self.lock:
+            self.accounts.add(account_key(account))
+            if generation != self.generation:
+                return
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, *keys: Hashable):
+        with self.lock:
+            self.generation += 1
+            for key in keys:
+                if self.entries.pop(key, None) is not None:
+                    self.invalidations += 1
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.invalidations += len(self.entries)
+            self.entries.clear()
+            self.accounts.clear()
+
+    def status(self) -> Dict[str, Any]:
+        with self.lock:
+            return dict(
+                ttl=self.ttl,
+                size=self.size,
+                entries=len(self.entries),
+                hits=self.hits,
+                misses=self.misses,
+                invalidations=self.invalidations,
+            )
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.followers = 0
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """share one execution, and its result or exception, among identical concurrent calls"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flights: Dict[Hashable, _Flight] = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> Any:
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = _Flight()
+                self.executions += 1
+            else:
+                flight.followers += 1
+                self.coalesced += 1
+        if not leader:
+            flight.done.wait()
+            with self.lock:
+                flight.followers -= 1
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+        try:
+            flight.value = func()
+            return flight.value
+        except BaseException as ex:
+            flight.error = ex
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+            flight.done.set()
+
+    def status(self) -> Dict[str, Any]:
+        with self.lock:
+            calls = self.executions + self.coalesced
+            return dict(
+                executions=self.executions,
+                coalesced=self.coalesced,
+                coalescing_ratio=self.coalesced / calls if calls else 0.0,
+                in_flight=len(self.flights),
+                waiting=sum(flight.followers for flight in self.flights.values()),
+            )
@@ -1,9 +1,14 @@
 # baikalctl API client
 
+import asyncio
+import json
 import re
+import time
+from contextlib import nullcontext
 from pathlib import Path
-from typing import Dict, List
+from typing import Any, AsyncIterator, Dict, Iterator, List
 
+import httpx
 import requests
 from pydantic import validate_call
 from requests.exceptions import JSONDecodeError
@@ -14,12 +19,22 @@ from .models import (
     AddBookResponse,
     AddUserRequest,
     AddUserResponse,
+    BatchResponse,
+    BatchResult,
     Book,
+    BookBatchRequest,
     BooksResponse,
     DeleteBookRequest,
     DeleteUserRequest,
+    DesiredState,
+    HealthResponse,
+    Job,
+    JobResponse,
+    ReconcileResponse,
     StatusResponse,
+    TracesResponse,
     User,
+    UserBatchRequest,
     UsersResponse,
 )
 
@@ -44,20 +59,36 @@ def validate_pem_file(filename: str, pem_type: str):
                     raise ValueError(f"{filename} is not a key")
 
 
-class API:
+NDJSON = "application/x-ndjson"
+
+
+class BaseAPI:
+    """server url, client certificate and authentication headers shared by API and AsyncAPI"""
+
     @validate_call
     def __init__(
         self, url: str, admin_username: str, admin_password: str, client_cert: str, client_key: str, api_key: str
     ):
         self.url = url.strip("/")
-        self.session = requests.Session()
         validate_pem_file(client_cert, "certificate")
         validate_pem_file(client_key, "private key")
-        self.session.cert = (client_cert, client_key)
+        self.cert = (client_cert, client_key)
         account = Account(username=admin_username, password=admin_password)
-        self.session.headers["X-Admin-Username"] = account.username
-        self.session.headers["X-Admin-Password"] = account.password
-        self.session.headers["X-Api-Key"] = api_key
+        self.headers = {
+            "X-Admin-Username": account.username,
+            "X-Admin-Password": account.password,
+            "X-Api-Key": api_key,
+            # request bodies are model JSON; without the type the server reads them as raw bytes
+            "Content-Type": "application/json",
+        }
+
+
+class API(BaseAPI):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.session = requests.Session()
+        self.session.cert = self.cert
+        self.session.headers.update(self.headers)
 
     def _parse_response(self, response):
         if response.ok:
@@ -80,9 +111,65 @@ class API:
     def _delete(self, path, **kwargs):
         return self._request(self.session.delete, path, **kwargs)
 
+    def _stream(self, path, gzip=True, **kwargs) -> Iterator[Dict[str, Any]]:
+        """yield the rows of an NDJSON list response as they arrive, raising RuntimeError on an error row"""
+        headers = {"Accept": NDJSON, "Accept-Encoding": "gzip" if gzip else "identity"}
+        url = f"{self.url}/{path.strip('/')}/"
+        with self.session.get(url, headers=headers, stream=True, **kwargs) as response:
+            if not response.ok:
+                self._parse_response(response)
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                row = json.loads(line)
+                if row.get("success") is False:
+                    raise RuntimeError(row)
+                yield row
+
+    def _mutation(self, func, path, request):
+        """send a mutation, waiting for its job when the server queues it"""
+        result = func(path, data=request.model_dump_json())
+        if "job" in result:
+            result = self.wait(JobResponse(**result).job.id).result
+        return result
+
+    def traces(self) -> List[Dict[str, Any]]:
+        return TracesResponse(**self._get("traces")).traces
+
+    @validate_call
+    def trace(self, id: str, format: str = "chrome") -> Dict[str, Any]:
+        """one request trace, as Chrome trace event JSON or OTLP/JSON"""
+        return self._get(f"traces/{id}", params=dict(format=format))
+
+    @validate_call
+    def job(self, id: str) -> Job:
+        return JobResponse(**self._get(f"jobs/{id}")).job
+
+    @validate_call
+    def wait(self, id: str, timeout: float = 300, poll: float = 30) -> Job:
+        """block until a queued job finishes, raising RuntimeError if it fails or timeout expires"""
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            job = JobResponse(**self._get(f"jobs/{id}", params=dict(wait=max(min(poll, remaining), 0)))).job
+            if job.state == "done":
+                return job
+            if job.state == "failed":
+                raise RuntimeError(f"job {id} failed: {job.error}")
+            if remaining <= 0:
+                raise RuntimeError(f"timeout waiting for job {id}: state={job.state}")
+
+    @validate_call
+    def health(self) -> HealthResponse:
+        """server health; an unhealthy server answers 503 with the same body"""
+        response = self.session.get(f"{self.url}/health/")
+        if response.status_code == 503:
+            return HealthResponse(**response.json())
+        return HealthResponse(**self._parse_response(response))
+
     @validate_call
-    def status(self) -> Dict[str, str]:
-        response = StatusResponse(**self._get("status"))
+    def status(self, refresh: bool = False) -> Dict[str, str]:
+        response = StatusResponse(**self._get("status", params=dict(refresh=refresh)))
         return response.status
 
     @validate_call
@@ -98,16 +185,30 @@ class API:
         response = UsersResponse(**self._get("users"))
         return response.users
 
+    @validate_call
+    def iter_users(self, gzip: bool = True) -> Iterator[User]:
+        """yield users as the server streams them, with constant memory for any number of users"""
+        for row in self._stream("users", gzip):
+            yield User(**row)
+
     @validate_call
     def add_user(self, username: str, displayname: str, password: str) -> User:
         request = AddUserRequest(username=username, displayname=displayname, password=password)
-        response = AddUserResponse(**self._post("user", data=request.model_dump_json()))
+        response = AddUserResponse(**self._mutation(self._post, "user", request))
         return response.user
 
     @validate_call
     def delete_user(self, username: str) -> Dict[str, str]:
         request = DeleteUserRequest(username=username)
-        return self._delete("user", data=request.model_dump_json())
+        return self._mutation(self._delete, "user", request)
+
+    @validate_call
+    def users_batch(
+        self, add: List[AddUserRequest] | None = None, delete: List[DeleteUserRequest] | None = None
+    ) -> List[BatchResult]:
+        request = UserBatchRequest(add=add or [], delete=delete or [])
+        response = BatchResponse(**self._post("users/batch", data=request.model_dump_json()))
+        return response.results
 
     @validate_call
     def books(self, username: str | None = None) -> List[Book]:
@@ -118,19 +219,307 @@ class API:
         result = BooksResponse(**self._get(path))
         return result.books
 
+    @validate_call
+    def iter_books(self, username: str | None = None, gzip: bool = True) -> Iterator[Book]:
+        """yield address books as the server streams them, each user's as soon as their page is read"""
+        for row in self._stream(f"books/{username}" if username else "books", gzip):
+            yield Book(**row)
+
     @validate_call
     def add_book(self, username: str, bookname: str, description: str) -> Book:
         request = AddBookRequest(username=username, bookname=bookname, description=description)
-        response = AddBookResponse(**self._post("book", data=request.model_dump_json()))
+        response = AddBookResponse(**self._mutation(self._post, "book", request))
         return response.book
 
     @validate_call
     def delete_book(self, username: str, token: str) -> Dict[str, str]:
         request = DeleteBookRequest(username=username, token=token)
-        return self._delete("book", data=request.model_dump_json())
+        return self._mutation(self._delete, "book", request)
+
+    @validate_call
+    def books_batch(
+        self, add: List[AddBookRequest] | None = None, delete: List[DeleteBookRequest] | None = None
+    ) -> List[BatchResult]:
+        request = BookBatchRequest(add=add or [], delete=delete or [])
+        response = BatchResponse(**self._post("books/batch", data=request.model_dump_json()))
+        return response.results
+
+    @validate_call
+    def apply(self, state: DesiredState, dry_run: bool = False) -> ReconcileResponse:
+        params = dict(dry_run="true") if dry_run else {}
+        return ReconcileResponse(**self._post("reconcile", data=state.model_dump_json(), params=params))
 
     def shutdown(self):
         return self._post("shutdown")
 
     def uptime(self):
         return self._get("uptime")
+
+
+class AsyncAPI(BaseAPI):
+    """API for asyncio: the same methods as coroutines, sharing one pool of keep-alive connections
+
+    concurrency, when set, bounds the requests in flight across every task using the client; use it as an
+    async context manager, or await aclose(), to release the connections
+    """
+
+    @validate_call
+    def __init__(
+        self,
+        url: str,
+        admin_username: str,
+        admin_password: str,
+        client_cert: str,
+        client_key: str,
+        api_key: str,
+        max_connections: int = 10,
+        concurrency: int | None = None,
+        timeout: float | None = None,
+    ):
+        super().__init__(url, admin_username, admin_password, client_cert, client_key, api_key)
+        context = httpx.create_ssl_context()
+        context.load_cert_chain(*self.cert)
+        self.client = httpx.AsyncClient(
+            headers=self.headers,
+            verify=context,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=timeout,
+        )
+        self.semaphore = asyncio.Semaphore(concurrency) if concurrency else None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.aclose()
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    def _slot(self):
+        return self.semaphore or nullcontext()
+
+    def _parse_response(self, response: httpx.Response):
+        if response.is_success:
+            return response.json()
+        try:
+            message = response.json()
+        except ValueError:
+            message = f"<Response [{response.status_code}]> {response.reason_phrase}"
+        raise RuntimeError(message)
+
+    async def _request(self, method, path, **kwargs):
+        async with self._slot():
+            response = await self.client.request(method, f"{self.url}/{path.strip('/')}/", **kwargs)
+        return self._parse_response(response)
+
+    async def _get(self, path, **kwargs):
+        return await self._request("GET", path, **kwargs)
+
+    async def _post(self, path, **kwargs):
+        return await self._request("POST", path, **kwargs)
+
+    async def _delete(self, path, **kwargs):
+        return await self._request("DELETE", path, **kwargs)
+
+    async def _stream(self, path, gzip=True) -> AsyncIterator[Dict[str, Any]]:
+        """yield the rows of an NDJSON list response as they arrive, raising RuntimeError on an error row"""
+        headers = {"Accept": NDJSON, "Accept-Encoding": "gzip" if gzip else "identity"}
+        async with self._slot():
+            async with self.client.stream("GET", f"{self.url}/{path.strip('/')}/", headers=headers) as response:
+                if not response.is_success:
+                    await response.aread()
+                    self._parse_response(response)
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    row = json.loads(line)
+                    if row.get("success") is False:
+                        raise RuntimeError(row)
+                    yield row
+
+    async def _mutation(self, func, path, request):
+        """send a mutation, waiting for its job when the server queues it"""
+        result = await func(path, content=request.model_dump_json())
+        if "job" in result:
+            result = (await self.wait(JobResponse(**result).job.id)).result
+        return result
+
+    async def _gather(self, action, items, operation) -> List[BatchResult]:
+        """run operation(item) for all items concurrently, reporting each item's outcome instead of raising"""
+
+        async def run(item):
+            result = dict(action=action, username=item.username, token=getattr(item, "token", None))
+            try:
+                result.update(await operation(item))
+                result["success"] = True
+            except Exception as ex:
+                result.update(success=False, message=ex.__class__.__name__, detail=" ".join(map(str, ex.args)))
+            return BatchResult(**result)
+
+        return list(await asyncio.gather(*[run(item) for item in items]))
+
+    async def traces(self) -> List[Dict[str, Any]]:
+        return TracesResponse(**await self._get("traces")).traces
+
+    @validate_call
+    async def trace(self, id: str, format: str = "chrome") -> Dict[str, Any]:
+        """one request trace, as Chrome trace event JSON or OTLP/JSON"""
+        return await self._get(f"traces/{id}", params=dict(format=format))
+
+    @validate_call
+    async def job(self, id: str) -> Job:
+        return JobResponse(**await self._get(f"jobs/{id}")).job
+
+    @validate_call
+    async def wait(self, id: str, timeout: float = 300, poll: float = 30) -> Job:
+        """wait until a queued job finishes, raising RuntimeError if it fails or timeout expires"""
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            job = JobResponse(**await self._get(f"jobs/{id}", params=dict(wait=max(min(poll, remaining), 0)))).job
+            if job.state == "done":
+                return job
+            if job.state == "failed":
+                raise RuntimeError(f"job {id} failed: {job.error}")
+            if remaining <= 0:
+                raise RuntimeError(f"timeout waiting for job {id}: state={job.state}")
+
+    @validate_call
+    async def health(self) -> HealthResponse:
+        """server health; an unhealthy server answers 503 with the same body"""
+        async with self._slot():
+            response = await self.client.get(f"{self.url}/health/")
+        if response.status_code == 503:
+            return HealthResponse(**response.json())
+        return HealthResponse(**self._parse_response(response))
+
+    @validate_call
+    async def status(self, refresh: bool = False) -> Dict[str, str]:
+        response = StatusResponse(**await self._get("status", params=dict(refresh=refresh)))
+        return response.status
+
+    @validate_call
+    async def initialize(self) -> Dict[str, str]:
+        return await self._post("initialize")
+
+    @validate_call
+    async def reset(self) -> Dict[str, str]:
+        return await self._post("reset")
+
+    @validate_call
+    async def users(self) -> List[User]:
+        response = UsersResponse(**await self._get("users"))
+        return response.users
+
+    async def iter_users(self, gzip: bool = True) -> AsyncIterator[User]:
+        """yield users as the server streams them, with constant memory for any number of users
+
+        each row is validated as it is built into a User; validate_call would check only the arguments
+        """
+        async for row in self._stream("users", gzip):
+            yield User(**row)
+
+    @validate_call
+    async def add_user(self, username: str, displayname: str, password: str) -> User:
+        request = AddUserRequest(username=username, displayname=displayname, password=password)
+        response = AddUserResponse(**await self._mutation(self._post, "user", request))
+        return response.user
+
+    @validate_call
+    async def delete_user(self, username: str) -> Dict[str, str]:
+        request = DeleteUserRequest(username=username)
+        return await self._mutation(self._delete, "user", request)
+
+    @validate_call
+    async def users_batch(
+        self, add: List[AddUserRequest] | None = None, delete: List[DeleteUserRequest] | None = None
+    ) -> List[BatchResult]:
+        request = UserBatchRequest(add=add or [], delete=delete or [])
+        response = BatchResponse(**await self._post("users/batch", content=request.model_dump_json()))
+        return response.results
+
+    @validate_call
+    async def gather_add_users(self, users: List[AddUserRequest]) -> List[BatchResult]:
+        """add users with concurrent requests, returning each one's outcome in order
+
+        unlike users_batch, each add is its own request, so the server spreads them over its session pool
+        """
+
+        async def add(user):
+            return dict(message="user added", user=await self.add_user(user.username, user.displayname, user.password))
+
+        return await self._gather("add", users, add)
+
+    @validate_call
+    async def gather_delete_users(self, users: List[DeleteUserRequest]) -> List[BatchResult]:
+        """delete users with concurrent requests, returning each one's outcome in order"""
+
+        async def delete(user):
+            return dict(message=(await self.delete_user(user.username)).get("message", "user deleted"))
+
+        return await self._gather("delete", users, delete)
+
+    @validate_call
+    async def books(self, username: str | None = None) -> List[Book]:
+        result = BooksResponse(**await self._get(f"books/{username}" if username else "books"))
+        return result.books
+
+    async def iter_books(self, username: str | None = None, gzip: bool = True) -> AsyncIterator[Book]:
+        """yield address books as the server streams them, each user's as soon as their page is read
+
+        each row is validated as it is built into a Book; validate_call would check only the arguments
+        """
+        async for row in self._stream(f"books/{username}" if username else "books", gzip):
+            yield Book(**row)
+
+    @validate_call
+    async def add_book(self, username: str, bookname: str, description: str) -> Book:
+        request = AddBookRequest(username=username, bookname=bookname, description=description)
+        response = AddBookResponse(**await self._mutation(self._post, "book", request))
+        return response.book
+
+    @validate_call
+    async def delete_book(self, username: str, token: str) -> Dict[str, str]:
+        request = DeleteBookRequest(username=username, token=token)
+        return await self._mutation(self._delete, "book", request)
+
+    @validate_call
+    async def books_batch(
+        self, add: List[AddBookRequest] | None = None, delete: List[DeleteBookRequest] | None = None
+    ) -> List[BatchResult]:
+        request = BookBatchRequest(add=add or [], delete=delete or [])
+        response = BatchResponse(**await self._post("books/batch", content=request.model_dump_json()))
+        return response.results
+
+    @validate_call
+    async def gather_add_books(self, books: List[AddBookRequest]) -> List[BatchResult]:
+        """add address books with concurrent requests, returning each one's outcome in order"""
+
+        async def add(book):
+            # a request may leave the description unset; add_book takes a string, like API.add_book
+            added = await self.add_book(book.username, book.bookname, book.description or "")
+            return dict(message="address book added", token=added.token, book=added)
+
+        return await self._gather("add", books, add)
+
+    @validate_call
+    async def gather_delete_books(self, books: List[DeleteBookRequest]) -> List[BatchResult]:
+        """delete address books with concurrent requests, returning each one's outcome in order"""
+
+        async def delete(book):
+            result = await self.delete_book(book.username, book.token)
+            return dict(message=result.get("message", "address book deleted"))
+
+        return await self._gather("delete", books, delete)
+
+    @validate_call
+    async def apply(self, state: DesiredState, dry_run: bool = False) -> ReconcileResponse:
+        params = dict(dry_run="true") if dry_run else {}
+        return ReconcileResponse(**await self._post("reconcile", content=state.model_dump_json(), params=params))
+
+    async def shutdown(self):
+        return await self._post("shutdown")
+
+    async def uptime(self):
+        return await self._get("uptime")
@@ -7,6 +7,7 @@ import sys
 from collections.abc import Iterable
 
 import click
+import yaml
 
 from .client import API
 from .exception_handler import ExceptionHandler
@@ -30,8 +31,8 @@ DEFAULT_KEY = "/etc/ssl/client.key"
 
 
 def render(obj):
-    if hasattr(obj, "model_dump_json"):
-        return json.loads(obj.model_dump_json())
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump(mode="json")
     if isinstance(obj, Iterable) and not (isinstance(obj, (str, bytes, dict))):
         return [render(o) for o in obj]
     else:
@@ -42,6 +43,25 @@ def output(obj):
     click.echo(json.dumps(render(obj), indent=2))
 
 
+FORMATS = ["json", "ndjson", "table"]
+
+# --format table columns as (field, width); rows print as they arrive, so the widths are fixed up front
+USER_COLUMNS = [("username", 32), ("displayname", 32), ("uri", 0)]
+BOOK_COLUMNS = [("username", 32), ("bookname", 24), ("description", 32), ("contacts", 8), ("token", 0)]
+
+
+def output_rows(rows, format, columns):
+    """print streamed rows one per line, as NDJSON or as table columns"""
+    if format == "table":
+        click.echo("  ".join(name.upper().ljust(width) for name, width in columns).rstrip())
+    for row in rows:
+        if format == "ndjson":
+            click.echo(row.model_dump_json())
+        else:
+            values = [str(getattr(row, name) or "") for name, _ in columns]
+            click.echo("  ".join(value.ljust(width) for value, (_, width) in zip(values, columns)).rstrip())
+
+
 @click.group("bcc")
 @click.version_option(message=header)
 @click.option("-d", "--debug", is_eager=True, envvar="DEBUG", is_flag=True, callback=_ehandler, help="debug mode")
@@ -91,10 +111,16 @@ def bcc(
 
 
 @bcc.command
+@click.option(
+    "-f", "--format", type=click.Choice(FORMATS), default="json", help="output format; ndjson and table stream"
+)
 @click.pass_obj
-def users(ctx):
+def users(ctx, format):
     """list users"""
-    output(ctx.users())
+    if format == "json":
+        output(ctx.users())
+    else:
+        output_rows(ctx.iter_users(), format, USER_COLUMNS)
 
 
 @bcc.command
@@ -116,11 +142,26 @@ def rmuser(ctx, username):
 
 
 @bcc.command
+@click.argument("input", type=click.File("r"))
+@click.pass_obj
+def mkusers(ctx, input):
+    """add and delete users from a JSON batch file: {"add": [...], "delete": [...]}"""
+    batch = json.load(input)
+    output(ctx.users_batch(batch.get("add", []), batch.get("delete", [])))
+
+
+@bcc.command
+@click.option(
+    "-f", "--format", type=click.Choice(FORMATS), default="json", help="output format; ndjson and table stream"
+)
 @click.argument("username", required=False)
 @click.pass_obj
-def books(ctx, username):
+def books(ctx, format, username):
     """list address books for user"""
-    output(ctx.books(username))
+    if format == "json":
+        output(ctx.books(username))
+    else:
+        output_rows(ctx.iter_books(username), format, BOOK_COLUMNS)
 
 
 @bcc.command
@@ -133,6 +174,15 @@ def mkbook(ctx, username, name, description):
     output(ctx.add_book(username, name, description))
 
 
+@bcc.command
+@click.argument("input", type=click.File("r"))
+@click.pass_obj
+def mkbooks(ctx, input):
+    """add and delete address books from a JSON batch file: {"add": [...], "delete": [...]}"""
+    batch = json.load(input)
+    output(ctx.books_batch(batch.get("add", []), batch.get("delete", [])))
+
+
 @bcc.command
 @click.argument("username")
 @click.argument("token")
@@ -142,6 +192,39 @@ def rmbook(ctx, username, token):
     output(ctx.delete_book(username, token))
 
 
+@bcc.command
+@click.option("-n", "--dry-run", is_flag=True, help="output the plan without changing the server")
+@click.argument("input", type=click.File("r"))
+@click.pass_obj
+def apply(ctx, dry_run, input):
+    """converge users and address books to a desired state YAML file"""
+    result = ctx.apply(yaml.safe_load(input) or {}, dry_run)
+    if dry_run:
+        for step in result.plan:
+            click.echo(" ".join([step.action, step.username] + ([step.token] if step.token else [])))
+        click.echo(f"operations: {result.operations} (about {result.estimated_page_loads} admin page loads)")
+    else:
+        output(result)
+
+
+@bcc.command
+@click.option("-f", "--format", type=click.Choice(["chrome", "otlp"]), default="chrome", help="trace export format")
+@click.argument("id", required=False)
+@click.pass_obj
+def trace(ctx, format, id):
+    """list recent request traces, or export one"""
+    output(ctx.trace(id, format) if id else ctx.traces())
+
+
+@bcc.command
+@click.option("-w", "--wait", is_flag=True, help="wait for the job to finish")
+@click.argument("id")
+@click.pass_obj
+def job(ctx, wait, id):
+    """output queued job status"""
+    output(ctx.wait(id) if wait else ctx.job(id))
+
+
 @bcc.command
 @click.pass_obj
 def reset(ctx):
@@ -165,9 +248,17 @@ def version(ctx):
 
 @bcc.command
 @click.pass_obj
-def status(ctx):
+def health(ctx):
+    """output server health"""
+    output(ctx.health())
+
+
+@bcc.command
+@click.option("-r", "--refresh", is_flag=True, help="sample the session status now instead of serving the last one")
+@click.pass_obj
+def status(ctx, refresh):
     """output status"""
-    output(ctx.status())
+    output(ctx.status(refresh))
 
 
 @bcc.command
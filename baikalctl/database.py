@@ -0,0 +1,533 @@
+# baikalctl direct database backend
+
+import hashlib
+import logging
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+import arrow
+import yaml
+from pydantic import validate_call
+
+from .browser import SessionConfig
+from .exceptions import AddFailed, BrowserInterfaceFailure, DeleteFailed, InitFailed
+from .metrics import instrument
+from .models import (
+    Account,
+    AddBookRequest,
+    AddUserRequest,
+    Book,
+    DeleteBookRequest,
+    DeleteUserRequest,
+    User,
+    book_token,
+)
+from .version import __version__
+
+ADMIN_USERNAME = "admin"
+DEFAULT_REALM = "BaikalDAV"
+
+# Core/Resources/Db/SQLite/db.sql from the baikal distribution
+SQLITE_SCHEMA = """
+CREATE TABLE addressbooks (
+    id integer primary key asc NOT NULL,
+    principaluri text NOT NULL,
+    displayname text,
+    uri text NOT NULL,
+    description text,
+    synctoken integer DEFAULT 1 NOT NULL
+);
+CREATE TABLE cards (
+    id integer primary key asc NOT NULL,
+    addressbookid integer NOT NULL,
+    carddata blob,
+    uri text NOT NULL,
+    lastmodified integer,
+    etag text,
+    size integer
+);
+CREATE TABLE addressbookchanges (
+    id integer primary key asc NOT NULL,
+    uri text,
+    synctoken integer NOT NULL,
+    addressbookid integer NOT NULL,
+    operation integer NOT NULL
+);
+CREATE INDEX addressbookid_synctoken ON addressbookchanges (addressbookid, synctoken);
+CREATE TABLE calendarobjects (
+    id integer primary key asc NOT NULL,
+    calendardata blob NOT NULL,
+    uri text NOT NULL,
+    calendarid integer NOT NULL,
+    lastmodified integer NOT NULL,
+    etag text NOT NULL,
+    size integer NOT NULL,
+    componenttype text,
+    firstoccurence integer,
+    lastoccurence integer,
+    uid text
+);
+CREATE TABLE calendars (
+    id integer primary key asc NOT NULL,
+    synctoken integer DEFAULT 1 NOT NULL,
+    components text NOT NULL
+);
+CREATE TABLE calendarinstances (
+    id integer primary key asc NOT NULL,
+    calendarid integer,
+    principaluri text,
+    access integer,
+    displayname text,
+    uri text NOT NULL,
+    description text,
+    calendarorder integer,
+    calendarcolor text,
+    timezone text,
+    transparent bool,
+    share_href text,
+    share_displayname text,
+    share_invitestatus integer DEFAULT '2',
+    UNIQUE (principaluri, uri),
+    UNIQUE (calendarid, principaluri),
+    UNIQUE (calendarid, share_href)
+);
+CREATE TABLE calendarchanges (
+    id integer primary key asc NOT NULL,
+    uri text,
+    synctoken integer NOT NULL,
+    calendarid integer NOT NULL,
+    operation integer NOT NULL
+);
+CREATE INDEX calendarid_synctoken ON calendarchanges (calendarid, synctoken);
+CREATE TABLE calendarsubscriptions (
+    id integer primary key asc NOT NULL,
+    uri text NOT NULL,
+    principaluri text NOT NULL,
+    source text NOT NULL,
+    displayname text,
+    refreshrate text,
+    calendarorder integer,
+    calendarcolor text,
+    striptodos bool,
+    stripalarms bool,
+    stripattachments bool,
+    lastmodified int
+);
+CREATE TABLE schedulingobjects (
+    id integer primary key asc NOT NULL,
+    principaluri text NOT NULL,
+    calendardata blob,
+    uri text NOT NULL,
+    lastmodified integer,
+    etag text NOT NULL,
+    size integer NOT NULL
+);
+CREATE INDEX principaluri_uri ON calendarsubscriptions (principaluri, uri);
+CREATE TABLE locks (
+    id integer primary key asc NOT NULL,
+    owner text,
+    timeout integer,
+    created integer,
+    token text,
+    scope integer,
+    depth integer,
+    uri text
+);
+CREATE TABLE principals (
+    id INTEGER PRIMARY KEY ASC NOT NULL,
+    uri TEXT NOT NULL,
+    email TEXT,
+    displayname TEXT,
+    UNIQUE(uri)
+);
+CREATE TABLE groupmembers (
+    id INTEGER PRIMARY KEY ASC NOT NULL,
+    principal_id INTEGER NOT NULL,
+    member_id INTEGER NOT NULL,
+    UNIQUE(principal_id, member_id)
+);
+CREATE TABLE propertystorage (
+    id integer primary key asc NOT NULL,
+    path text NOT NULL,
+    name text NOT NULL,
+    valuetype integer NOT NULL,
+    value string
+);
+CREATE UNIQUE INDEX path_property ON propertystorage (path, name);
+CREATE TABLE users (
+    id integer primary key asc NOT NULL,
+    username TEXT NOT NULL,
+    digesta1 TEXT NOT NULL,
+    UNIQUE(username)
+);
+"""
+
+
+def create_database(filename: str):
+    """create an empty sqlite database with the baikal schema"""
+    with sqlite3.connect(filename) as connection:
+        connection.executescript(SQLITE_SCHEMA)
+    connection.close()
+
+
+def digest(username: str, realm: str, password: str) -> str:
+    """baikal stores the HTTP digest HA1 of each user's password"""
+    return hashlib.md5(f"{username}:{realm}:{password}".encode()).hexdigest()
+
+
+def admin_password_hashes(realm: str, password: str) -> List[str]:
+    """admin password hash as written by current (sha256) and older (md5) baikal releases"""
+    value = f"{ADMIN_USERNAME}:{realm}:{password}".encode()
+    return [hashlib.sha256(value).hexdigest(), hashlib.md5(value).hexdigest()]
+
+
+def read_config(filename: str) -> Dict[str, Any]:
+    path = Path(filename)
+    if not path.is_file():
+        raise BrowserInterfaceFailure(f"baikal config not found: {filename}")
+    return yaml.safe_load(path.read_text()) or {}
+
+
+@instrument("database", ["_query"])
+class DatabaseSession:
+    """read and write the baikal database directly, using the server's baikal.yaml for its settings"""
+
+    def __init__(self, index=0, **kwargs):
+
+        config = SessionConfig(**kwargs)
+
+        if isinstance(config.logger, str):
+            self.logger = logging.getLogger(config.logger)
+        else:
+            self.logger = config.logger
+
+        self.logger.setLevel(config.log_level)
+
+        self.logger.info("startup")
+        self.connection = None
+        self.logged_in = False
+        self.account = None
+        self.startup_time = arrow.now()
+        self.reset_time = None
+
+        self.url = config.url
+        self.index = index
+        self.cert_file = config.cert
+        self.debug = config.debug
+        self.api_key = config.api_key
+        self.config_file = config.baikal_config
+        baikal = read_config(self.config_file)
+        system = baikal.get("system", {})
+        self.database = baikal.get("database", {})
+        self.realm = system.get("auth_realm", DEFAULT_REALM)
+        self.admin_hash = system.get("admin_passwordhash", None)
+        self.backend = self.database.get("backend", "mysql" if self.database.get("mysql") else "sqlite")
+
+    def _connect(self):
+        if self.connection:
+            return
+        if self.backend == "sqlite":
+            filename = self.database.get("sqlite_file", None)
+            if not filename or not Path(filename).is_file():
+                raise BrowserInterfaceFailure(f"baikal sqlite database not found: {filename}")
+            self.connection = sqlite3.connect(filename, check_same_thread=False)
+            self.placeholder = "?"
+        elif self.backend == "mysql":
+            try:
+                import pymysql
+            except ImportError:
+                raise BrowserInterfaceFailure("the mysql database backend requires the pymysql package")
+            self.connection = pymysql.connect(
+                host=self.database.get("mysql_host", "localhost"),
+                user=self.database.get("mysql_username", ""),
+                password=self.database.get("mysql_password", ""),
+                database=self.database.get("mysql_dbname", ""),
+                autocommit=False,
+            )
+            self.placeholder = "%s"
+        else:
+            raise BrowserInterfaceFailure(f"unsupported baikal database backend: {self.backend}")
+
+    def _query(self, sql: str, *args) -> List[tuple]:
+        self._connect()
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(sql.replace("?", self.placeholder), args)
+            return list(cursor.fetchall())
+        finally:
+            cursor.close()
+
+    @contextmanager
+    def _transaction(self):
+        """yield an execute(sql, *args) function returning the row id; commit on success, roll back on error"""
+        self._connect()
+        cursor = self.connection.cursor()
+
+        def execute(sql, *args):
+            cursor.execute(sql.replace("?", self.placeholder), args)
+            return cursor.lastrowid
+
+        try:
+            yield execute
+            self.connection.commit()
+        except Exception:
+            self.connection.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    def warm(self, admin: Account | None = None):
+        """open the database connection ahead of the first request, logging in as admin when given"""
+        self.logger.info("warm")
+        self._connect()
+        if admin:
+            self.login(admin)
+
+    def alive(self) -> bool | None:
+        """None until the database connection is opened, else True"""
+        return None if self.connection is None else True
+
+    def shutdown(self):
+        self.logger.info("shutdown")
+        self.logged_in = False
+        self.account = None
+        if self.connection:
+            self.connection.close()
+            self.connection = None
+
+    def _principal(self, username: str) -> str:
+        return f"principals/{username}"
+
+    def _user_uri(self, username: str) -> str:
+        return f"{self.url}/dav.php/principals/{username}/"
+
+    def _book_uri(self, username: str, token: str) -> str:
+        return f"{self.url}/dav.php/addressbooks/{username}/{token}/"
+
+    @validate_call
+    def login(self, admin: Account):
+        if self.account == admin:
+            return
+        self._authenticate(admin)
+
+    def _authenticate(self, admin: Account):
+        self.logger.info("login")
+        if self.admin_hash is None:
+            raise BrowserInterfaceFailure("admin password hash not found in baikal config")
+        if admin.username != ADMIN_USERNAME or self.admin_hash not in admin_password_hashes(self.realm, admin.password):
+            raise BrowserInterfaceFailure(f"login failed for '{admin.username}'")
+        self._connect()
+        self.logged_in = admin.username
+        self.account = admin
+        self.logger.info(f"Successfull login as '{admin.username}'")
+
+    def logout(self):
+        if self.logged_in:
+            self._logout()
+
+    def _logout(self):
+        self.logger.info("logout")
+        self.logged_in = False
+        self.account = None
+
+    @validate_call
+    def initialize(self, admin: Account) -> Dict[str, str]:
+        raise InitFailed("initialize is not supported by the database backend")
+
+    def _user_exists(self, username: str) -> bool:
+        return bool(self._query("SELECT id FROM users WHERE username = ?", username))
+
+    @validate_call
+    def users(self, admin: Account) -> List[User]:
+        return list(self.iter_users(admin))
+
+    @validate_call
+    def iter_users(self, admin: Account) -> Iterator[User]:
+        self.logger.info("list_users")
+        self.login(admin)
+        principals = {
+            uri: (displayname, email)
+            for uri, displayname, email in self._query("SELECT uri, displayname, email FROM principals")
+        }
+        for (username,) in self._query("SELECT username FROM users ORDER BY id"):
+            displayname, email = principals.get(self._principal(username), ("", ""))
+            yield User(username=username, displayname=displayname, email=email, uri=self._user_uri(username))
+
+    @validate_call
+    def add_user(self, admin: Account, request: AddUserRequest) -> User:
+        self.logger.info(f"add_user {request.username} {request.displayname} ************")
+        user = User(**request.model_dump())
+        # the admin UI's add user form defaults the email address to the username
+        user.email = user.email or user.username
+        self.login(admin)
+        if self._user_exists(user.username):
+            raise AddFailed(f"user exists: username={user.username}")
+        principal = self._principal(user.username)
+        with self._transaction() as execute:
+            execute(
+                "INSERT INTO users (username, digesta1) VALUES (?, ?)",
+                user.username,
+                digest(user.username, self.realm, request.password),
+            )
+            execute(
+                "INSERT INTO principals (uri, email, displayname) VALUES (?, ?, ?)",
+                principal,
+                user.email,
+                user.displayname,
+            )
+            # the admin UI gives every new user a default address book and calendar
+            execute(
+                "INSERT INTO addressbooks (principaluri, displayname, uri, description, synctoken)"
+                " VALUES (?, ?, ?, ?, 1)",
+                principal,
+                "Default Address Book",
+                "default",
+                "Default Address Book",
+            )
+            calendar_id = execute("INSERT INTO calendars (synctoken, components) VALUES (1, ?)", "VEVENT,VTODO")
+            execute(
+                "INSERT INTO calendarinstances (calendarid, principaluri, access, displayname, uri, description,"
+                " calendarorder, calendarcolor, transparent) VALUES (?, ?, 1, ?, ?, ?, 0, '', 0)",
+                calendar_id,
+                principal,
+                "Default calendar",
+                "default",
+                "Default calendar",
+            )
+        return User(
+            username=user.username, displayname=user.displayname, email=user.email, uri=self._user_uri(user.username)
+        )
+
+    @validate_call
+    def delete_user(self, admin: Account, request: DeleteUserRequest) -> Dict[str, str]:
+        username = request.username
+        self.logger.info(f"delete_user {username}")
+        self.login(admin)
+        if not self._user_exists(username):
+            raise DeleteFailed(f"user not found: {username=}")
+        principal = self._principal(username)
+        books = "SELECT id FROM addressbooks WHERE principaluri = ?"
+        calendars = "SELECT calendarid FROM calendarinstances WHERE principaluri = ? AND access = 1"
+        with self._transaction() as execute:
+            execute(f"DELETE FROM cards WHERE addressbookid IN ({books})", principal)
+            execute(f"DELETE FROM addressbookchanges WHERE addressbookid IN ({books})", principal)
+            execute("DELETE FROM addressbooks WHERE principaluri = ?", principal)
+            execute(f"DELETE FROM calendarobjects WHERE calendarid IN ({calendars})", principal)
+            execute(f"DELETE FROM calendarchanges WHERE calendarid IN ({calendars})", principal)
+            execute(f"DELETE FROM calendars WHERE id IN ({calendars})", principal)
+            execute("DELETE FROM calendarinstances WHERE principaluri = ?", principal)
+            execute("DELETE FROM principals WHERE uri = ?", principal)
+            execute("DELETE FROM users WHERE username = ?", username)
+        return dict(message=f"deleted user: {username}")
+
+    def _books(self, username: str, token: str | None = None) -> List[Book]:
+        sql = (
+            "SELECT a.uri, a.displayname, a.description, COUNT(c.id) FROM addressbooks a"
+            " LEFT JOIN cards c ON c.addressbookid = a.id WHERE a.principaluri = ?"
+        )
+        args = [self._principal(username)]
+        if token is not None:
+            sql += " AND a.uri = ?"
+            args.append(token)
+        sql += " GROUP BY a.id, a.uri, a.displayname, a.description ORDER BY a.id"
+        return [
+            Book(
+                username=username,
+                bookname=displayname or "",
+                description=description or "",
+                contacts=contacts,
+                uri=self._book_uri(username, uri),
+                token=uri,
+            )
+            for uri, displayname, description, contacts in self._query(sql, *args)
+        ]
+
+    @validate_call
+    def books(self, admin: Account, username: str) -> List[Book]:
+        self.logger.info(f"list_address_books {username}")
+        self.login(admin)
+        return self._books(username)
+
+    @validate_call
+    def book_links(self, admin: Account) -> Dict[str, str]:
+        """map each username to itself; the database backend reads books by username"""
+        self.logger.info("list_address_book_links")
+        self.login(admin)
+        return {username: username for (username,) in self._query("SELECT username FROM users ORDER BY id")}
+
+    @validate_call
+    def books_at(self, admin: Account, username: str, href: str) -> List[Book]:
+        return self.books(admin, username)
+
+    @validate_call
+    def add_book(self, admin: Account, request: AddBookRequest) -> Book:
+        self.logger.info(f"add_address_book {request.username} {request.bookname} {request.description}")
+        self.login(admin)
+        if not self._user_exists(request.username):
+            raise AddFailed(f"user not found: username={request.username}")
+        token = book_token(request.username, request.bookname)
+        book = Book(token=token, **request.model_dump())
+        if self._books(book.username, book.token):
+            raise AddFailed(f"address book exists: username={book.username} token={book.token}")
+        with self._transaction() as execute:
+            execute(
+                "INSERT INTO addressbooks (principaluri, displayname, uri, description, synctoken)"
+                " VALUES (?, ?, ?, ?, 1)",
+                self._principal(book.username),
+                book.bookname,
+                book.token,
+                book.description or "",
+            )
+        return self._books(book.username, book.token)[0]
+
+    @validate_call
+    def delete_book(self, admin: Account, request: DeleteBookRequest) -> Dict[str, str]:
+        self.logger.info(f"delete_address_book {request.username} {request.token}")
+        self.login(admin)
+        if not self._user_exists(request.username):
+            raise DeleteFailed(f"user not found: username={request.username}")
+        rows = self._query(
+            "SELECT id FROM addressbooks WHERE principaluri = ? AND uri = ?",
+            self._principal(request.username),
+            request.token,
+        )
+        if not rows:
+            raise DeleteFailed(f"book not found: username={request.username} token={request.token}")
+        book_id = rows[0][0]
+        with self._transaction() as execute:
+            execute("DELETE FROM cards WHERE addressbookid = ?", book_id)
+            execute("DELETE FROM addressbookchanges WHERE addressbookid = ?", book_id)
+            execute("DELETE FROM addressbooks WHERE id = ?", book_id)
+        return dict(message=f"deleted_book: {request.token}")
+
+    @validate_call
+    def reset(self, admin: Account) -> Dict[str, str]:
+        self.logger.info("reset")
+        self.shutdown()
+        self.login(admin)
+        self.reset_time = arrow.now()
+        return dict(message="server reset")
+
+    @validate_call
+    def status(self, admin: Account) -> Dict[str, str]:
+        self.logger.info("status")
+
+        try:
+            self.login(admin)
+            login = "success"
+        except Exception as e:
+            login = f"failed: {repr(e)}"
+
+        return dict(
+            name="baikalctl",
+            version=__version__,
+            backend="database",
+            database=self.backend,
+            config=self.config_file,
+            url=self.url,
+            uptime=self.startup_time.humanize(),
+            reset=self.reset_time.humanize() if self.reset_time else "never",
+            login=login,
+        )
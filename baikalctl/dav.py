@@ -0,0 +1,135 @@
+# baikalctl carddav client
+
+import logging
+from typing import List
+from urllib.parse import quote, unquote, urljoin, urlsplit
+from xml.etree.ElementTree import iterparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.auth import HTTPBasicAuth, HTTPDigestAuth
+
+from .exceptions import BrowserInterfaceFailure, UnexpectedServerResponse
+from .models import Book
+
+REQUEST_TIMEOUT = 30
+
+DAV = "{DAV:}"
+CARDDAV = "{urn:ietf:params:xml:ns:carddav}"
+
+PROPFIND_BOOKS = """<?xml version="1.0" encoding="utf-8"?>
+<d:propfind xmlns:d="DAV:" xmlns:card="urn:ietf:params:xml:ns:carddav">
+  <d:prop>
+    <d:resourcetype/>
+    <d:displayname/>
+    <card:addressbook-description/>
+  </d:prop>
+</d:propfind>
+"""
+
+PROPFIND_CARDS = """<?xml version="1.0" encoding="utf-8"?>
+<d:propfind xmlns:d="DAV:">
+  <d:prop>
+    <d:getetag/>
+  </d:prop>
+</d:propfind>
+"""
+
+
+class DavClient:
+    """list address books with CardDAV PROPFIND requests instead of crawling the admin UI
+
+    one request lists a user's books; counting contacts costs another request per book, listing every card,
+    so it is off by default and contacts is then 0
+    """
+
+    def __init__(
+        self,
+        url,
+        username,
+        password,
+        *,
+        cert=None,
+        key=None,
+        auth="digest",
+        count_contacts=False,
+        pool_size=4,
+        logger=None,
+    ):
+        if logger is None:
+            logger = __name__
+        if isinstance(logger, str):
+            self.logger = logging.getLogger(logger)
+        else:
+            self.logger = logger
+        self.url = url.rstrip("/")
+        self.count_contacts = count_contacts
+        self.client = requests.Session()
+        if cert:
+            self.client.cert = (cert, key)
+        if auth == "digest":
+            self.client.auth = HTTPDigestAuth(username, password)
+        elif auth == "basic":
+            self.client.auth = HTTPBasicAuth(username, password)
+        else:
+            raise ValueError(f"unsupported DAV auth type: {auth}")
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.client.mount("http://", adapter)
+        self.client.mount("https://", adapter)
+
+    def shutdown(self):
+        self.client.close()
+
+    def _propfind(self, url: str, body: str):
+        """yield each DAV:response element of a Depth: 1 PROPFIND as it is parsed from the stream"""
+        self.logger.info(f"PROPFIND {url}")
+        try:
+            response = self.client.request(
+                "PROPFIND",
+                url,
+                data=body.encode(),
+                headers={"Depth": "1", "Content-Type": "application/xml; charset=utf-8"},
+                stream=True,
+                timeout=REQUEST_TIMEOUT,
+            )
+        except requests.RequestException as ex:
+            raise BrowserInterfaceFailure(repr(ex))
+        with response:
+            if response.status_code == 404:
+                return
+            if response.status_code != 207:
+                raise UnexpectedServerResponse(f"PROPFIND {url}: {response.status_code} {response.reason}")
+            response.raw.decode_content = True
+            for _, element in iterparse(response.raw, events=["end"]):
+                if element.tag == DAV + "response":
+                    yield element
+                    element.clear()
+
+    def _contacts(self, url: str) -> int:
+        # the collection itself is the first response
+        return max(sum(1 for _ in self._propfind(url, PROPFIND_CARDS)) - 1, 0)
+
+    def books(self, username: str) -> List[Book]:
+        home = f"{self.url}/dav.php/addressbooks/{quote(username)}/"
+        ret = []
+        for response in self._propfind(home, PROPFIND_BOOKS):
+            href = response.findtext(DAV + "href", "")
+            resourcetype = response.find(f".//{DAV}prop/{DAV}resourcetype")
+            if resourcetype is None or resourcetype.find(CARDDAV + "addressbook") is None:
+                continue
+            url = urljoin(self.url + "/", urlsplit(href).path)
+            uri = unquote(url)
+            ret.append(
+                dict(
+                    username=username,
+                    bookname=response.findtext(f".//{DAV}prop/{DAV}displayname", ""),
+                    description=response.findtext(f".//{DAV}prop/{CARDDAV}addressbook-description", ""),
+                    uri=uri,
+                    token=uri.rstrip("/").split("/")[-1],
+                    url=url,
+                )
+            )
+        if self.count_contacts:
+            for book in ret:
+                book["contacts"] = self._contacts(book["url"])
+        return [Book(**book) for book in ret]
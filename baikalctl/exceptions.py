@@ -0,0 +1,25 @@
+# baikalctl exceptions
+
+
+class BrowserException(Exception):
+    pass
+
+
+class BrowserInterfaceFailure(BrowserException):
+    pass
+
+
+class InitFailed(BrowserException):
+    pass
+
+
+class AddFailed(BrowserException):
+    pass
+
+
+class DeleteFailed(BrowserException):
+    pass
+
+
+class UnexpectedServerResponse(BrowserException):
+    pass
@@ -1,12 +1,30 @@
 # firefox profile
 
+import hashlib
 import logging
+import os
 import shlex
+import shutil
 import subprocess
 import tempfile
+import threading
 import time
 from pathlib import Path
 
+from cryptography import x509
+from cryptography.hazmat.primitives.serialization import (
+    NoEncryption,
+    load_pem_private_key,
+    pkcs12,
+)
+from cryptography.x509.oid import NameOID
+
+FIREFOX = "/usr/bin/firefox"
+FINGERPRINT_FILE = "baikalctl.fingerprint"
+POLL_INTERVAL = 0.2
+# the NSS certificate and key databases; certutil output only changes when one of these does
+NSS_DB_FILES = ["cert9.db", "key4.db"]
+
 
 def countFiles(dir):
     dir = Path(dir)
@@ -33,25 +51,64 @@ def run(cmd, **kwargs):
     return subprocess.run(shlex.split(cmd), **kwargs)
 
 
+def loadCert(cert):
+    """return the certificate and private key from a PEM or DER certificate or a passwordless .p12 file"""
+    data = Path(cert).read_bytes()
+    if Path(cert).suffix == ".p12":
+        key, certificate, _ = pkcs12.load_key_and_certificates(data, None)
+        return certificate, key
+    if b"-----BEGIN" in data:
+        return x509.load_pem_x509_certificate(data), None
+    return x509.load_der_x509_certificate(data), None
+
+
 def commonName(cert):
-    with tempfile.NamedTemporaryFile(suffix=".pem") as tf:
-        pemCert = cert
-        if Path(cert).suffix == ".p12":
-            run(f"openssl pkcs12 -in {str(cert)} -nokeys -out {tf.name} -password pass:")
-            pemCert = tf.name
-        cmd = f"openssl x509 -in {pemCert} -noout -subject"
-        out = subprocess.check_output(shlex.split(cmd))
-        out = out.decode().strip()
-        if out.lower().startswith("subject=cn"):
-            prefix, _, name = out.partition("=CN")
-            name = name.strip(" =")
-            return name
-        raise RuntimeError(f"Failed to parse subject CN from certificate {cert} {repr(out)}")
+    certificate, _ = loadCert(cert)
+    names = certificate.subject.get_attributes_for_oid(NameOID.COMMON_NAME)
+    if names:
+        return names[0].value
+    raise RuntimeError(f"Failed to parse subject CN from certificate {cert} {certificate.subject.rfc4514_string()}")
+
+
+def pkcs12Bundle(cert, key, name):
+    """return a passwordless PKCS#12 bundle of cert and its key, as pk12util imports it"""
+    certificate, bundled_key = loadCert(cert)
+    if key:
+        bundled_key = load_pem_private_key(Path(key).read_bytes(), None)
+    return pkcs12.serialize_key_and_certificates(name.encode(), bundled_key, certificate, None, NoEncryption())
+
+
+def firefox_version(binary=FIREFOX):
+    """identify the installed firefox from its application.ini, falling back to the binary's size and mtime"""
+    path = Path(os.path.realpath(binary))
+    ini = path.parent / "application.ini"
+    if ini.is_file():
+        for line in ini.read_text().splitlines():
+            if line.startswith("Version="):
+                return line.partition("=")[2].strip()
+    if path.is_file():
+        stat = path.stat()
+        return f"{stat.st_size}:{stat.st_mtime_ns}"
+    return "unknown"
+
+
+def fingerprint(cert, key=None):
+    """hash of the client certificate, its key and the firefox version a profile was built for"""
+    digest = hashlib.sha256(firefox_version().encode())
+    for filename in [cert, key]:
+        if filename:
+            digest.update(Path(filename).read_bytes())
+    return digest.hexdigest()
 
 
 class Profile:
+    """firefox profile holding the client certificate
 
-    def __init__(self, name, dir, create_timeout, stabilize_time, logger=None):
+    a profile records the fingerprint of the cert and firefox version it was built with; when that
+    matches, creation and cert import are skipped, and clones of a template inherit it
+    """
+
+    def __init__(self, name, dir, create_timeout, stabilize_time, logger=None, template=None, cert=None, key=None):
         if logger is None:
             logger = __name__
         if isinstance(logger, str):
@@ -63,51 +120,90 @@ class Profile:
         self.create_timeout = create_timeout
         self.stabilize_time = stabilize_time
         self.dir.mkdir(parents=True, exist_ok=True)
+        self.certs_lock = threading.Lock()
+        self.certs = (None, {})
+        self.fingerprint = fingerprint(cert, key) if cert else None
+        if self.fingerprint and self.current():
+            self.logger.info(f"Profile {self.name} is current")
+            return
+        if self.fingerprint and countFiles(self.dir) > 0:
+            # built for another cert or firefox version; start over rather than stack certs in its NSS DB
+            self.logger.info(f"Rebuilding stale profile {self.name}")
+            shutil.rmtree(self.dir)
+            self.dir.mkdir(parents=True)
         if countFiles(self.dir) < 3:
-            self.create()
+            if template:
+                self.clone(template)
+            else:
+                self.create()
+        if self.fingerprint and not self.current():
+            self.AddCert(cert, key)
+            (self.dir / FINGERPRINT_FILE).write_text(self.fingerprint)
+
+    def current(self):
+        """true when the profile was built for this cert and firefox version"""
+        path = self.dir / FINGERPRINT_FILE
+        return path.is_file() and path.read_text().strip() == self.fingerprint
 
     def create(self):
         self.logger.info("Creating profile...")
-        run(f"/usr/bin/firefox --headless --createprofile '{self.name} {self.dir}'")
-        proc = subprocess.Popen(shlex.split(f"/usr/bin/firefox --headless --profile {self.dir} --first-startup"))
+        run(f"{FIREFOX} --headless --createprofile '{self.name} {self.dir}'")
+        proc = subprocess.Popen(shlex.split(f"{FIREFOX} --headless --profile {self.dir} --first-startup"))
         timeout_tick = time.time() + self.create_timeout
-        stable = 0
         lastcount = 0
-        while stable <= self.stabilize_time:
+        changed = time.time()
+        # done once the file count has held steady for stabilize_time seconds
+        while time.time() - changed <= self.stabilize_time:
             if time.time() > timeout_tick:
                 raise RuntimeError("timeout waiting for profile init")
             if proc.poll() is not None:
                 raise RuntimeError("firefox exited unexpectedly")
             count = countFiles(self.dir)
-            if count == lastcount:
-                stable += 1
-            else:
-                stable = 0
+            if count != lastcount:
+                changed = time.time()
             lastcount = count
-            time.sleep(1)
+            time.sleep(POLL_INTERVAL)
         proc.kill()
         proc.wait()
         self.logger.info(f"Profile {self.name} written to {self.dir}")
 
+    def clone(self, template):
+        self.logger.info(f"Cloning profile from {template}...")
+        shutil.copytree(
+            template, self.dir, dirs_exist_ok=True, ignore=shutil.ignore_patterns("lock", ".parentlock", "parent.lock")
+        )
+        self.logger.info(f"Profile {self.name} cloned to {self.dir}")
+
+    def _dbStat(self):
+        stats = []
+        for name in NSS_DB_FILES:
+            path = self.dir / name
+            stats.append((path.stat().st_mtime_ns, path.stat().st_size) if path.is_file() else None)
+        return tuple(stats)
+
     def ListCerts(self):
-        certlist = mklist(subprocess.check_output(shlex.split(f"certutil -L -d sql:{str(self.dir)}")))
-        certs = {}
-        for certline in certlist:
-            fields = certline.split()
-            key = " ".join(fields[:-1])
-            value = fields[-1]
-            certs[key] = value
-        return certs
+        """return {nickname: trust} for the certs in the profile, running certutil only when the NSS DB changed"""
+        with self.certs_lock:
+            stat, certs = self.certs
+            if stat is not None and stat == self._dbStat():
+                return dict(certs)
+            stat = self._dbStat()
+            certlist = mklist(subprocess.check_output(shlex.split(f"certutil -L -d sql:{str(self.dir)}")))
+            certs = {}
+            for certline in certlist:
+                fields = certline.split()
+                key = " ".join(fields[:-1])
+                value = fields[-1]
+                certs[key] = value
+            self.certs = (stat, certs)
+            return dict(certs)
 
     def AddCert(self, cert, key=None):
         certName = commonName(cert)
         self.logger.info("Adding client certificate...")
         with tempfile.NamedTemporaryFile(suffix=".p12") as tf:
-            if Path(cert).suffix != ".p12":
-                cmd = f"openssl pkcs12 -export -in {str(cert)} -inkey {str(key)} -out {tf.name} -passout pass:"
-                run(cmd)
-                cert = tf.name
-            cmd = f"pk12util -i {cert} -n '{certName}' -d sql:{str(self.dir)} -W ''"
-            run(cmd)
+            tf.write(pkcs12Bundle(cert, key, certName))
+            tf.flush()
+            run(f"pk12util -i {tf.name} -n '{certName}' -d sql:{str(self.dir)} -W ''")
         self.logger.info(f"Certificate {certName} added to profile {self.name}.")
         return certName
@@ -0,0 +1,487 @@
+# baikalctl browserless admin form client
+
+import logging
+import time
+from typing import Dict, Iterator, List, Tuple
+from urllib.parse import urljoin
+
+import arrow
+import requests
+from bs4 import BeautifulSoup, Tag
+from pydantic import validate_call
+from requests.adapters import HTTPAdapter
+
+from . import pages
+from .browser import SessionConfig
+from .exceptions import (
+    AddFailed,
+    BrowserInterfaceFailure,
+    DeleteFailed,
+    InitFailed,
+    UnexpectedServerResponse,
+)
+from .metrics import instrument
+from .models import (
+    Account,
+    AddBookRequest,
+    AddUserRequest,
+    Book,
+    DeleteBookRequest,
+    DeleteUserRequest,
+    User,
+    book_token,
+)
+from .navigation import ADD_USER_PAGE, ADMIN_PAGE, NEW_SUFFIX, USERS_PAGE, Navigator
+from .version import __version__
+
+REQUEST_TIMEOUT = 30
+
+
+@instrument("forms", ["_get", "_follow", "_load_page", "_submit"])
+class FormSession:
+    """drive the baikal admin UI by submitting its HTML forms directly, without a browser"""
+
+    def __init__(self, index=0, **kwargs):
+
+        config = SessionConfig(**kwargs)
+
+        if isinstance(config.logger, str):
+            self.logger = logging.getLogger(config.logger)
+        else:
+            self.logger = config.logger
+
+        self.logger.setLevel(config.log_level)
+
+        self.logger.info("startup")
+        self.client = None
+        self.page = None
+        self.page_url = None
+        self.nav = Navigator()
+        self.logged_in = False
+        self.account = None
+        self.last_used = 0.0
+        self.login_ttl = config.login_ttl
+        self.startup_time = arrow.now()
+        self.reset_time = None
+
+        self.url = config.url
+        self.index = index
+        self.cert_file = config.cert
+        self.key_file = config.key
+        self.debug = config.debug
+        self.api_key = config.api_key
+
+    def _load_client(self):
+        if not self.client:
+            self.client = requests.Session()
+            if self.cert_file:
+                self.client.cert = (self.cert_file, self.key_file)
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+            self.client.mount("http://", adapter)
+            self.client.mount("https://", adapter)
+
+    def warm(self, admin: Account | None = None):
+        """open the HTTP client ahead of the first request, logging in as admin when given"""
+        self.logger.info("warm")
+        self._load_client()
+        if admin:
+            self.login(admin)
+
+    def alive(self) -> bool | None:
+        """None until the HTTP client is opened, else True"""
+        return None if self.client is None else True
+
+    def shutdown(self):
+        self.logger.info("shutdown")
+        if self.logged_in:
+            self.logout()
+        if self.client:
+            self.client.close()
+            self.client = None
+        self.page = None
+        self.page_url = None
+        self.nav.changed()
+
+    def _request(self, method: str, url: str, relogin: bool = True, **kwargs) -> BeautifulSoup:
+        if method == "GET" and self.nav.current(url):
+            self.logger.debug(f"already at {url}")
+            return self.page
+        self._load_page(method, url, **kwargs)
+        if relogin and method == "GET" and self.logged_in and pages.is_login_page(self.page):
+            # the server dropped our login; sign in again and repeat the request
+            account = self.account
+            self.logger.warning(f"login bounced at {url}; logging in again as '{account.username}'")
+            self.logged_in = False
+            self.account = None
+            self.login(account)
+            self._load_page(method, url, **kwargs)
+        return self.page
+
+    def _load_page(self, method: str, url: str, **kwargs):
+        self._load_client()
+        self.logger.info(f"{method} {url}")
+        try:
+            response = self.client.request(method, url, timeout=REQUEST_TIMEOUT, **kwargs)
+        except requests.RequestException as ex:
+            raise BrowserInterfaceFailure(repr(ex))
+        if not response.ok:
+            raise UnexpectedServerResponse(f"{method} {url}: {response.status_code} {response.reason}")
+        self.page_url = response.url
+        self.page = pages.parse(response.text)
+        # a submit lands on a page that may differ from its action url, so only a GET is tracked
+        self.nav.loaded(url if method == "GET" else None)
+
+    @property
+    def page_loads(self) -> int:
+        return self.nav.loads
+
+    def _get(self, path: str, relogin: bool = True) -> BeautifulSoup:
+        return self._request("GET", self.url + path, relogin)
+
+    def _follow(self, href: str, relogin: bool = True) -> BeautifulSoup:
+        return self._request("GET", urljoin(self.page_url, href), relogin)
+
+    def _submit(self, name: str, values: Dict[str, str], selector: str = "body form") -> BeautifulSoup:
+        action, fields = pages.form(self.page, self.page_url, selector)
+        fields.update(values)
+        self.logger.info(f"submit {name}")
+        return self._request("POST", action, data=fields)
+
+    @validate_call
+    def _check_popups(self, require_none: bool | None = False) -> List[str]:
+        ret = pages.messages(self.page)
+        if ret and require_none:
+            raise UnexpectedServerResponse("\n".join(ret).replace("\n", ": "))
+        return ret
+
+    def _login_current(self, admin: Account) -> bool:
+        """true when this session holds a login for admin that has not been idle longer than login_ttl"""
+        return self.logged_in and self.account == admin and time.monotonic() - self.last_used < self.login_ttl
+
+    @validate_call
+    def login(self, admin: Account):
+        # every operation starts here; pages loaded by an earlier operation may be stale
+        self.nav.expire()
+        if self._login_current(admin):
+            self.last_used = time.monotonic()
+            return
+        if self.logged_in:
+            self.logout()
+        self._authenticate(admin)
+
+    def _authenticate(self, admin: Account):
+        self.logger.info("login")
+
+        self._get(ADMIN_PAGE)
+
+        title = pages.title(self.page)
+        if title == "Baïkal Maintainance":
+            raise BrowserInterfaceFailure("server not initialized")
+
+        self.logger.info(f"connected to {title}")
+
+        if not pages.is_login_page(self.page):
+            # the server still holds an earlier login; end it so these credentials are checked
+            self.logger.info("ending previous server login")
+            self._follow(self._navbar_link("Logout"), relogin=False)
+            if not pages.is_login_page(self.page):
+                raise BrowserInterfaceFailure("logout failed: login page not shown")
+
+        self._submit("login", {"login": admin.username, "password": admin.password})
+        self._check_popups(require_none=True)
+        if pages.is_login_page(self.page):
+            raise BrowserInterfaceFailure("login rejected")
+        self.logged_in = admin.username
+        self.account = admin
+        self.last_used = time.monotonic()
+        self.logger.info(f"Successfull login as '{admin.username}'")
+
+    @validate_call
+    def initialize(self, admin: Account) -> Dict[str, str]:
+        self.logger.info("initialize")
+
+        self._get("/admin/install/")
+        title = pages.title(self.page)
+        if title == "" and "Installation was already completed." in self.page.get_text():
+            raise InitFailed("already initialized")
+
+        if title != "Baïkal Maintainance":
+            raise BrowserInterfaceFailure(f"unexpected page title: {title}")
+
+        while True:
+            start = pages.links(self.page, "body .btn-success").get("Start using Baïkal", None)
+            if start is not None:
+                self._follow(start)
+                if self.page_url.endswith("/admin/"):
+                    return dict(message="initialized")
+                raise InitFailed(f"unexpected url after start button: {self.page_url}")
+            jumbotron = self.page.select_one("body .jumbotron")
+            if jumbotron is None:
+                raise BrowserInterfaceFailure("initialization title not found")
+            title_text = pages.text(jumbotron).lower()
+            if "database setup" in title_text:
+                self._submit("database init", {})
+            elif "initialization wizard" in title_text:
+                timezones = pages.select_options(self.page, 'body form select[name="data[timezone]"]')
+                values = {
+                    "data[timezone]": timezones.get("UTC", "UTC"),
+                    "data[invite_from]": "",
+                    "data[admin_passwordhash]": admin.password,
+                    "data[admin_passwordhash_confirm]": admin.password,
+                }
+                self._submit("general init", values)
+            else:
+                raise InitFailed(f"unexpected init title: {pages.text(jumbotron)}")
+
+    def logout(self):
+        if self.logged_in:
+            self._logout()
+
+    def _logout(self):
+        self.logger.info("logout")
+        self._get(ADMIN_PAGE, relogin=False)
+        if not pages.is_login_page(self.page):
+            self._follow(self._navbar_link("Logout"), relogin=False)
+        self.logged_in = False
+        self.account = None
+
+    @validate_call
+    def _navbar_link(self, label: str) -> str:
+        links = pages.navbar_links(self.page)
+        if label not in links:
+            raise BrowserInterfaceFailure(f"navbar link not found: expected={label} links={list(links.keys())}")
+        return links[label]
+
+    def _select_user_page(self):
+        self._get(USERS_PAGE)
+
+    def _table_rows(self, name: str, allow_none: bool | None = True) -> List[Tag]:
+        rows = pages.table_rows(self.page)
+        if not rows:
+            message = f"no {name} table body rows found"
+            if allow_none:
+                self.logger.warning(message)
+            else:
+                raise BrowserInterfaceFailure(message)
+        return rows
+
+    @validate_call
+    def users(self, admin: Account) -> List[User]:
+        return list(self.iter_users(admin))
+
+    @validate_call
+    def iter_users(self, admin: Account) -> Iterator[User]:
+        """yield users as their rows are parsed from one load of the users page"""
+        self.logger.info("list_users")
+        self.login(admin)
+        self._select_user_page()
+        for row in self._table_rows("users"):
+            yield User(**pages.parse_user_row(row))
+
+    def _find_user_row(self, username: str, allow_none: bool | None = True) -> Tuple[Tag | None, Dict | None]:
+        self._select_user_page()
+        for row in self._table_rows("users", allow_none=allow_none):
+            user = pages.parse_user_row(row)
+            if user["username"] == username:
+                return row, user
+        self.logger.warning(f"user {username} not found")
+        if allow_none:
+            return None, None
+        raise BrowserInterfaceFailure(f"failed to locate user row: {username=}")
+
+    def _select_user_address_books(self, username: str, allow_none: bool | None = True):
+        row, _ = self._find_user_row(username, allow_none=allow_none)
+        if row is None:
+            return None
+        self._follow(pages.row_actions(row)["Address Books"])
+        return True
+
+    @validate_call
+    def _check_add_popups(self, name: str, expected: str):
+        popups = self._check_popups()
+        if expected in popups:
+            return
+        elif popups:
+            message = ": ".join(popups).replace("\n", ": ")
+        else:
+            message = "missing add response"
+        self.logger.error(message)
+        raise AddFailed(message)
+
+    def _find_row(self, name: str, parse, key: str, value: str) -> Dict | None:
+        """return the parsed row of the current page's table whose key matches value"""
+        for row in self._table_rows(name):
+            parsed = parse(row)
+            if parsed[key] == value:
+                return parsed
+        return None
+
+    @validate_call
+    def add_user(self, admin: Account, request: AddUserRequest) -> User:
+        """add a user in at most PAGE_BUDGET["add_user"] page loads
+
+        the add form page also lists the users, and the submit lands on the updated list
+        """
+        self.logger.info(f"add_user {request.username} {request.displayname} ************")
+        user = User(**request.model_dump())
+        self.login(admin)
+        self._get(ADD_USER_PAGE)
+        if self._find_row("users", pages.parse_user_row, "username", user.username):
+            raise AddFailed(f"user exists: username={user.username}")
+        values = {
+            "data[username]": user.username,
+            "data[displayname]": user.displayname,
+            "data[email]": user.email or user.username,
+            "data[password]": request.password,
+            "data[passwordconfirm]": request.password,
+        }
+        self._submit("add user", values)
+        self._check_add_popups("user", f"User {user.username} has been created.")
+        parsed = self._find_row("users", pages.parse_user_row, "username", user.username)
+        if parsed is None:
+            raise AddFailed(f"added user not found: username={user.username}")
+        added = User(**parsed)
+        if added.username == request.username and added.displayname == request.displayname:
+            return added
+        raise AddFailed(
+            f"added user mismatches request: added={repr(added.model_dump())} request={repr(request.model_dump())}"
+        )
+
+    @validate_call
+    def delete_user(self, admin: Account, request: DeleteUserRequest) -> Dict[str, str]:
+        username = request.username
+        self.logger.info(f"delete_user {username}")
+        self.login(admin)
+        row, _ = self._find_user_row(username)
+        if row is None:
+            raise DeleteFailed(f"user not found: {username=}")
+        href = pages.row_actions(row).get("Delete", None)
+        if not href:
+            raise BrowserInterfaceFailure("failed to locate Delete button")
+        self._follow(href)
+        self._follow(
+            pages.link(self.page, "user delete confirmation button", "div.alert .btn-danger", "Delete " + username)
+        )
+        return dict(message=f"deleted user: {username}")
+
+    @validate_call
+    def books(self, admin: Account, username: str) -> List[Book]:
+        self.logger.info(f"list_address_books {username}")
+        self.login(admin)
+        if not self._select_user_address_books(username):
+            return []
+        return [Book(**pages.parse_book_row(row)) for row in self._table_rows("addressbooks")]
+
+    @validate_call
+    def book_links(self, admin: Account) -> Dict[str, str]:
+        """map each username to its address book page url, parsed from a single load of the users page"""
+        self.logger.info("list_address_book_links")
+        self.login(admin)
+        self._select_user_page()
+        ret = {}
+        for row in self._table_rows("users"):
+            href = pages.address_book_link(row)
+            ret[pages.parse_user_row(row)["username"]] = urljoin(self.page_url, href)
+        return ret
+
+    @validate_call
+    def books_at(self, admin: Account, username: str, href: str) -> List[Book]:
+        """list address books from a page url returned by book_links"""
+        self.logger.info(f"list_address_books {username}")
+        self.login(admin)
+        self._follow(href)
+        return [Book(**pages.parse_book_row(row)) for row in self._table_rows("addressbooks")]
+
+    @validate_call
+    def add_book(self, admin: Account, request: AddBookRequest) -> Book:
+        """add an address book in at most PAGE_BUDGET["add_book"] page loads
+
+        the users page gives the user's address books URL; its add form page also lists the books,
+        and the submit lands on the updated list
+        """
+        self.logger.info(f"add_address_book {request.username} {request.bookname} {request.description}")
+        self.login(admin)
+        token = book_token(request.username, request.bookname)
+        book = Book(token=token, **request.model_dump())
+
+        row, _ = self._find_user_row(book.username)
+        if row is None:
+            raise AddFailed(f"user not found: username={book.username}")
+        self._follow(pages.row_actions(row)["Address Books"] + NEW_SUFFIX)
+        if self._find_row("addressbooks", pages.parse_book_row, "token", book.token):
+            raise AddFailed(f"address book exists: username={book.username} token={book.token}")
+        values = {
+            "data[uri]": book.token,
+            "data[displayname]": book.bookname,
+            "data[description]": book.description or "",
+        }
+        self._submit("add book", values)
+        self._check_add_popups("addressbook", f"Address Book {book.bookname} has been created.")
+        parsed = self._find_row("addressbooks", pages.parse_book_row, "token", book.token)
+        if parsed is None:
+            raise AddFailed(f"added book not found: username={book.username} token={book.token}")
+        added = Book(**parsed)
+        if (
+            added.username == request.username
+            and added.bookname == request.bookname
+            and (added.description or "") == (request.description or "")
+            and added.token == token
+        ):
+            return added
+        raise AddFailed(
+            f"added book mismatches request: added={repr(added.model_dump())} request={repr(request.model_dump())}"
+        )
+
+    @validate_call
+    def delete_book(self, admin: Account, request: DeleteBookRequest) -> Dict[str, str]:
+        self.logger.info(f"delete_address_book {request.username} {request.token}")
+        self.login(admin)
+        if not self._select_user_address_books(request.username):
+            raise DeleteFailed(f"user not found: username={request.username}")
+        for row in self._table_rows("addressbooks"):
+            book = pages.parse_book_row(row)
+            if book["token"] == request.token:
+                break
+        else:
+            raise DeleteFailed(f"book not found: username={request.username} token={request.token}")
+        href = pages.row_actions(row).get("Delete", None)
+        if not href:
+            raise BrowserInterfaceFailure("failed to locate address book Delete button")
+        self._follow(href)
+        self._follow(
+            pages.link(
+                self.page, "book delete confirmation button", "div.alert .btn-danger", "Delete " + book["bookname"]
+            )
+        )
+        return dict(message=f"deleted_book: {request.token}")
+
+    @validate_call
+    def reset(self, admin: Account) -> Dict[str, str]:
+        self.logger.info("reset")
+        self.shutdown()
+        self.login(admin)
+        self.reset_time = arrow.now()
+        return dict(message="server reset")
+
+    @validate_call
+    def status(self, admin: Account) -> Dict[str, str]:
+        self.logger.info("status")
+
+        try:
+            self.login(admin)
+            login = "success"
+        except Exception as e:
+            login = f"failed: {repr(e)}"
+
+        return dict(
+            name="baikalctl",
+            version=__version__,
+            backend="forms",
+            client=repr(self.client),
+            url=self.url,
+            uptime=self.startup_time.humanize(),
+            reset=self.reset_time.humanize() if self.reset_time else "never",
+            certificate_loaded=self.cert_file,
+            page_loads=str(self.page_loads),
+            login=login,
+        )
@@ -0,0 +1,239 @@
+# baikalctl durable mutation queue
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict
+
+from .models import Account, Job
+
+JOBS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id text primary key NOT NULL,
+    action text NOT NULL,
+    payload text NOT NULL,
+    account text,
+    state text NOT NULL,
+    result text,
+    error text,
+    created real NOT NULL,
+    started real,
+    finished real
+);
+CREATE INDEX IF NOT EXISTS jobs_state_created ON jobs (state, created);
+"""
+
+# databases created before the account column became nullable are rebuilt with JOBS_SCHEMA
+JOBS_MIGRATE = f"""
+DROP INDEX IF EXISTS jobs_state_created;
+ALTER TABLE jobs RENAME TO jobs_old;
+{JOBS_SCHEMA}
+INSERT INTO jobs SELECT * FROM jobs_old;
+DROP TABLE jobs_old;
+"""
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobQueue:
+    """SQLite-backed queue of mutations, drained by worker threads
+
+    jobs hold the admin credentials they run with until they finish, so the database file is created private
+    to its owner; finished jobs older than retention seconds are deleted at start and every purge_interval
+    """
+
+    def __init__(
+        self, filename: str, *, workers: int = 1, retention: float = 0, purge_interval: float = 600, logger=None
+    ):
+        if logger is None:
+            logger = __name__
+        if isinstance(logger, str):
+            self.logger = logging.getLogger(logger)
+        else:
+            self.logger = logger
+        self.filename = Path(filename)
+        self.filename.parent.mkdir(parents=True, exist_ok=True)
+        self.filename.touch(mode=0o600, exist_ok=True)
+        os.chmod(self.filename, 0o600)
+        self.lock = threading.Lock()
+        self.condition = threading.Condition(self.lock)
+        self.stopping = False
+        self.workers = []
+        self.worker_count = workers
+        self.retention = retention
+        self.purge_interval = purge_interval
+        self.purger = None
+        self.stopped = threading.Event()
+        with self._connect() as db:
+            db.executescript(JOBS_SCHEMA)
+            if any(column[1] == "account" and column[3] for column in db.execute("PRAGMA table_info(jobs)")):
+                db.executescript(JOBS_MIGRATE)
+            db.execute("UPDATE jobs SET account=NULL WHERE state IN (?, ?)", (DONE, FAILED))
+            # jobs interrupted by a shutdown or crash run again
+            recovered = db.execute("UPDATE jobs SET state=?, started=NULL WHERE state=?", (QUEUED, RUNNING)).rowcount
+            # kept in memory under the lock so health polls never wait on the database
+            self.queued = db.execute("SELECT count(*) FROM jobs WHERE state=?", (QUEUED,)).fetchone()[0]
+        if recovered:
+            self.logger.warning(f"requeued {recovered} interrupted jobs")
+        self.purge()
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.filename, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def _job(self, row) -> Job:
+        id, action, state, result, error, created, started, finished = row
+        return Job(
+            id=id,
+            action=action,
+            state=state,
+            result=json.loads(result) if result else None,
+            error=error or "",
+            created=created,
+            started=started,
+            finished=finished,
+            queued_seconds=(started or time.time()) - created,
+            run_seconds=(finished or time.time()) - started if started else None,
+        )
+
+    def submit(self, action: str, payload: Dict[str, Any], account: Account) -> Job:
+        id = uuid.uuid4().hex
+        with self.condition:
+            with self._connect() as db:
+                db.execute(
+                    "INSERT INTO jobs (id, action, payload, account, state, created) VALUES (?, ?, ?, ?, ?, ?)",
+                    (id, action, json.dumps(payload), account.model_dump_json(), QUEUED, time.time()),
+                )
+            self.queued += 1
+            self.condition.notify_all()
+        self.logger.info(f"job {id} queued: {action}")
+        return self.get(id)
+
+    def get(self, id: str) -> Job | None:
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT id, action, state, result, error, created, started, finished FROM jobs WHERE id=?", (id,)
+            ).fetchone()
+        return self._job(row) if row else None
+
+    def wait(self, id: str, timeout: float) -> Job | None:
+        """return the job once it is done or failed, or as it stands when timeout expires"""
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while True:
+                job = self.get(id)
+                remaining = deadline - time.monotonic()
+                if job is None or job.state in [DONE, FAILED] or remaining <= 0:
+                    return job
+                self.condition.wait(remaining)
+
+    def _claim(self):
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT id, action, payload, account FROM jobs WHERE state=? ORDER BY created LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row:
+                db.execute("UPDATE jobs SET state=?, started=? WHERE id=?", (RUNNING, time.time(), row[0]))
+                self.queued -= 1
+        return row
+
+    def _finish(self, id: str, result: Dict[str, Any] | None, error: str | None):
+        with self.condition:
+            with self._connect() as db:
+                db.execute(
+                    "UPDATE jobs SET state=?, result=?, error=?, finished=?, account=NULL WHERE id=?",
+                    (FAILED if error else DONE, json.dumps(result) if result else None, error, time.time(), id),
+                )
+            self.condition.notify_all()
+
+    def purge(self) -> int:
+        """delete finished jobs older than retention seconds, returning the number deleted; 0 keeps them all"""
+        if not self.retention:
+            return 0
+        with self._connect() as db:
+            purged = db.execute(
+                "DELETE FROM jobs WHERE state IN (?, ?) AND finished < ?", (DONE, FAILED, time.time() - self.retention)
+            ).rowcount
+        if purged:
+            self.logger.info(f"purged {purged} finished jobs")
+        return purged
+
+    def _purge(self):
+        while not self.stopped.wait(self.purge_interval):
+            try:
+                self.purge()
+            except sqlite3.Error as ex:
+                self.logger.error(f"job purge failed: {repr(ex)}")
+
+    def _work(self, run: Callable[[str, Dict[str, Any], Account], Dict[str, Any]]):
+        while True:
+            with self.condition:
+                while True:
+                    if self.stopping:
+                        return
+                    row = self._claim()
+                    if row:
+                        break
+                    self.condition.wait()
+            id, action, payload, account = row
+            self.logger.info(f"job {id} running: {action}")
+            try:
+                result, error = run(action, json.loads(payload), Account.model_validate_json(account)), None
+            except Exception as ex:
+                self.logger.warning(f"job {id} failed: {repr(ex)}")
+                result, error = None, f"{ex.__class__.__name__}: {' '.join(map(str, ex.args))}"
+            self._finish(id, result, error)
+
+    def start(self, run: Callable[[str, Dict[str, Any], Account], Dict[str, Any]]):
+        """start worker threads that call run(action, payload, account) for each queued job"""
+        for index in range(self.worker_count):
+            worker = threading.Thread(target=self._work, args=(run,), name=f"jobs-{index}", daemon=True)
+            worker.start()
+            self.workers.append(worker)
+        if self.retention:
+            self.purger = threading.Thread(target=self._purge, name="jobs-purge", daemon=True)
+            self.purger.start()
+
+    def shutdown(self, timeout: float = 30):
+        with self.condition:
+            self.stopping = True
+            self.condition.notify_all()
+        self.stopped.set()
+        for worker in self.workers:
+            worker.join(timeout)
+        if self.purger:
+            self.purger.join(timeout)
+
+    def depth(self) -> int:
+        """number of queued jobs, read from memory without touching the database"""
+        return self.queued
+
+    def status(self) -> Dict[str, Any]:
+        with self._connect() as db:
+            counts = dict(db.execute("SELECT state, count(*) FROM jobs GROUP BY state").fetchall())
+            timings = db.execute(
+                "SELECT avg(started - created), avg(finished - started) FROM jobs WHERE finished IS NOT NULL"
+            ).fetchone()
+        return dict(
+            depth=counts.get(QUEUED, 0),
+            running=counts.get(RUNNING, 0),
+            done=counts.get(DONE, 0),
+            failed=counts.get(FAILED, 0),
+            workers=len(self.workers),
+            average_queued_seconds=timings[0],
+            average_run_seconds=timings[1],
+        )
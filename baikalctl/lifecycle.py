@@ -0,0 +1,139 @@
+# baikalctl driver lifecycle management
+
+import logging
+import os
+import signal
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List
+
+from .metrics import DRIVER_RECYCLES
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+MB = 1024 * 1024
+
+
+def process_tree(pid: int) -> List[int]:
+    """pid and all of its descendants, from /proc"""
+    children = {}
+    for stat in Path("/proc").glob("[0-9]*/stat"):
+        try:
+            # the command name may contain spaces; the fields after it are fixed
+            fields = stat.read_text().rpartition(")")[2].split()
+        except OSError:
+            continue
+        children.setdefault(int(fields[1]), []).append(int(stat.parent.name))
+    ret = []
+    pending = [pid]
+    while pending:
+        pid = pending.pop()
+        ret.append(pid)
+        pending.extend(children.get(pid, []))
+    return ret
+
+
+def rss(pids: List[int]) -> int:
+    """total resident set size of pids in bytes, ignoring processes that have exited"""
+    total = 0
+    for pid in pids:
+        try:
+            total += int(Path(f"/proc/{pid}/statm").read_text().split()[1]) * PAGE_SIZE
+        except (OSError, IndexError, ValueError):
+            continue
+    return total
+
+
+def kill(pids: List[int]):
+    for pid in pids:
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+
+class DriverManager:
+    """recycle pooled drivers that are hung, bloated or worn out, from a background thread
+
+    each check pass inspects only idle sessions, so it never delays a request; sessions whose backend has
+    no driver to recycle are skipped
+    """
+
+    def __init__(
+        self, pool, *, interval: float, max_rss_mb: int = 0, max_ops: int = 0, ping_timeout: float = 10, logger=None
+    ):
+        if logger is None:
+            logger = __name__
+        if isinstance(logger, str):
+            self.logger = logging.getLogger(logger)
+        else:
+            self.logger = logger
+        self.pool = pool
+        self.interval = interval
+        self.max_rss_mb = max_rss_mb
+        self.max_ops = max_ops
+        self.ping_timeout = ping_timeout
+        self.stopping = threading.Event()
+        self.thread = None
+        self.checks = 0
+        self.recycles = Counter()
+        self.failures = 0
+        # session index: last inspection
+        self.sessions: Dict[int, Dict[str, Any]] = {}
+
+    def inspect(self, session) -> str | None:
+        """return the reason to recycle session's driver, or None to keep it"""
+        if not session.driver:
+            return None
+        if not session.ping(self.ping_timeout):
+            return "hung"
+        used = rss(session.driver_pids())
+        self.sessions[session.index] = dict(ops=session.ops, rss_mb=round(used / MB, 1))
+        if self.max_ops and session.ops >= self.max_ops:
+            return "ops"
+        if self.max_rss_mb and used > self.max_rss_mb * MB:
+            return "rss"
+        return None
+
+    def check(self):
+        """inspect each idle session once, recycling those that need it"""
+        self.checks += 1
+        for session in self.pool.sessions:
+            if not hasattr(session, "recycle") or not self.pool.acquire(session):
+                continue
+            try:
+                reason = self.inspect(session)
+                if reason:
+                    self.logger.warning(f"recycling session {session.index} driver: {reason}")
+                    self.recycles[reason] += 1
+                    DRIVER_RECYCLES.labels(reason).inc()
+                    session.recycle(reason)
+            except Exception as ex:
+                self.failures += 1
+                self.logger.error(f"session {session.index} lifecycle check failed: {repr(ex)}")
+            finally:
+                self.pool.checkin(session)
+
+    def _run(self):
+        while not self.stopping.wait(self.interval):
+            self.check()
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="lifecycle", daemon=True)
+        self.thread.start()
+
+    def shutdown(self):
+        self.stopping.set()
+        if self.thread:
+            self.thread.join(self.ping_timeout + self.interval)
+
+    def status(self) -> Dict[str, Any]:
+        return dict(
+            interval=self.interval,
+            max_rss_mb=self.max_rss_mb,
+            max_ops=self.max_ops,
+            checks=self.checks,
+            failures=self.failures,
+            recycles=dict(self.recycles),
+            sessions=dict(self.sessions),
+        )
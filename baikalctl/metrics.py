@@ -0,0 +1,138 @@
+# baikalctl prometheus metrics
+
+import inspect
+import time
+from functools import wraps
+from typing import Iterable
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram
+
+from . import tracing
+
+REGISTRY = CollectorRegistry()
+
+# page loads take tens of milliseconds to seconds; element lookups and cached logins take microseconds
+SECONDS_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+REQUEST_SECONDS = Histogram(
+    "baikalctl_request_seconds",
+    "API request latency",
+    ["method", "endpoint", "status"],
+    buckets=SECONDS_BUCKETS,
+    registry=REGISTRY,
+)
+REQUESTS_IN_FLIGHT = Gauge("baikalctl_requests_in_flight", "API requests being served", registry=REGISTRY)
+SESSION_SECONDS = Histogram(
+    "baikalctl_session_method_seconds",
+    "session backend method durations",
+    ["backend", "method"],
+    buckets=SECONDS_BUCKETS,
+    registry=REGISTRY,
+)
+SESSION_ERRORS = Counter(
+    "baikalctl_session_method_errors_total",
+    "session backend method exceptions",
+    ["backend", "method"],
+    registry=REGISTRY,
+)
+NAVIGATIONS = Counter("baikalctl_navigations_total", "admin UI page loads", ["backend"], registry=REGISTRY)
+LOGINS = Counter(
+    "baikalctl_logins_total", "admin logins performed, not counting reused ones", ["backend"], registry=REGISTRY
+)
+LOGOUTS = Counter("baikalctl_logouts_total", "admin logouts", ["backend"], registry=REGISTRY)
+DRIVER_STARTS = Counter("baikalctl_driver_starts_total", "browser drivers started", ["backend"], registry=REGISTRY)
+DRIVER_RECYCLES = Counter(
+    "baikalctl_driver_recycles_total", "drivers replaced by the lifecycle manager", ["reason"], registry=REGISTRY
+)
+POOL_WAIT_SECONDS = Histogram(
+    "baikalctl_pool_wait_seconds",
+    "time spent waiting to check out a pooled session",
+    buckets=SECONDS_BUCKETS,
+    registry=REGISTRY,
+)
+POOL_CHECKED_OUT = Gauge("baikalctl_pool_checked_out", "pooled sessions in use", registry=REGISTRY)
+POOL_WAITING = Gauge("baikalctl_pool_waiting", "requests waiting for a pooled session", registry=REGISTRY)
+
+# session methods whose calls also count an event
+EVENTS = dict(
+    _navigate=NAVIGATIONS,
+    _load_page=NAVIGATIONS,
+    _authenticate=LOGINS,
+    _logout=LOGOUTS,
+    _start_driver=DRIVER_STARTS,
+)
+
+# the operations every session backend implements
+BACKEND_METHODS = [
+    "login",
+    "logout",
+    "initialize",
+    "users",
+    "iter_users",
+    "add_user",
+    "delete_user",
+    "books",
+    "books_at",
+    "book_links",
+    "add_book",
+    "delete_book",
+    "warm",
+    "reset",
+    "status",
+    "_authenticate",
+    "_logout",
+]
+
+
+def _timed(backend: str, name: str, func):
+    # label children are bound once here, so a call costs two clock reads and a histogram update
+    histogram = SESSION_SECONDS.labels(backend, name)
+    errors = SESSION_ERRORS.labels(backend, name)
+    event = EVENTS[name].labels(backend) if name in EVENTS else None
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if event is not None:
+            event.inc()
+        # spans are labeled with the method's leading string argument: an element name, page path or reason
+        span = tracing.begin(name, args[1] if len(args) > 1 and isinstance(args[1], str) else None)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            errors.inc()
+            raise
+        finally:
+            histogram.observe(time.perf_counter() - start)
+            if span is not None:
+                tracing.end(span)
+
+    @wraps(func)
+    def generator(*args, **kwargs):
+        # a generator does its work as it is iterated, so it is timed from the first row to the last
+        if event is not None:
+            event.inc()
+        span = tracing.begin(name, args[1] if len(args) > 1 and isinstance(args[1], str) else None)
+        start = time.perf_counter()
+        try:
+            yield from func(*args, **kwargs)
+        except Exception:
+            errors.inc()
+            raise
+        finally:
+            histogram.observe(time.perf_counter() - start)
+            if span is not None:
+                tracing.end(span)
+
+    return generator if inspect.isgeneratorfunction(func) else wrapper
+
+
+def instrument(backend: str, methods: Iterable[str] = ()):
+    """class decorator timing and tracing BACKEND_METHODS and methods under the backend label, and counting EVENTS"""
+
+    def decorate(cls):
+        for name in [*BACKEND_METHODS, *methods]:
+            setattr(cls, name, _timed(backend, name, getattr(cls, name)))
+        return cls
+
+    return decorate
@@ -18,6 +18,11 @@ regex_password = "^\\S{" + str(MIN_PASSWORD_LENGTH) + ",}$"
 regex_token = "^[a-z0-9-]+$|^$"
 
 
+def book_token(username: str, bookname: str) -> str:
+    """the address book token baikalctl assigns to a user's book"""
+    return "".join([c if c in VALID_TOKEN_CHARS else "-" for c in (username + "-" + bookname).lower()])
+
+
 class Model(BaseModel):
 
     @model_validator(mode="before")
@@ -47,6 +52,7 @@ class Account(Model):
 class User(Model):
     username: str = Field(..., pattern=regex_email)
     displayname: str | None = Field("", pattern=regex_description)
+    email: str | None = Field("")
     uri: str | None = Field("")
 
 
@@ -105,6 +111,89 @@ class DeleteBookResponse(Response):
     request: str | None = Field("delete address book")
 
 
+class UserBatchRequest(Model):
+    add: List[AddUserRequest] = Field([])
+    delete: List[DeleteUserRequest] = Field([])
+
+
+class BookBatchRequest(Model):
+    add: List[AddBookRequest] = Field([])
+    delete: List[DeleteBookRequest] = Field([])
+
+
+class BatchResult(BaseModel):
+    action: str
+    username: str
+    token: str | None = Field(None)
+    success: bool
+    message: str
+    detail: str | None = Field("")
+    user: User | None = Field(None)
+    book: Book | None = Field(None)
+
+
+class BatchResponse(Response):
+    message: str | None = Field("batch complete")
+    failed: int
+    results: List[BatchResult]
+
+
+class StateBook(Model):
+    bookname: str = Field(..., pattern=regex_description)
+    description: str | None = Field(None, pattern=regex_description)
+
+
+class StateUser(AddUserRequest):
+    books: List[StateBook] = Field([])
+
+
+class DesiredState(Model):
+    users: List[StateUser] = Field([])
+    prune: bool = Field(False)
+
+
+class PlanStep(BaseModel):
+    action: str
+    username: str
+    token: str | None = Field(None)
+
+
+class ReconcileResponse(Response):
+    request: str | None = Field("reconcile")
+    message: str | None = Field("reconciled")
+    dry_run: bool
+    operations: int
+    estimated_page_loads: int
+    plan: List[PlanStep]
+    failed: int = Field(0)
+    results: List[BatchResult] = Field([])
+
+
+class Job(BaseModel):
+    id: str
+    action: str
+    state: str
+    result: Dict[str, Any] | None = Field(None)
+    error: str | None = Field("")
+    created: float
+    started: float | None = Field(None)
+    finished: float | None = Field(None)
+    queued_seconds: float | None = Field(None)
+    run_seconds: float | None = Field(None)
+
+
+class JobResponse(Response):
+    request: str | None = Field("job")
+    message: str | None = Field("job status")
+    job: Job
+
+
+class TracesResponse(Response):
+    request: str | None = Field("traces")
+    message: str | None = Field("recent request traces")
+    traces: List[Dict[str, Any]]
+
+
 class UsersResponse(Response):
     request: str | None = Field("list users")
     message: str | None = Field("user list")
@@ -135,6 +224,18 @@ class UptimeResponse(Response):
     request: str | None = Field("uptime")
 
 
+class ReadyResponse(Response):
+    request: str | None = Field("ready")
+    ready: bool
+    detail: str | None = Field("")
+
+
+class HealthResponse(Response):
+    request: str | None = Field("health")
+    healthy: bool
+    health: Dict[str, Any]
+
+
 class ResetResponse(Response):
     request: str | None = Field("reset")
 
@@ -0,0 +1,51 @@
+# baikalctl admin UI navigation tracking
+
+from typing import Dict
+
+ADMIN_PAGE = "/admin/"
+USERS_PAGE = "/admin/?/users/"
+# appended to a users or address books list URL to open its add form, which also shows the list
+NEW_SUFFIX = "new/1/"
+ADD_USER_PAGE = USERS_PAGE + NEW_SUFFIX
+
+# maximum page loads for each mutation by a session that is already logged in; a login adds two more
+PAGE_BUDGET = dict(add_user=2, add_book=3, delete_user=3, delete_book=4)
+
+
+class Navigator:
+    """track the page a session is on so a repeated navigation to it can be skipped
+
+    url is the page loaded by the last navigation, or None once a click or form submit has
+    replaced it; loads counts every page load, by navigation, click or submit, and generation
+    counts every change of the page content
+    """
+
+    def __init__(self):
+        self.url = None
+        self.generation = 0
+        self.loads = 0
+        self.avoided = 0
+
+    def current(self, url: str) -> bool:
+        """true, counting an avoided load, when url is already the loaded page"""
+        if url == self.url:
+            self.avoided += 1
+            return True
+        return False
+
+    def loaded(self, url: str | None = None):
+        """count a page load; url is the page navigated to, or None for the result of a click or submit"""
+        self.url = url
+        self.generation += 1
+        self.loads += 1
+
+    def changed(self):
+        self.url = None
+        self.generation += 1
+
+    def expire(self):
+        """forget the current page, which another session or process may have changed since it was loaded"""
+        self.url = None
+
+    def status(self) -> Dict[str, int]:
+        return dict(loads=self.loads, avoided=self.avoided, generation=self.generation)
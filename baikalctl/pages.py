@@ -0,0 +1,172 @@
+# baikal admin page parser
+
+from typing import Any, Dict, List, Tuple
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup, NavigableString, Tag
+
+from .exceptions import BrowserInterfaceFailure
+
+try:
+    import lxml  # noqa: F401
+
+    PARSER = "lxml"
+except ImportError:
+    PARSER = "html.parser"
+
+
+class PageParseFailure(BrowserInterfaceFailure):
+    pass
+
+
+def parse(html: str) -> BeautifulSoup:
+    return BeautifulSoup(html, PARSER)
+
+
+def text(element: Tag | None) -> str:
+    """return element text the way the browser renders it: br tags as newlines, whitespace collapsed"""
+    if element is None:
+        return ""
+    chunks = []
+    for node in element.descendants:
+        if isinstance(node, NavigableString):
+            chunks.append(str(node))
+        elif isinstance(node, Tag) and node.name == "br":
+            chunks.append("\n")
+    lines = [" ".join(line.split()) for line in "".join(chunks).split("\n")]
+    return "\n".join([line for line in lines if line])
+
+
+def title(page: BeautifulSoup) -> str:
+    return text(page.title).strip()
+
+
+def messages(page: BeautifulSoup) -> List[str]:
+    return [text(message) for message in page.select('html > body [id="message"]')]
+
+
+def is_login_page(page: BeautifulSoup) -> bool:
+    return page.select_one('body form input[id="login"]') is not None
+
+
+def links(parent: Tag, selector: str) -> Dict[str, str]:
+    """map link text to href for elements matching selector"""
+    ret = {}
+    for element in parent.select(selector):
+        label = text(element)
+        if label and element.get("href") is not None:
+            ret.setdefault(label, element["href"])
+    return ret
+
+
+def link(parent: Tag, name: str, selector: str, with_text: str) -> str:
+    href = links(parent, selector).get(with_text, None)
+    if href is None:
+        raise PageParseFailure(f"{name} not found: {selector=} {with_text=}")
+    return href
+
+
+def navbar_links(page: BeautifulSoup) -> Dict[str, str]:
+    navbars = page.select("div.navbar")
+    if len(navbars) != 1:
+        raise PageParseFailure(f"expected one navbar, found {len(navbars)}")
+    return links(navbars[0], "a")
+
+
+def table_rows(page: BeautifulSoup) -> List[Tag]:
+    return page.select("body table tbody tr")
+
+
+def parse_row_info(name: str, row: Tag) -> Dict[str, str]:
+    popover = row.select_one("td.col-actions span.btn.popover-hover")
+    if popover is None:
+        raise PageParseFailure(f"{name} table row actions popover not found")
+    return parse_popover(name, popover.get("data-content", ""))
+
+
+def parse_popover(name: str, data_content: str) -> Dict[str, str]:
+    soup = parse(data_content)
+    ret = {}
+    last_line = None
+    for line in soup.strings:
+        line = line.strip()
+        if not line:
+            continue
+        if last_line == "URI":
+            ret["uri"] = line
+        elif last_line == "User name":
+            ret["username"] = line
+        last_line = line
+    if "uri" not in ret:
+        raise PageParseFailure(f"{name} table row info parse failed")
+    return ret
+
+
+def parse_user_row(row: Tag) -> Dict[str, str]:
+    col_username = row.select_one("td.col-username")
+    if col_username is None:
+        raise PageParseFailure("user table row username column not found")
+    username, _, tail = text(col_username).partition("\n")
+    # an empty display name leaves the email address at the start of the line
+    displayname, _, email = tail.partition("<")
+    displayname = displayname.strip()
+    email = email.strip().strip(">")
+    ret = parse_row_info("user", row)
+    ret.update(dict(username=username, displayname=displayname, email=email))
+    return ret
+
+
+def parse_book_row(row: Tag) -> Dict[str, Any]:
+    ret = {}
+    for field, column in [("bookname", "displayname"), ("contacts", "contacts"), ("description", "description")]:
+        element = row.select_one(f"td.col-{column}")
+        if element is None:
+            raise PageParseFailure(f"book table row {column} column not found")
+        ret[field] = text(element)
+    ret["contacts"] = int(ret["contacts"])
+    ret.update(parse_row_info("addressbooks", row))
+    ret["token"] = ret["uri"].split("/")[-2]
+    return ret
+
+
+def row_actions(row: Tag) -> Dict[str, str]:
+    """map action button label to href for a table row"""
+    return links(row, "td.col-actions a.btn")
+
+
+def address_book_link(row: Tag) -> str:
+    """href of a user row's Address Books action"""
+    href = row_actions(row).get("Address Books")
+    if href is None:
+        username = text(row.select_one("td.col-username")).partition("\n")[0]
+        raise PageParseFailure(f"user table row has no Address Books action: {username=}")
+    return href
+
+
+def form(page: BeautifulSoup, base_url: str, selector: str = "body form") -> Tuple[str, Dict[str, str]]:
+    """return the absolute action url and the default field values of a form"""
+    element = page.select_one(selector)
+    if element is None:
+        raise PageParseFailure(f"form not found: {selector=}")
+    fields = {}
+    for field in element.select("input[name], textarea[name], select[name]"):
+        name = field["name"]
+        if field.name == "select":
+            option = field.select_one("option[selected]") or field.select_one("option")
+            fields[name] = option.get("value", text(option)) if option else ""
+        elif field.name == "textarea":
+            fields[name] = field.get_text()
+        elif field.get("type", "text").lower() in ["checkbox", "radio"]:
+            if field.has_attr("checked"):
+                fields[name] = field.get("value", "on")
+        elif field.get("type", "text").lower() not in ["submit", "button", "image", "reset", "file"]:
+            fields[name] = field.get("value", "")
+    return urljoin(base_url, element.get("action", "")), fields
+
+
+def select_options(page: BeautifulSoup, selector: str) -> Dict[str, str]:
+    """map visible option text to option value for a select element"""
+    element = page.select_one(selector)
+    if element is None:
+        raise PageParseFailure(f"select not found: {selector=}")
+    return {text(option): option.get("value", text(option)) for option in element.select("option")}
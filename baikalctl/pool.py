@@ -0,0 +1,170 @@
+# baikalctl browser session pool
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict
+
+from .browser import BrowserException, Session
+from .database import DatabaseSession
+from .forms import FormSession
+from .metrics import POOL_WAIT_SECONDS
+
+BACKENDS = dict(browser=Session, forms=FormSession, database=DatabaseSession)
+
+
+class PoolTimeout(BrowserException):
+    pass
+
+
+class SessionPool:
+    """fixed-size pool of browser sessions, each with its own driver and profile"""
+
+    def __init__(self, size, *, timeout=None, factory=Session, logger=None, **kwargs):
+        if logger is None:
+            logger = __name__
+        if isinstance(logger, str):
+            self.logger = logging.getLogger(logger)
+        else:
+            self.logger = logger
+        if size < 1:
+            raise ValueError(f"invalid pool size: {size}")
+        self.size = size
+        self.timeout = timeout
+        self.condition = threading.Condition()
+        self.reset_lock = threading.Lock()
+        self.waiting = 0
+        # outcome of the most recent session use, for the health endpoint
+        self.last_success = None
+        self.last_error = None
+        self.last_error_time = None
+        # the primary session creates the profile that the others are cloned from; the clones build concurrently
+        self.sessions = [factory(index=0, **kwargs)]
+        if size > 1:
+            with ThreadPoolExecutor(max_workers=size - 1, thread_name_prefix="session") as executor:
+                self.sessions.extend(executor.map(lambda index: factory(index=index, **kwargs), range(1, size)))
+        self.idle = list(self.sessions)
+        self.api_key = self.sessions[0].api_key
+        self.logger.info(f"session pool started with {size} sessions")
+
+    def checkout(self, timeout=None, account=None) -> Session:
+        """take an idle session, preferring one already logged in as account"""
+        if timeout is None:
+            timeout = self.timeout
+        start = time.perf_counter()
+        with self.condition:
+            self.waiting += 1
+            try:
+                if not self.condition.wait_for(lambda: self.idle, timeout=timeout):
+                    raise PoolTimeout(f"timeout waiting for browser session: {timeout=}")
+            finally:
+                self.waiting -= 1
+                POOL_WAIT_SECONDS.observe(time.perf_counter() - start)
+            if account is not None:
+                # reuse a warm login for this account, else avoid evicting another account's login
+                for match in [account, None]:
+                    for session in reversed(self.idle):
+                        if session.account == match:
+                            self.idle.remove(session)
+                            return session
+            return self.idle.pop()
+
+    def acquire(self, session: Session) -> bool:
+        """check out a specific session if it is idle, without waiting"""
+        with self.condition:
+            if session in self.idle:
+                self.idle.remove(session)
+                return True
+            return False
+
+    def checkin(self, session: Session):
+        with self.condition:
+            if session in self.idle:
+                raise RuntimeError(f"session {session.index} returned twice")
+            self.idle.append(session)
+            self.condition.notify()
+
+    @contextmanager
+    def session(self, timeout=None, account=None):
+        try:
+            session = self.checkout(timeout, account)
+        except PoolTimeout as ex:
+            self.failed(ex)
+            raise
+        try:
+            yield session
+        except Exception as ex:
+            self.failed(ex)
+            raise
+        else:
+            self.last_success = time.time()
+        finally:
+            self.checkin(session)
+
+    def failed(self, ex: Exception):
+        self.last_error = f"{ex.__class__.__name__}: {' '.join(map(str, ex.args))}"
+        self.last_error_time = time.time()
+
+    def reset(self, admin) -> Dict[str, str]:
+        """reset every session, waiting for each to be returned to the pool"""
+        with self.reset_lock:
+            sessions = [self.checkout() for _ in range(self.size)]
+            try:
+                for session in sessions:
+                    session.reset(admin)
+            finally:
+                for session in sessions:
+                    self.checkin(session)
+        return dict(message="server reset")
+
+    def warm(self, admin=None):
+        """start every session's driver concurrently, logging each in as admin when given"""
+        with self.reset_lock:
+            sessions = [self.checkout() for _ in range(self.size)]
+            try:
+                with ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="warm") as executor:
+                    list(executor.map(lambda session: session.warm(admin), sessions))
+            finally:
+                for session in sessions:
+                    self.checkin(session)
+        self.logger.info(f"session pool warmed with {self.size} sessions")
+
+    def status(self) -> Dict[str, Any]:
+        with self.condition:
+            idle = len(self.idle)
+            ret = dict(size=self.size, checked_out=self.size - idle, idle=idle, waiting=self.waiting)
+        navs = [session.nav for session in self.sessions if getattr(session, "nav", None)]
+        if navs:
+            ret["navigation"] = dict(loads=sum(n.loads for n in navs), avoided=sum(n.avoided for n in navs))
+        return ret
+
+    def health(self) -> Dict[str, Any]:
+        """pool state from memory only; no session is checked out and no browser is touched"""
+        now = time.time()
+        with self.condition:
+            idle = list(self.idle)
+            waiting = self.waiting
+        sessions = [
+            dict(
+                index=session.index, alive=session.alive(), busy=session not in idle, logged_in=bool(session.logged_in)
+            )
+            for session in self.sessions
+        ]
+        return dict(
+            sessions=sessions,
+            waiting=waiting,
+            last_success=self.last_success,
+            last_success_age=now - self.last_success if self.last_success else None,
+            last_error=self.last_error,
+            last_error_time=self.last_error_time,
+        )
+
+    def shutdown(self):
+        self.logger.info("shutdown")
+        for session in self.sessions:
+            try:
+                session.shutdown()
+            except Exception as ex:
+                self.logger.error(f"session {session.index} shutdown failed: {repr(ex)}")
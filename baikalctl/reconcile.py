@@ -0,0 +1,63 @@
+# baikalctl desired state reconciliation
+
+from typing import Dict, List, Tuple
+
+from .models import (
+    AddBookRequest,
+    AddUserRequest,
+    Book,
+    DeleteBookRequest,
+    DeleteUserRequest,
+    DesiredState,
+    Model,
+    PlanStep,
+    book_token,
+)
+from .navigation import PAGE_BUDGET
+
+# baikal creates this address book with every user, so pruning leaves it alone
+DEFAULT_BOOK_TOKEN = "default"
+
+
+def plan(state: DesiredState, current: Dict[str, List[Book]]) -> List[Tuple[str, Model]]:
+    """return the (action, request) steps that converge current, a map of username to books, to state
+
+    only existence is reconciled; display names, descriptions and passwords of existing entries are left alone.
+    entries missing from state are deleted only when state.prune is set; deleting a user removes its books,
+    and every user keeps the default address book.
+    """
+    deletes, adds = [], []
+    desired = {user.username: user for user in state.users}
+    if state.prune:
+        deletes.extend(("delete_user", DeleteUserRequest(username=u)) for u in current if u not in desired)
+    for username, user in desired.items():
+        request = AddUserRequest(**user.model_dump(exclude={"books"}))
+        existing = {book.token for book in current.get(username, [])}
+        if username not in current:
+            adds.append(("add_user", request))
+        wanted = {}
+        for book in user.books:
+            wanted[book_token(username, book.bookname)] = AddBookRequest(username=username, **book.model_dump())
+        adds.extend(("add_book", book) for token, book in wanted.items() if token not in existing)
+        if state.prune and username in current:
+            deletes.extend(
+                ("delete_book", DeleteBookRequest(username=username, token=token))
+                for token in sorted(existing)
+                if token not in wanted and token != DEFAULT_BOOK_TOKEN
+            )
+    return deletes + adds
+
+
+def describe(steps: List[Tuple[str, Model]]) -> List[PlanStep]:
+    ret = []
+    for action, request in steps:
+        token = getattr(request, "token", None)
+        if action == "add_book":
+            token = book_token(request.username, request.bookname)
+        ret.append(PlanStep(action=action, username=request.username, token=token))
+    return ret
+
+
+def estimate_page_loads(steps: List[Tuple[str, Model]], users: int) -> int:
+    """admin UI page loads for the listing pass and the steps, from the documented per-mutation budgets"""
+    return 1 + users + sum(PAGE_BUDGET[action] for action, _ in steps)
@@ -9,6 +9,7 @@ import uvicorn
 from . import settings
 from .browser import SessionConfig
 from .exception_handler import ExceptionHandler
+from .pool import BACKENDS
 from .shell import _shell_completion
 from .version import __timestamp__, __version__
 
@@ -34,6 +35,97 @@ def _ehandler(ctx, option, debug):
 @click.option("--profile-dir", type=str, default=settings.PROFILE_DIR)
 @click.option("--profile-create-timeout", type=int, default=settings.PROFILE_CREATE_TIMEOUT)
 @click.option("--profile-stabilize-time", type=int, default=settings.PROFILE_STABILIZE_TIME)
+@click.option(
+    "--backend",
+    type=click.Choice(list(BACKENDS.keys())),
+    default=settings.BACKEND,
+    help="admin UI driver (default: browser)",
+)
+@click.option("--pool-size", type=int, default=settings.POOL_SIZE, help="number of browser sessions (default: 1)")
+@click.option(
+    "--login-ttl",
+    type=int,
+    default=settings.LOGIN_TTL,
+    help="idle seconds before an admin login expires (default: 300)",
+)
+@click.option(
+    "--lean-browser/--no-lean-browser",
+    default=settings.LEAN_BROWSER,
+    help="eager page loads without images or web fonts, with a persistent disk cache",
+)
+@click.option(
+    "--cache-ttl",
+    type=float,
+    default=settings.CACHE_TTL,
+    help="seconds to cache user and book lists; changes made outside baikalctl show after up to this long"
+    " (default: 0, off)",
+)
+@click.option("--cache-size", type=int, default=settings.CACHE_SIZE, help="maximum cached lists (default: 1024)")
+@click.option(
+    "--books-fanout",
+    type=int,
+    default=settings.BOOKS_FANOUT,
+    help="concurrent address book page loads for GET /books/, bounded by the pool size (default: 4)",
+)
+@click.option("--prewarm/--no-prewarm", default=settings.PREWARM, help="start browsers before serving requests")
+@click.option("--warmup-username", default=settings.WARMUP_USERNAME, help="admin account to log in during warm-up")
+@click.option("--warmup-password", default=settings.WARMUP_PASSWORD, help="warm-up admin password")
+@click.option("--jobs/--no-jobs", default=settings.JOBS, help="queue mutations and answer with a job id")
+@click.option("--jobs-db", default=settings.JOBS_DB, help="job queue database file")
+@click.option("--job-workers", type=int, default=settings.JOB_WORKERS, help="job queue worker threads (default: 1)")
+@click.option(
+    "--job-retention",
+    type=float,
+    default=settings.JOB_RETENTION,
+    help="seconds to keep finished jobs, 0 to keep them all (default: 86400)",
+)
+@click.option(
+    "--lifecycle-interval",
+    type=float,
+    default=settings.LIFECYCLE_INTERVAL,
+    help="seconds between driver health checks, 0 to disable (default: 30)",
+)
+@click.option(
+    "--recycle-max-rss-mb",
+    type=int,
+    default=settings.RECYCLE_MAX_RSS_MB,
+    help="recycle a driver whose process tree exceeds this RSS, 0 to disable (default: 1024)",
+)
+@click.option(
+    "--recycle-max-ops",
+    type=int,
+    default=settings.RECYCLE_MAX_OPS,
+    help="recycle a driver after serving this many operations, 0 to disable (default: 1000)",
+)
+@click.option(
+    "--ping-timeout",
+    type=float,
+    default=settings.PING_TIMEOUT,
+    help="seconds a driver may take to answer a health check before it is replaced (default: 10)",
+)
+@click.option("--tracing/--no-tracing", default=settings.TRACING, help="record a step trace for each request")
+@click.option("--trace-buffer", type=int, default=settings.TRACE_BUFFER, help="recent traces kept (default: 100)")
+@click.option(
+    "--status-ttl",
+    type=float,
+    default=settings.STATUS_TTL,
+    help="seconds before GET /status/ refreshes the session status in the background (default: 30)",
+)
+@click.option("--dav-books/--no-dav-books", default=settings.DAV_BOOKS, help="list address books with CardDAV requests")
+@click.option("--dav-username", default=settings.DAV_USERNAME, help="CardDAV account able to read every user's books")
+@click.option("--dav-password", default=settings.DAV_PASSWORD, help="CardDAV account password")
+@click.option(
+    "--dav-auth",
+    type=click.Choice(["digest", "basic"]),
+    default=settings.DAV_AUTH,
+    help="CardDAV authentication (default: digest)",
+)
+@click.option(
+    "--dav-count-contacts/--no-dav-count-contacts",
+    default=settings.DAV_COUNT_CONTACTS,
+    help="count each book's contacts with one more request per book; otherwise contacts is 0 (default: off)",
+)
+@click.option("--baikal-config", default=settings.BAIKAL_CONFIG, help="baikal.yaml for the database backend")
 @click.option("--cert", default=settings.CERT, help="cient certificate file")
 @click.option("--key", default=settings.KEY, help="client certificate key file")
 @click.option("--show-config", is_flag=True)
@@ -58,6 +150,33 @@ def baikalctl(
     profile_stabilize_time,
     profile_dir,
     profile_name,
+    backend,
+    pool_size,
+    login_ttl,
+    lean_browser,
+    cache_ttl,
+    cache_size,
+    books_fanout,
+    prewarm,
+    warmup_username,
+    warmup_password,
+    jobs,
+    jobs_db,
+    job_workers,
+    job_retention,
+    lifecycle_interval,
+    recycle_max_rss_mb,
+    recycle_max_ops,
+    ping_timeout,
+    tracing,
+    trace_buffer,
+    status_ttl,
+    dav_books,
+    dav_username,
+    dav_password,
+    dav_auth,
+    dav_count_contacts,
+    baikal_config,
     show_config,
     shell_completion,
     api_key,
@@ -72,6 +191,30 @@ def baikalctl(
         log_level = "DEBUG"
     if log_level is not None:
         settings.LOG_LEVEL = log_level
+    settings.BACKEND = backend
+    settings.POOL_SIZE = pool_size
+    settings.CACHE_TTL = cache_ttl
+    settings.CACHE_SIZE = cache_size
+    settings.BOOKS_FANOUT = books_fanout
+    settings.PREWARM = prewarm
+    settings.WARMUP_USERNAME = warmup_username
+    settings.WARMUP_PASSWORD = warmup_password
+    settings.JOBS = jobs
+    settings.JOBS_DB = jobs_db
+    settings.JOB_WORKERS = job_workers
+    settings.JOB_RETENTION = job_retention
+    settings.LIFECYCLE_INTERVAL = lifecycle_interval
+    settings.RECYCLE_MAX_RSS_MB = recycle_max_rss_mb
+    settings.RECYCLE_MAX_OPS = recycle_max_ops
+    settings.PING_TIMEOUT = ping_timeout
+    settings.TRACING = tracing
+    settings.TRACE_BUFFER = trace_buffer
+    settings.STATUS_TTL = status_ttl
+    settings.DAV_BOOKS = dav_books
+    settings.DAV_USERNAME = dav_username
+    settings.DAV_PASSWORD = dav_password
+    settings.DAV_AUTH = dav_auth
+    settings.DAV_COUNT_CONTACTS = dav_count_contacts
 
     if show_config:
         click.echo(f"address: {address}")
@@ -83,6 +226,31 @@ def baikalctl(
         click.echo(f"profile_dir: {profile_dir}")
         click.echo(f"profile_create_timeout: {profile_create_timeout}")
         click.echo(f"profile_stabilize_time: {profile_stabilize_time}")
+        click.echo(f"backend: {backend}")
+        click.echo(f"pool_size: {pool_size}")
+        click.echo(f"login_ttl: {login_ttl}")
+        click.echo(f"lean_browser: {lean_browser}")
+        click.echo(f"cache_ttl: {cache_ttl}")
+        click.echo(f"cache_size: {cache_size}")
+        click.echo(f"books_fanout: {books_fanout}")
+        click.echo(f"prewarm: {prewarm}")
+        click.echo(f"warmup_username: {warmup_username}")
+        click.echo(f"jobs: {jobs}")
+        click.echo(f"jobs_db: {jobs_db}")
+        click.echo(f"job_workers: {job_workers}")
+        click.echo(f"job_retention: {job_retention}")
+        click.echo(f"lifecycle_interval: {lifecycle_interval}")
+        click.echo(f"recycle_max_rss_mb: {recycle_max_rss_mb}")
+        click.echo(f"recycle_max_ops: {recycle_max_ops}")
+        click.echo(f"ping_timeout: {ping_timeout}")
+        click.echo(f"tracing: {tracing}")
+        click.echo(f"trace_buffer: {trace_buffer}")
+        click.echo(f"status_ttl: {status_ttl}")
+        click.echo(f"dav_books: {dav_books}")
+        click.echo(f"dav_username: {dav_username}")
+        click.echo(f"dav_auth: {dav_auth}")
+        click.echo(f"dav_count_contacts: {dav_count_contacts}")
+        click.echo(f"baikal_config: {baikal_config}")
         click.echo(f"log_level: {log_level}")
         click.echo(f"debug: {debug}")
         sys.exit(0)
@@ -101,6 +269,9 @@ def baikalctl(
         logger="uvicorn",
         log_level=log_level,
         api_key=api_key,
+        login_ttl=login_ttl,
+        lean=lean_browser,
+        baikal_config=baikal_config,
     )
 
     uvicorn.run(
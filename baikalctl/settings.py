@@ -22,6 +22,36 @@ PROFILE_DIR = config("BAIKALCTL_PROFILE_DIR", cast=str, default=str(Path.home()
 PROFILE_CREATE_TIMEOUT = config("BAIKALCTL_PROFILE_CREATE_TIMEOUT", cast=int, default=30)
 PROFILE_STABILIZE_TIME = config("BAIKALCTL_PROFILE_STABILIZE_TIME", cast=int, default=2)
 
+BACKEND = config("BAIKALCTL_BACKEND", cast=str, default="browser")
+POOL_SIZE = config("BAIKALCTL_POOL_SIZE", cast=int, default=1)
+POOL_TIMEOUT = config("BAIKALCTL_POOL_TIMEOUT", cast=int, default=300)
+BAIKAL_CONFIG = config("BAIKALCTL_BAIKAL_CONFIG", cast=str, default="/var/www/baikal/config/baikal.yaml")
+LOGIN_TTL = config("BAIKALCTL_LOGIN_TTL", cast=int, default=300)
+LEAN_BROWSER = config("BAIKALCTL_LEAN_BROWSER", cast=bool, default=False)
+CACHE_TTL = config("BAIKALCTL_CACHE_TTL", cast=float, default=0)
+CACHE_SIZE = config("BAIKALCTL_CACHE_SIZE", cast=int, default=1024)
+BOOKS_FANOUT = config("BAIKALCTL_BOOKS_FANOUT", cast=int, default=4)
+PREWARM = config("BAIKALCTL_PREWARM", cast=bool, default=True)
+WARMUP_USERNAME = config("BAIKALCTL_WARMUP_USERNAME", cast=str, default="")
+WARMUP_PASSWORD = config("BAIKALCTL_WARMUP_PASSWORD", cast=str, default="")
+JOBS = config("BAIKALCTL_JOBS", cast=bool, default=False)
+JOBS_DB = config("BAIKALCTL_JOBS_DB", cast=str, default=str(Path.home() / ".cache" / "baikalctl" / "jobs.db"))
+JOB_WORKERS = config("BAIKALCTL_JOB_WORKERS", cast=int, default=1)
+JOB_RETENTION = config("BAIKALCTL_JOB_RETENTION", cast=float, default=86400)
+LIFECYCLE_INTERVAL = config("BAIKALCTL_LIFECYCLE_INTERVAL", cast=float, default=30)
+RECYCLE_MAX_RSS_MB = config("BAIKALCTL_RECYCLE_MAX_RSS_MB", cast=int, default=1024)
+RECYCLE_MAX_OPS = config("BAIKALCTL_RECYCLE_MAX_OPS", cast=int, default=1000)
+PING_TIMEOUT = config("BAIKALCTL_PING_TIMEOUT", cast=float, default=10)
+TRACING = config("BAIKALCTL_TRACING", cast=bool, default=True)
+TRACE_BUFFER = config("BAIKALCTL_TRACE_BUFFER", cast=int, default=100)
+STATUS_TTL = config("BAIKALCTL_STATUS_TTL", cast=float, default=30)
+
+DAV_BOOKS = config("BAIKALCTL_DAV_BOOKS", cast=bool, default=False)
+DAV_USERNAME = config("BAIKALCTL_DAV_USERNAME", cast=str, default="")
+DAV_PASSWORD = config("BAIKALCTL_DAV_PASSWORD", cast=str, default="")
+DAV_AUTH = config("BAIKALCTL_DAV_AUTH", cast=str, default="digest")
+DAV_COUNT_CONTACTS = config("BAIKALCTL_DAV_COUNT_CONTACTS", cast=bool, default=False)
+
 DEBUG = config("DEBUG", cast=bool, default=False)
 LOG_LEVEL = config("LOG_LEVEL", cast=str, default="WARNING")
 VERBOSE = config("VERBOSE", cast=bool, default=False)
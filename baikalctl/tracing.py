@@ -0,0 +1,187 @@
+# baikalctl request tracing
+
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from contextvars import ContextVar
+from typing import Any, Dict, List
+
+# the span that new spans nest under; None when the current request is not traced
+current: ContextVar["Span | None"] = ContextVar("baikalctl_span", default=None)
+
+
+class Span:
+    __slots__ = ("trace", "id", "parent", "name", "detail", "start_ns", "perf_ns", "duration_ns", "thread", "token")
+
+    def __init__(self, trace: "Trace", parent: "Span | None", name: str, detail: str | None = None):
+        self.trace = trace
+        self.id = secrets.token_hex(8)
+        self.parent = parent
+        self.name = name
+        self.detail = detail
+        self.start_ns = time.time_ns()
+        self.perf_ns = time.perf_counter_ns()
+        self.duration_ns = None
+        self.thread = threading.get_ident()
+        self.token = None
+
+    @property
+    def label(self) -> str:
+        return f"{self.name} {self.detail}" if self.detail else self.name
+
+
+class Trace:
+    """nested, timed spans recorded while serving one request"""
+
+    def __init__(self, name: str, **attributes):
+        self.id = secrets.token_hex(16)
+        self.attributes = attributes
+        self.root = Span(self, None, name)
+        self.spans: List[Span] = []
+
+    @property
+    def duration_ns(self) -> int:
+        if self.root.duration_ns is None:
+            return time.perf_counter_ns() - self.root.perf_ns
+        return self.root.duration_ns
+
+    def finish(self, **attributes):
+        self.root.duration_ns = time.perf_counter_ns() - self.root.perf_ns
+        self.attributes.update(attributes)
+
+    def summary(self) -> Dict[str, Any]:
+        return dict(
+            id=self.id,
+            name=self.root.name,
+            start=self.root.start_ns / 1e9,
+            duration_ms=round(self.duration_ns / 1e6, 3),
+            spans=len(self.spans),
+            **self.attributes,
+        )
+
+    def totals(self) -> Dict[str, List[float]]:
+        """span name: [total milliseconds, calls]"""
+        ret = defaultdict(lambda: [0.0, 0])
+        for span in self.spans:
+            if span.duration_ns is not None:
+                ret[span.name][0] += span.duration_ns / 1e6
+                ret[span.name][1] += 1
+        return ret
+
+    def server_timing(self, limit: int = 10) -> str:
+        """Server-Timing header value: the request total, then the span names that took longest in sum"""
+        entries = [f"total;dur={self.duration_ns / 1e6:.1f}"]
+        totals = sorted(self.totals().items(), key=lambda item: item[1][0], reverse=True)
+        for name, (ms, calls) in totals[:limit]:
+            entries.append(f'{name.lstrip("_")};dur={ms:.1f};desc="{calls}x"')
+        return ", ".join(entries)
+
+    def chrome(self) -> Dict[str, Any]:
+        """Chrome trace event format, loadable in chrome://tracing and Perfetto"""
+        events = []
+        for span in [self.root, *self.spans]:
+            if span.duration_ns is None:
+                continue
+            events.append(
+                dict(
+                    name=span.label,
+                    cat="baikalctl",
+                    ph="X",
+                    ts=span.start_ns / 1000,
+                    dur=span.duration_ns / 1000,
+                    pid=os.getpid(),
+                    tid=span.thread,
+                    args=dict(method=span.name, detail=span.detail) if span is not self.root else self.attributes,
+                )
+            )
+        return dict(traceEvents=events, displayTimeUnit="ms", otherData=dict(trace_id=self.id))
+
+    def otlp(self) -> Dict[str, Any]:
+        """OTLP/JSON ExportTraceServiceRequest, as accepted by an OpenTelemetry collector's /v1/traces"""
+
+        def attribute(key, value):
+            return dict(key=key, value=dict(stringValue=str(value)))
+
+        spans = []
+        for span in [self.root, *self.spans]:
+            if span.duration_ns is None:
+                continue
+            attributes = self.attributes if span is self.root else dict(detail=span.detail) if span.detail else {}
+            spans.append(
+                dict(
+                    traceId=self.id,
+                    spanId=span.id,
+                    parentSpanId=span.parent.id if span.parent else "",
+                    name=span.label,
+                    kind=2 if span is self.root else 1,
+                    startTimeUnixNano=str(span.start_ns),
+                    endTimeUnixNano=str(span.start_ns + span.duration_ns),
+                    attributes=[attribute(k, v) for k, v in attributes.items()],
+                )
+            )
+        return dict(
+            resourceSpans=[
+                dict(
+                    resource=dict(attributes=[attribute("service.name", "baikalctl")]),
+                    scopeSpans=[dict(scope=dict(name="baikalctl"), spans=spans)],
+                )
+            ]
+        )
+
+
+def begin(name: str, detail: str | None = None) -> Span | None:
+    """open a span under the current one, or return None when the request is not traced"""
+    parent = current.get()
+    if parent is None:
+        return None
+    span = Span(parent.trace, parent, name, detail)
+    span.token = current.set(span)
+    span.trace.spans.append(span)
+    return span
+
+
+def end(span: Span):
+    span.duration_ns = time.perf_counter_ns() - span.perf_ns
+    current.reset(span.token)
+
+
+def start(name: str, **attributes) -> Trace:
+    """begin tracing the current context; spans opened by it and the threads it hands its context to nest here"""
+    trace = Trace(name, **attributes)
+    trace.root.token = current.set(trace.root)
+    return trace
+
+
+def detach(trace: Trace):
+    """stop tracing the current context; contexts copied from it while tracing keep adding spans until finish"""
+    current.reset(trace.root.token)
+
+
+def stop(trace: Trace, **attributes):
+    trace.finish(**attributes)
+    detach(trace)
+
+
+class TraceBuffer:
+    """ring buffer holding the most recent traces"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.lock = threading.Lock()
+        self.traces: OrderedDict[str, Trace] = OrderedDict()
+
+    def add(self, trace: Trace):
+        with self.lock:
+            self.traces[trace.id] = trace
+            while len(self.traces) > self.size:
+                self.traces.popitem(last=False)
+
+    def get(self, id: str) -> Trace | None:
+        with self.lock:
+            return self.traces.get(id)
+
+    def list(self) -> List[Trace]:
+        with self.lock:
+            return list(reversed(self.traces.values()))
@@ -34,3 +34,7 @@ test-clean:
 
 test-sterile: test-clean
 	@:
+
+### end-to-end benchmark against the local admin emulator; results are saved as benchmark-VERSION.json
+benchmark:
+	python -m tests.benchmark $(benchmark_opts)
@@ -0,0 +1,529 @@
+# local stand-in for the baikal admin web UI
+
+import base64
+import html
+import secrets
+import threading
+import time
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+SUBMITTED = "Baikal\\Model\\submitted"
+TITLE = "Baïkal Web Admin"
+MAINTENANCE_TITLE = "Baïkal Maintainance"
+LOGIN_FAILED = "The login/password you provided is invalid. Please retry."
+
+# static files linked from every page when the emulator serves assets, as the real admin UI does
+ASSETS = {
+    "/baikal/res/core/TwitterBootstrap/css/bootstrap.min.css": (
+        "text/css",
+        '@font-face { font-family: "Glyphs"; src: url("../fonts/glyphs.woff") format("woff"); }\n'
+        "body { padding-top: 60px; font-family: Glyphs, sans-serif; }\n"
+        ".icon { background-image: url(../img/glyphicons-halflings.png); }\n",
+    ),
+    "/baikal/res/core/TwitterBootstrap/fonts/glyphs.woff": ("font/woff", "wOFF" + "\0" * 4096),
+    "/baikal/res/core/TwitterBootstrap/img/glyphicons-halflings.png": ("image/png", "\x89PNG" + "\0" * 8192),
+    "/baikal/res/core/BaikalAdmin/Templates/Page/baikal-logo.png": ("image/png", "\x89PNG" + "\0" * 8192),
+    "/baikal/res/core/jQuery/jquery-1.7.1.min.js": ("application/javascript", "window.jQuery = {};\n"),
+    "/baikal/res/core/TwitterBootstrap/js/bootstrap.min.js": ("application/javascript", "window.bootstrap = {};\n"),
+}
+
+
+class Emulator:
+    """serve baikal admin pages for an in-memory dataset
+
+    users: number of generated users
+    books: number of generated address books per user, in addition to the default book
+    latency: seconds to sleep before answering each request
+    asset_latency: when set, pages link ASSETS, each served after sleeping this many seconds
+    """
+
+    def __init__(
+        self,
+        *,
+        users=0,
+        books=0,
+        latency=0.0,
+        asset_latency=None,
+        username="admin",
+        password="admin_password",
+        initialized=True,
+        host="127.0.0.1",
+        port=0,
+    ):
+        self.admin = (username, password)
+        self.latency = latency
+        self.asset_latency = asset_latency
+        self.asset_requests = 0
+        self.install_state = "done" if initialized else "database"
+        self.lock = threading.RLock()
+        self.cookies = set()
+        self.users = {}
+        self.next_id = 1
+        self.requests = 0
+        for i in range(users):
+            uid = self.create_user(f"user{i}@example.com", f"User {i}", "password")
+            for j in range(books):
+                self.create_book(uid, f"book-{j}", f"Book {j}", f"generated book {j}")
+        self.server = ThreadingHTTPServer((host, port), self.handler_class())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/baikal"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self.thread:
+            self.thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _id(self):
+        ret = self.next_id
+        self.next_id += 1
+        return ret
+
+    def create_user(self, username, displayname, password):
+        with self.lock:
+            uid = self._id()
+            self.users[uid] = dict(username=username, displayname=displayname, password=password, books={})
+            self.create_book(uid, "default", "Default Address Book", "")
+            return uid
+
+    def create_book(self, uid, token, displayname, description, contacts=0):
+        with self.lock:
+            bid = self._id()
+            self.users[uid]["books"][bid] = dict(
+                token=token, displayname=displayname, description=description, contacts=contacts
+            )
+            return bid
+
+    def find_user(self, username):
+        with self.lock:
+            for uid, user in self.users.items():
+                if user["username"] == username:
+                    return uid
+        return None
+
+    def handler_class(self):
+        emulator = self
+
+        class Handler(RequestHandler):
+            pass
+
+        Handler.emulator = emulator
+        return Handler
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    emulator = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def admin(self):
+        return self.emulator.url + "/admin/"
+
+    def do_GET(self):
+        self.handle_request({})
+
+    def do_PROPFIND(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.new_cookie = None
+        emulator = self.emulator
+        if emulator.latency:
+            time.sleep(emulator.latency)
+        path = [unquote(p) for p in urlsplit(self.path).path.split("/") if p]
+        with emulator.lock:
+            if not self.dav_authorized():
+                return self.send(401, "", {"WWW-Authenticate": 'Basic realm="BaikalDAV"'})
+            if path[:3] != ["baikal", "dav.php", "addressbooks"] or len(path) not in [4, 5]:
+                return self.send(404, "")
+            uid = emulator.find_user(path[3])
+            if uid is None:
+                return self.send(404, "")
+            books = list(emulator.users[uid]["books"].values())
+            home = f"/baikal/dav.php/addressbooks/{quote(path[3])}/"
+            if len(path) == 4:
+                responses = [self.dav_response(home, "<d:resourcetype><d:collection/></d:resourcetype>")]
+                for book in books:
+                    responses.append(
+                        self.dav_response(
+                            f"{home}{book['token']}/",
+                            "<d:resourcetype><d:collection/><card:addressbook/></d:resourcetype>"
+                            f"<d:displayname>{html.escape(book['displayname'])}</d:displayname>"
+                            f"<card:addressbook-description>{html.escape(book['description'])}"
+                            "</card:addressbook-description>",
+                        )
+                    )
+            else:
+                book = [b for b in books if b["token"] == path[4]]
+                if not book:
+                    return self.send(404, "")
+                responses = [self.dav_response(f"{home}{path[4]}/", "<d:resourcetype><d:collection/></d:resourcetype>")]
+                for i in range(book[0]["contacts"]):
+                    responses.append(
+                        self.dav_response(f"{home}{path[4]}/card-{i}.vcf", f'<d:getetag>"{i}"</d:getetag>')
+                    )
+        body = (
+            '<?xml version="1.0" encoding="utf-8"?>'
+            '<d:multistatus xmlns:d="DAV:" xmlns:card="urn:ietf:params:xml:ns:carddav">'
+            + "".join(responses)
+            + "</d:multistatus>"
+        )
+        self.send(207, body, {"Content-Type": "application/xml; charset=utf-8"})
+
+    def dav_authorized(self):
+        auth = self.headers.get("Authorization", "")
+        if not auth.startswith("Basic "):
+            return False
+        username, _, password = base64.b64decode(auth[6:]).decode().partition(":")
+        uid = self.emulator.find_user(username)
+        return uid is not None and self.emulator.users[uid]["password"] == password
+
+    def dav_response(self, href, props):
+        return (
+            f"<d:response><d:href>{href}</d:href><d:propstat><d:prop>{props}</d:prop>"
+            "<d:status>HTTP/1.1 200 OK</d:status></d:propstat></d:response>"
+        )
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length).decode()
+        form = {k: v[0] for k, v in parse_qs(body, keep_blank_values=True).items()}
+        self.handle_request(form)
+
+    def handle_request(self, form):
+        emulator = self.emulator
+        if emulator.asset_latency is not None and urlsplit(self.path).path in ASSETS:
+            return self.asset(urlsplit(self.path).path)
+        with emulator.lock:
+            emulator.requests += 1
+        if emulator.latency:
+            time.sleep(emulator.latency)
+        self.new_cookie = None
+        parts = urlsplit(self.path)
+        path = parts.path.rstrip("/")
+        route = [p for p in parts.query.split("/") if p]
+        with emulator.lock:
+            if path == "/baikal/admin/install":
+                return self.install(form)
+            if path != "/baikal/admin":
+                return self.send(404, "<html><body>not found</body></html>")
+            if emulator.install_state != "done":
+                return self.page(MAINTENANCE_TITLE, "<p>Baïkal is not configured</p>", navbar=False)
+            if not self.logged_in():
+                return self.login(form)
+            if route == ["logout"]:
+                emulator.cookies.discard(self.cookie())
+                return self.redirect(self.admin)
+            if route[:1] == ["users"]:
+                return self.users(route[1:], form)
+            return self.page(TITLE, '<header class="jumbotron subhead"><h1>Dashboard</h1></header>')
+
+    # responses
+
+    def send(self, status, body, headers={}):
+        data = body.encode()
+        self.send_response(status)
+        if "Content-Type" not in headers:
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        if self.new_cookie:
+            self.send_header("Set-Cookie", f"PHPSESSID={self.new_cookie}; path=/")
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def asset(self, path):
+        with self.emulator.lock:
+            self.emulator.asset_requests += 1
+        time.sleep(self.emulator.asset_latency)
+        self.new_cookie = None
+        content_type, body = ASSETS[path]
+        self.send(200, body, {"Content-Type": content_type, "Cache-Control": "max-age=3600"})
+
+    def head(self):
+        if self.emulator.asset_latency is None:
+            return ""
+        root = self.emulator.url.partition("/baikal")[0]
+        links = "".join(f'<link rel="stylesheet" href="{root}{path}"/>' for path in ASSETS if path.endswith(".css"))
+        scripts = "".join(f'<script src="{root}{path}"></script>' for path in ASSETS if path.endswith(".js"))
+        return links + scripts
+
+    def logo(self):
+        if self.emulator.asset_latency is None:
+            return ""
+        return f'<img src="{self.emulator.url}/res/core/BaikalAdmin/Templates/Page/baikal-logo.png"/>'
+
+    def redirect(self, location):
+        self.send(302, "", {"Location": location})
+
+    def page(self, title, content, messages=[], navbar=True):
+        if navbar:
+            links = [("Dashboard", ""), ("Users and resources", "?/users/"), ("Settings", "?/settings/standard/")]
+            items = "".join(f'<li><a href="{self.admin}{href}">{label}</a></li>' for label, href in links)
+            items += f'<li><a href="{self.admin}?/logout/">Logout</a></li>'
+            nav = f'<ul class="nav">{items}</ul>'
+        else:
+            nav = ""
+        alerts = "".join(f'<div id="message" class="alert {cls}">{html.escape(msg)}</div>' for cls, msg in messages)
+        self.send(
+            200,
+            f"<!DOCTYPE html><html><head><title>{title}</title>{self.head()}</head><body>"
+            '<div class="navbar navbar-fixed-top"><div class="navbar-inner"><div class="container">'
+            f'<a class="brand" href="{self.admin}">{self.logo()}{TITLE}</a>{nav}</div></div></div>'
+            f'<div class="container">{alerts}{content}</div></body></html>',
+        )
+
+    def form(self, action, legend, fields, hidden={}):
+        inputs = "".join(f'<input type="hidden" name="{k}" value="{html.escape(v)}"/>' for k, v in hidden.items())
+        for name, label, kind in fields:
+            inputs += (
+                f'<div class="control-group"><label class="control-label" for="{name}">{label}</label>'
+                f'<div class="controls"><input type="{kind}" name="{name}" id="{name}" value=""/></div></div>'
+            )
+        return (
+            f'<a id="form"></a><form class="form-horizontal" action="{action}" method="post"'
+            ' enctype="multipart/form-data">'
+            f'<input type="hidden" name="refreshed" value="0"/><input type="hidden" name="{SUBMITTED}" value="1"/>'
+            f"<fieldset><legend>{legend}</legend>{inputs}"
+            '<div class="form-actions"><button type="submit" class="btn btn-primary">Save changes</button> '
+            f'<a class="btn" href="{self.admin}?/users/">Close</a></div></fieldset></form>'
+        )
+
+    # session
+
+    def cookie(self):
+        cookie = SimpleCookie(self.headers.get("Cookie", ""))
+        return cookie["PHPSESSID"].value if "PHPSESSID" in cookie else None
+
+    def logged_in(self):
+        return self.cookie() in self.emulator.cookies
+
+    def login(self, form):
+        messages = []
+        if form.get("auth") == "1":
+            if (form.get("login"), form.get("password")) == self.emulator.admin:
+                self.new_cookie = secrets.token_hex(16)
+                self.emulator.cookies.add(self.new_cookie)
+                return self.page(TITLE, '<header class="jumbotron subhead"><h1>Dashboard</h1></header>')
+            messages.append(("alert-error", LOGIN_FAILED))
+        content = (
+            f'<form class="form-horizontal" action="{self.admin}" method="post" enctype="multipart/form-data">'
+            '<input type="hidden" name="auth" value="1"/><fieldset><legend>Authentication</legend>'
+            '<input type="text" name="login" id="login" value=""/>'
+            '<input type="password" name="password" id="password" value=""/>'
+            '<div class="form-actions"><button type="submit" class="btn btn-primary">Authenticate</button></div>'
+            "</fieldset></form>"
+        )
+        return self.page(TITLE, content, messages, navbar=False)
+
+    def install(self, form):
+        emulator = self.emulator
+        state = emulator.install_state
+        if state == "done":
+            return self.send(200, "<html><body>Installation was already completed.</body></html>")
+        submitted = form.get(SUBMITTED) == "1"
+        if state == "database" and submitted:
+            state = emulator.install_state = "wizard"
+        elif state == "wizard" and submitted:
+            password = form.get("data[admin_passwordhash]", "")
+            if password and password == form.get("data[admin_passwordhash_confirm]"):
+                emulator.admin = (emulator.admin[0], password)
+                state = emulator.install_state = "start"
+        elif state == "start" and form == {} and self.path.endswith("?/start/"):
+            emulator.install_state = "done"
+            return self.redirect(self.admin)
+        action = emulator.url + "/admin/install/"
+        if state == "database":
+            content = '<div class="jumbotron"><h1>Baïkal Database setup</h1></div>' + self.form(
+                action, "Database", [("data[sqlite_file]", "SQLite file", "text")]
+            )
+        elif state == "wizard":
+            content = '<div class="jumbotron"><h1>Baïkal initialization wizard</h1></div>' + self.form(
+                action,
+                "General",
+                [
+                    ("data[invite_from]", "Invite from", "text"),
+                    ("data[admin_passwordhash]", "Admin password", "password"),
+                    ("data[admin_passwordhash_confirm]", "Admin password confirmation", "password"),
+                ],
+            ).replace(
+                "<fieldset>",
+                '<fieldset><select name="data[timezone]"><option value="Europe/Paris">Europe/Paris</option>'
+                '<option value="UTC">UTC</option></select>',
+            )
+        else:
+            content = f'<a class="btn btn-success" href="{action}?/start/">Start using Baïkal</a>'
+        return self.page(MAINTENANCE_TITLE, content, navbar=False)
+
+    # users and resources
+
+    def users(self, route, form):
+        emulator = self.emulator
+        if route[:1] == ["addressbooks"] and len(route) >= 2:
+            uid = int(route[1])
+            if uid not in emulator.users:
+                return self.send(404, "<html><body>no such user</body></html>")
+            return self.books(uid, route[2:], form)
+        messages = []
+        extra = ""
+        if route[:2] == ["new", "1"]:
+            if form.get(SUBMITTED) == "1":
+                messages = self.add_user(form)
+            extra = self.form(
+                f"{self.admin}?/users/new/1/#form",
+                "Creating new User",
+                [
+                    ("data[username]", "Username", "text"),
+                    ("data[displayname]", "Display name", "text"),
+                    ("data[email]", "Email", "text"),
+                    ("data[password]", "Password", "password"),
+                    ("data[passwordconfirm]", "Confirm password", "password"),
+                ],
+            )
+        elif route[:1] == ["delete"] and len(route) >= 2:
+            uid = int(route[1])
+            if uid in emulator.users:
+                username = emulator.users[uid]["username"]
+                if route[2:3] == ["confirm"]:
+                    del emulator.users[uid]
+                    messages = [("alert-success", f"User {username} has been deleted.")]
+                else:
+                    extra = self.confirm(f"?/users/delete/{uid}/confirm/", username, "?/users/")
+        return self.page(TITLE, self.users_table() + extra, messages)
+
+    def add_user(self, form):
+        username = form.get("data[username]", "").strip()
+        password = form.get("data[password]", "")
+        if not username:
+            return [("alert-error", "Username: this field is required")]
+        if self.emulator.find_user(username) is not None:
+            return [("alert-error", "Username: this username is already used")]
+        if password != form.get("data[passwordconfirm]"):
+            return [("alert-error", "Password: passwords do not match")]
+        self.emulator.create_user(username, form.get("data[displayname]", ""), password)
+        return [("alert-success", f"User {username} has been created.")]
+
+    def confirm(self, href, name, cancel):
+        return (
+            f'<div class="alert alert-block alert-error"><h3>Delete <strong>{html.escape(name)}</strong></h3>'
+            f'<p><a class="btn btn-danger" href="{self.admin}{href}">Delete {html.escape(name)}</a> '
+            f'<a class="btn" href="{self.admin}{cancel}">Cancel</a></p></div>'
+        )
+
+    def popover(self, **fields):
+        content = "<br/>".join(f"<strong>{k}</strong><br/>{html.escape(v)}" for k, v in fields.items())
+        return f'<span class="btn btn-mini popover-hover" data-content="{html.escape(content)}">i</span>'
+
+    def users_table(self):
+        rows = []
+        for uid, user in self.emulator.users.items():
+            username = html.escape(user["username"])
+            popover = self.popover(
+                **{
+                    "User name": user["username"],
+                    "Display name": user["displayname"],
+                    "URI": f"{self.emulator.url}/dav.php/principals/{user['username']}/",
+                }
+            )
+            actions = "".join(
+                f'<a class="btn btn-mini" href="{self.admin}?/users/{href}/{uid}/">{label}</a> '
+                for label, href in [
+                    ("Calendars", "calendars"),
+                    ("Address Books", "addressbooks"),
+                    ("Edit", "edit"),
+                    ("Delete", "delete"),
+                ]
+            )
+            rows.append(
+                f'<tr><td class="col-username"><i class="icon-user"></i> <strong>{username}</strong><br/>'
+                f'{html.escape(user["displayname"])} &lt;<a href="mailto:{username}">{username}</a>&gt;</td>'
+                f'<td class="col-actions no-border-left">{popover} {actions}</td></tr>'
+            )
+        return (
+            '<header class="jumbotron subhead"><h1>Users</h1>'
+            f'<p><a class="btn btn-success" href="{self.admin}?/users/new/1/#form">+ Add user</a></p></header>'
+            f'<table class="table table-striped users"><tbody>{"".join(rows)}</tbody></table>'
+        )
+
+    def books(self, uid, route, form):
+        user = self.emulator.users[uid]
+        base = f"?/users/addressbooks/{uid}/"
+        messages = []
+        extra = ""
+        if route[:2] == ["new", "1"]:
+            if form.get(SUBMITTED) == "1":
+                messages = self.add_book(uid, form)
+            extra = self.form(
+                f"{self.admin}{base}new/1/#form",
+                "Creating new Address Book",
+                [
+                    ("data[uri]", "Address Book token ID", "text"),
+                    ("data[displayname]", "Display name", "text"),
+                    ("data[description]", "Description", "text"),
+                ],
+            )
+        elif route[:1] == ["delete"] and len(route) >= 2:
+            bid = int(route[1])
+            if bid in user["books"]:
+                name = user["books"][bid]["displayname"]
+                if route[2:3] == ["confirm"]:
+                    del user["books"][bid]
+                    messages = [("alert-success", f"Address Book {name} has been deleted.")]
+                else:
+                    extra = self.confirm(f"{base}delete/{bid}/confirm/", name, base)
+        return self.page(TITLE, self.books_table(uid) + extra, messages)
+
+    def add_book(self, uid, form):
+        token = form.get("data[uri]", "").strip()
+        displayname = form.get("data[displayname]", "").strip()
+        if not token or not displayname:
+            return [("alert-error", "Address Book token ID: this field is required")]
+        if token in [book["token"] for book in self.emulator.users[uid]["books"].values()]:
+            return [("alert-error", "Address Book token ID: this token is already used")]
+        self.emulator.create_book(uid, token, displayname, form.get("data[description]", "").strip())
+        return [("alert-success", f"Address Book {displayname} has been created.")]
+
+    def books_table(self, uid):
+        user = self.emulator.users[uid]
+        base = f"{self.admin}?/users/addressbooks/{uid}/"
+        rows = []
+        for bid, book in user["books"].items():
+            popover = self.popover(
+                **{
+                    "User name": user["username"],
+                    "URI": f"{self.emulator.url}/dav.php/addressbooks/{user['username']}/{book['token']}/",
+                }
+            )
+            rows.append(
+                f'<tr><td class="col-displayname"><i class="icon-book"></i> {html.escape(book["displayname"])}</td>'
+                f'<td class="col-contacts">{book["contacts"]}</td>'
+                f'<td class="col-description">{html.escape(book["description"])}</td>'
+                f'<td class="col-actions no-border-left">{popover} '
+                f'<a class="btn btn-mini" href="{base}edit/{bid}/">Edit</a> '
+                f'<a class="btn btn-mini" href="{base}delete/{bid}/">Delete</a></td></tr>'
+            )
+        return (
+            f'<header class="jumbotron subhead"><h1>Address Books for {html.escape(user["username"])}</h1>'
+            f'<p><a class="btn btn-success" href="{base}new/1/#form">+ Add address book</a></p></header>'
+            f'<table class="table table-striped addressbooks"><tbody>{"".join(rows)}</tbody></table>'
+        )
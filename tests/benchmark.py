@@ -0,0 +1,201 @@
+# end-to-end throughput benchmark: the real app driven through API against the local admin emulator
+#
+#   python -m tests.benchmark --users 10,1000,10000 --output benchmark.json --baseline previous.json
+
+import json
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import click
+import requests
+import uvicorn
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+
+from baikalctl import settings
+from baikalctl.app import app
+from baikalctl.browser import SessionConfig
+from baikalctl.client import API
+from baikalctl.pool import BACKENDS
+from baikalctl.version import __version__
+
+from .baikal_emulator import Emulator
+
+API_KEY = "benchmark_api_key"
+PASSWORD = "benchmark_password"
+OPERATIONS = ["list", "add", "delete"]
+START_TIMEOUT = 60
+
+
+def client_keypair(dir: Path):
+    """write a throwaway client certificate and key; the emulator is plain HTTP, but API requires the files"""
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "baikalctl benchmark")])
+    now = datetime.now(timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now)
+        .not_valid_after(now + timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    cert_file, key_file = dir / "client.pem", dir / "client.key"
+    cert_file.write_bytes(cert.public_bytes(serialization.Encoding.PEM))
+    key_file.write_bytes(
+        key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption())
+    )
+    return str(cert_file), str(key_file)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class Server:
+    """the baikalctl app served by uvicorn on a background thread"""
+
+    def __init__(self, port: int):
+        self.url = f"http://127.0.0.1:{port}"
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        deadline = time.monotonic() + START_TIMEOUT
+        while time.monotonic() < deadline:
+            try:
+                if requests.get(f"{self.url}/ready/", timeout=1).ok:
+                    return self
+            except requests.ConnectionError:
+                pass
+            time.sleep(0.1)
+        raise RuntimeError(f"timeout waiting for {self.url}/ready/")
+
+    def __exit__(self, *args):
+        self.server.should_exit = True
+        self.thread.join()
+
+
+def summarize(latencies, elapsed):
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+    return dict(
+        count=len(latencies),
+        ops_per_sec=round(len(latencies) / elapsed, 3),
+        p50_ms=round(cuts[49] * 1000, 3),
+        p95_ms=round(cuts[94] * 1000, 3),
+        p99_ms=round(cuts[98] * 1000, 3),
+        max_ms=round(max(latencies) * 1000, 3),
+    )
+
+
+def measure(operation, items, concurrency):
+    """run operation(item) for each item with concurrency threads, returning per-call latencies and total time"""
+
+    def timed(item):
+        start = time.perf_counter()
+        operation(item)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(timed, items))
+    return latencies, time.perf_counter() - start
+
+
+def run_size(users, count, concurrency, latency, keypair):
+    with Emulator(users=users, books=1, latency=latency) as emulator:
+        for name, value in dict(url=emulator.url, cert="", key="", api_key=API_KEY).items():
+            setattr(SessionConfig, name, value)
+        settings.WARMUP_USERNAME, settings.WARMUP_PASSWORD = emulator.admin
+        with Server(free_port()) as server:
+            api = API(server.url, emulator.admin[0], emulator.admin[1], *keypair, API_KEY)
+            names = [f"bench{i}@example.com" for i in range(count)]
+            operations = dict(
+                list=(lambda _: api.users(), range(count)),
+                add=(lambda username: api.add_user(username, username, PASSWORD), names),
+                delete=(lambda username: api.delete_user(username), names),
+            )
+            results = []
+            for operation in OPERATIONS:
+                func, items = operations[operation]
+                latencies, elapsed = measure(func, items, concurrency)
+                result = dict(users=users, operation=operation, **summarize(latencies, elapsed))
+                click.echo(
+                    f"{users:>6} users {operation:<6} {result['ops_per_sec']:>9.2f} ops/s "
+                    f"p50={result['p50_ms']:.1f}ms p95={result['p95_ms']:.1f}ms p99={result['p99_ms']:.1f}ms"
+                )
+                results.append(result)
+            return results
+
+
+def compare(results, baseline):
+    previous = {(r["users"], r["operation"]): r for r in baseline["results"]}
+    click.echo(f"compared to {baseline['version']} ({baseline['timestamp']}):")
+    for result in results:
+        old = previous.get((result["users"], result["operation"]))
+        if old:
+            click.echo(
+                f"{result['users']:>6} users {result['operation']:<6} "
+                f"ops/s x{result['ops_per_sec'] / old['ops_per_sec']:.2f} p95 x{result['p95_ms'] / old['p95_ms']:.2f}"
+            )
+
+
+@click.command("benchmark")
+@click.option("--users", default="10,1000,10000", help="comma-separated dataset sizes (default: 10,1000,10000)")
+@click.option("--count", type=int, default=20, help="operations of each kind per dataset size (default: 20)")
+@click.option("--concurrency", type=int, default=1, help="concurrent API clients (default: 1)")
+@click.option("--latency", type=float, default=0.0, help="seconds the emulator sleeps before each response")
+@click.option("--backend", type=click.Choice(list(BACKENDS)), default="forms", help="session backend (default: forms)")
+@click.option("--pool-size", type=int, default=1, help="pooled sessions (default: 1)")
+@click.option("--cache-ttl", type=float, default=0, help="read cache TTL; 0 measures every list (default: 0)")
+@click.option("-o", "--output", type=click.Path(dir_okay=False), help="results file (default: benchmark-VERSION.json)")
+@click.option("-b", "--baseline", type=click.File("r"), help="earlier results file to compare against")
+def benchmark(users, count, concurrency, latency, backend, pool_size, cache_ttl, output, baseline):
+    """measure list, add and delete throughput and latency of the app through API"""
+    settings.BACKEND = backend
+    settings.POOL_SIZE = pool_size
+    settings.CACHE_TTL = cache_ttl
+    settings.JOBS = False
+    settings.LIFECYCLE_INTERVAL = 0
+    with tempfile.TemporaryDirectory() as dir:
+        keypair = client_keypair(Path(dir))
+        results = []
+        for size in [int(size) for size in users.split(",")]:
+            results.extend(run_size(size, count, concurrency, latency, keypair))
+    report = dict(
+        version=__version__,
+        timestamp=datetime.now(timezone.utc).isoformat(),
+        python=sys.version.split()[0],
+        config=dict(
+            backend=backend,
+            pool_size=pool_size,
+            cache_ttl=cache_ttl,
+            count=count,
+            concurrency=concurrency,
+            latency=latency,
+        ),
+        results=results,
+    )
+    output = Path(output or f"benchmark-{__version__}.json")
+    output.write_text(json.dumps(report, indent=2))
+    click.echo(f"results written to {output}")
+    if baseline:
+        compare(results, json.load(baseline))
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,257 @@
+import json
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from baikalctl import settings
+from baikalctl.app import app
+from baikalctl.browser import SessionConfig
+from baikalctl.metrics import REGISTRY
+
+from .baikal_emulator import Emulator
+
+API_KEY = "test_api_key"
+
+
+@pytest.fixture
+def emulator():
+    with Emulator(users=3, books=1) as emulator:
+        yield emulator
+
+
+def client_for(emulator, monkeypatch):
+    monkeypatch.setattr(settings, "BACKEND", "forms")
+    monkeypatch.setattr(settings, "POOL_SIZE", 2)
+    for name, value in dict(url=emulator.url, cert="", key="", api_key=API_KEY).items():
+        monkeypatch.setattr(SessionConfig, name, value, raising=False)
+    headers = {"X-Admin-Username": emulator.admin[0], "X-Admin-Password": emulator.admin[1], "X-Api-Key": API_KEY}
+    return TestClient(app, headers=headers)
+
+
+@pytest.fixture
+def client(emulator, monkeypatch):
+    with client_for(emulator, monkeypatch) as client:
+        yield client
+
+
+@pytest.fixture
+def cached_client(emulator, monkeypatch):
+    # deployments opt in to the read cache
+    monkeypatch.setattr(settings, "CACHE_TTL", 30)
+    with client_for(emulator, monkeypatch) as client:
+        yield client
+
+
+def test_app_books_cached(cached_client):
+    books = cached_client.get("/books/").json()["books"]
+    assert len(books) == 3 * 2
+    cache = cached_client.get("/status/").json()["status"]["cache"]
+    assert cached_client.get("/books/user1@example.com/").json()["books"] == books[2:4]
+    assert cached_client.get("/status/").json()["status"]["cache"]["hits"] == cache["hits"] + 1
+
+
+def test_app_users_batch(client):
+    batch = dict(
+        add=[
+            dict(username="new0@example.com", displayname="New Zero", password="new_password"),
+            dict(username="user0@example.com", displayname="Exists", password="new_password"),
+        ],
+        delete=[dict(username="user1@example.com"), dict(username="nobody@example.com")],
+    )
+    response = client.post("/users/batch/", json=batch).json()
+    assert response["failed"] == 2
+    assert [(r["action"], r["username"], r["success"]) for r in response["results"]] == [
+        ("delete", "user1@example.com", True),
+        ("delete", "nobody@example.com", False),
+        ("add", "new0@example.com", True),
+        ("add", "user0@example.com", False),
+    ]
+    assert response["results"][3]["message"] == "AddFailed"
+    users = [u["username"] for u in client.get("/users/").json()["users"]]
+    assert users == ["user0@example.com", "user2@example.com", "new0@example.com"]
+
+
+def test_app_books_batch(client):
+    batch = dict(
+        add=[
+            dict(username="user0@example.com", bookname="Contacts"),
+            dict(username="nobody@example.com", bookname="x"),
+        ],
+        delete=[dict(username="user0@example.com", token="book-0")],
+    )
+    response = client.post("/books/batch/", json=batch).json()
+    assert response["failed"] == 1
+    assert response["results"][1]["token"] == "user0-example-com-contacts"
+    tokens = [b["token"] for b in client.get("/books/user0@example.com/").json()["books"]]
+    assert tokens == ["default", "user0-example-com-contacts"]
+
+
+def test_app_reconcile(client):
+    state = dict(
+        users=[
+            dict(username="user0@example.com", password="user0_password", books=[dict(bookname="book 0")]),
+            dict(username="new@example.com", password="new_password", books=[dict(bookname="contacts")]),
+        ],
+        prune=True,
+    )
+    plan = client.post("/reconcile/", params=dict(dry_run=True), json=state).json()
+    assert plan["operations"] == 6
+    assert plan["results"] == []
+    assert len(client.get("/users/").json()["users"]) == 3
+    response = client.post("/reconcile/", json=state).json()
+    assert response["failed"] == 0
+    assert len(response["results"]) == 6
+    assert client.post("/reconcile/", params=dict(dry_run=True), json=state).json()["operations"] == 0
+
+
+def test_app_jobs(emulator, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "JOBS", True)
+    monkeypatch.setattr(settings, "JOBS_DB", str(tmp_path / "jobs.db"))
+    with client_for(emulator, monkeypatch) as client:
+        response = client.post("/user/", json=dict(username="new@example.com", password="new_password"))
+        assert response.status_code == 202
+        job = response.json()["job"]
+        job = client.get(f"/jobs/{job['id']}/", params=dict(wait=5)).json()["job"]
+        assert job["state"] == "done"
+        assert job["result"]["user"]["username"] == "new@example.com"
+        assert client.get("/status/").json()["status"]["jobs"]["done"] == 1
+        assert client.get("/jobs/unknown/").status_code == 404
+
+
+def test_app_ready(emulator, monkeypatch):
+    monkeypatch.setattr(settings, "WARMUP_USERNAME", emulator.admin[0])
+    monkeypatch.setattr(settings, "WARMUP_PASSWORD", emulator.admin[1])
+    with client_for(emulator, monkeypatch) as client:
+        app.state.ready.wait(5)
+        response = client.get("/ready/", headers={"X-Api-Key": ""})
+        assert response.status_code == 200
+        assert response.json()["ready"] is True
+        assert all(session.logged_in for session in app.state.pool.sessions)
+        assert client.get("/users/", headers={"X-Api-Key": "invalid"}).status_code == 401
+
+
+def test_app_not_ready(emulator, monkeypatch):
+    monkeypatch.setattr(settings, "WARMUP_USERNAME", emulator.admin[0])
+    monkeypatch.setattr(settings, "WARMUP_PASSWORD", "wrong_password")
+    with client_for(emulator, monkeypatch) as client:
+        for _ in range(50):
+            response = client.get("/ready/")
+            if response.json()["message"] == "warm-up failed":
+                break
+            time.sleep(0.1)
+        assert response.status_code == 503
+        assert response.json()["ready"] is False
+
+
+def test_app_health(emulator, monkeypatch):
+    with client_for(emulator, monkeypatch) as client:
+        app.state.ready.wait(5)
+        response = client.get("/health/", headers={"X-Api-Key": ""})
+        assert response.status_code == 200
+        health = response.json()["health"]
+        assert health["last_success"] is None
+        assert [s["busy"] for s in health["sessions"]] == [False, False]
+        assert client.get("/users/").status_code == 200
+        assert client.get("/health/").json()["health"]["last_success"] is not None
+        assert client.get("/users/", headers={"X-Admin-Password": "wrong_password"}).status_code == 500
+        assert "wrong_password" not in client.get("/health/").json()["health"]["last_error"]
+
+
+def test_app_status_age(emulator, monkeypatch):
+    monkeypatch.setattr(settings, "STATUS_TTL", 0.2)
+    with client_for(emulator, monkeypatch) as client:
+        first = client.get("/status/").json()["status"]
+        assert first["login"] == "success"
+        time.sleep(0.3)
+        # stale: served as is while a refresh runs in the background
+        assert client.get("/status/").json()["status"]["age"] >= 0.3
+        for _ in range(50):
+            if client.get("/status/").json()["status"]["age"] < 0.2:
+                break
+            time.sleep(0.05)
+        else:
+            raise AssertionError("status was not refreshed")
+        assert client.get("/status/", params=dict(refresh=True)).json()["status"]["age"] < 0.2
+
+
+def test_app_metrics(emulator, monkeypatch):
+    with client_for(emulator, monkeypatch) as client:
+        assert client.get("/books/user0@example.com/").status_code == 200
+        assert client.get("/users/", params=dict(format="ndjson")).status_code == 200
+        response = client.get("/metrics", headers={"X-Api-Key": ""})
+        assert response.status_code == 200
+        metrics = response.text
+        assert 'baikalctl_request_seconds_count{endpoint="/books/{username}/",method="GET",status="200"}' in metrics
+        assert 'baikalctl_session_method_seconds_count{backend="forms",method="books"}' in metrics
+        assert 'baikalctl_session_method_seconds_count{backend="forms",method="iter_users"}' in metrics
+        assert 'baikalctl_navigations_total{backend="forms"}' in metrics
+        assert 'baikalctl_logins_total{backend="forms"}' in metrics
+        assert "baikalctl_requests_in_flight 1.0" in metrics
+
+
+def test_app_trace(emulator, monkeypatch):
+    with client_for(emulator, monkeypatch) as client:
+        response = client.get("/books/")
+        assert response.status_code == 200
+        timing = response.headers["Server-Timing"]
+        assert timing.startswith("total;dur=")
+        assert "load_page;dur=" in timing
+        id = response.headers["X-Trace-Id"]
+        summary = client.get("/traces/").json()["traces"][0]
+        assert summary["id"] == id
+        assert summary["name"] == "GET /books/"
+        assert summary["status"] == 200
+        events = client.get(f"/traces/{id}/").json()["traceEvents"]
+        names = [event["name"] for event in events]
+        assert names[0] == "GET /books/"
+        assert "login" in names
+        # the book pages crawled on the fan-out threads belong to the request trace
+        assert len([name for name in names if name.startswith("books_at")]) == 3
+        spans = client.get(f"/traces/{id}/", params=dict(format="otlp")).json()
+        spans = spans["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        ids = {span["spanId"] for span in spans}
+        assert all(span["parentSpanId"] in ids for span in spans[1:])
+        assert client.get("/traces/unknown/").status_code == 404
+
+
+def test_app_ndjson(cached_client):
+    users = cached_client.get("/users/").json()["users"]
+    response = cached_client.get("/users/", headers={"Accept": "application/x-ndjson"})
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.headers["content-encoding"] == "gzip"
+    assert [json.loads(line) for line in response.text.splitlines()] == users
+    books = cached_client.get("/books/").json()["books"]
+    response = cached_client.get("/books/", params=dict(format="ndjson"), headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert [json.loads(line) for line in response.text.splitlines()] == books
+    response = cached_client.get("/books/user1@example.com/", params=dict(format="ndjson"))
+    assert [json.loads(line) for line in response.text.splitlines()] == books[2:4]
+    # a streamed listing fills the cache like a plain one
+    cached_client.post("/reset/")
+    cached_client.get("/users/", params=dict(format="ndjson"))
+    hits = cached_client.get("/status/").json()["status"]["cache"]["hits"]
+    assert cached_client.get("/users/").json()["users"] == users
+    assert cached_client.get("/status/").json()["status"]["cache"]["hits"] == hits + 1
+
+
+def test_app_trace_stream(monkeypatch):
+    # one book page at a time, slow enough that the later ones load while the body streams
+    monkeypatch.setattr(settings, "BOOKS_FANOUT", 1)
+    labels = dict(method="GET", endpoint="/books/", status="200")
+    with Emulator(users=3, books=1, latency=0.05) as emulator:
+        with client_for(emulator, monkeypatch) as client:
+            measured = REGISTRY.get_sample_value("baikalctl_request_seconds_sum", labels) or 0
+            response = client.get("/books/", params=dict(format="ndjson"))
+            measured = REGISTRY.get_sample_value("baikalctl_request_seconds_sum", labels) - measured
+            assert len(response.text.splitlines()) == 3 * 2
+            assert "book_links;dur=" in response.headers["Server-Timing"]
+            id = response.headers["X-Trace-Id"]
+            assert client.get("/traces/").json()["traces"][0]["id"] == id
+            root, *events = client.get(f"/traces/{id}/").json()["traceEvents"]
+            assert len([event for event in events if event["name"].startswith("books_at")]) == 3
+            # the request span lasts until the last streamed step has finished
+            last = max(event["ts"] + event["dur"] for event in events)
+            assert root["ts"] + root["dur"] >= last
+            # and so does the request latency metric
+            assert measured >= (last - root["ts"]) / 1e6 - 0.01
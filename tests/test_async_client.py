@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+
+from baikalctl import settings
+from baikalctl.browser import SessionConfig
+from baikalctl.client import AsyncAPI
+
+from .baikal_emulator import Emulator
+from .benchmark import API_KEY, Server, client_keypair, free_port
+
+
+@pytest.fixture
+def server(emulator, monkeypatch):
+    monkeypatch.setattr(settings, "BACKEND", "forms")
+    monkeypatch.setattr(settings, "POOL_SIZE", 2)
+    monkeypatch.setattr(settings, "JOBS", False)
+    monkeypatch.setattr(settings, "LIFECYCLE_INTERVAL", 0)
+    monkeypatch.setattr(settings, "WARMUP_USERNAME", emulator.admin[0])
+    monkeypatch.setattr(settings, "WARMUP_PASSWORD", emulator.admin[1])
+    for name, value in dict(url=emulator.url, cert="", key="", api_key=API_KEY).items():
+        monkeypatch.setattr(SessionConfig, name, value, raising=False)
+    with Server(free_port()) as server:
+        yield server
+
+
+@pytest.fixture
+def emulator():
+    with Emulator(users=3, books=1) as emulator:
+        yield emulator
+
+
+@pytest.fixture
+def connect(server, emulator, tmp_path):
+    # a factory: the client must be opened and closed on the test's own event loop
+    return lambda: AsyncAPI(server.url, *emulator.admin, *client_keypair(tmp_path), API_KEY, concurrency=2)
+
+
+async def test_async_client(connect):
+    async with connect() as api:
+        users = await api.users()
+        assert [user.username for user in users] == [f"user{i}@example.com" for i in range(3)]
+        assert [user async for user in api.iter_users()] == users
+        books, streamed = await asyncio.gather(api.books(), api.books("user1@example.com"))
+        assert streamed == books[2:4]
+        assert [book async for book in api.iter_books(gzip=False)] == books
+        with pytest.raises(RuntimeError, match="404"):
+            await api.trace("unknown")
+
+
+async def test_async_client_gather(connect):
+    async with connect() as api:
+        names = [f"async{i}@example.com" for i in range(5)]
+        added = await api.gather_add_users(
+            [dict(username=name, displayname="Async", password="async_password") for name in names]
+            + [dict(username="user0@example.com", displayname="Exists", password="async_password")]
+        )
+        assert [(r.username, r.success) for r in added] == [(name, True) for name in names] + [
+            ("user0@example.com", False)
+        ]
+        assert added[0].user.displayname == "Async"
+        assert added[-1].message == "RuntimeError"
+        deleted = await api.gather_delete_users([dict(username=name) for name in names[:2]])
+        assert all(r.success for r in deleted)
+        assert len(await api.users()) == 3 + 5 - 2
+        book, undescribed = await api.gather_add_books(
+            [
+                dict(username=names[2], bookname="async", description="async book"),
+                dict(username=names[3], bookname="bare"),
+            ]
+        )
+        assert book.success and book.token == book.book.token
+        assert undescribed.success and undescribed.book.description == ""
+        deleted = await api.gather_delete_books([dict(username=names[2], token=book.token)])
+        assert deleted[0].success
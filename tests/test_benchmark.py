@@ -0,0 +1,39 @@
+import json
+
+from click.testing import CliRunner
+
+from baikalctl import settings
+from baikalctl.browser import SessionConfig
+
+from .benchmark import OPERATIONS, benchmark
+
+
+def test_benchmark(tmp_path, monkeypatch):
+    # the benchmark configures the app globally; restore it for the tests that follow
+    for name in [
+        "BACKEND",
+        "POOL_SIZE",
+        "CACHE_TTL",
+        "JOBS",
+        "LIFECYCLE_INTERVAL",
+        "WARMUP_USERNAME",
+        "WARMUP_PASSWORD",
+    ]:
+        monkeypatch.setattr(settings, name, getattr(settings, name))
+    for name in ["url", "cert", "key", "api_key"]:
+        monkeypatch.setattr(SessionConfig, name, getattr(SessionConfig, name, None), raising=False)
+    output = tmp_path / "results.json"
+    result = CliRunner().invoke(benchmark, ["--users", "10", "--count", "3", "--output", str(output)])
+    assert result.exit_code == 0, result.output
+    report = json.loads(output.read_text())
+    assert [r["operation"] for r in report["results"]] == OPERATIONS
+    for r in report["results"]:
+        assert r["users"] == 10
+        assert r["count"] == 3
+        assert r["ops_per_sec"] > 0
+        assert r["p50_ms"] <= r["p95_ms"] <= r["p99_ms"] <= r["max_ms"]
+    result = CliRunner().invoke(
+        benchmark, ["--users", "10", "--count", "2", "-o", str(tmp_path / "b.json"), "-b", str(output)]
+    )
+    assert result.exit_code == 0, result.output
+    assert "compared to" in result.output
@@ -0,0 +1,235 @@
+import logging
+from urllib.parse import urljoin
+
+import pytest
+import requests
+from selenium.common.exceptions import NoSuchElementException
+
+from baikalctl import pages
+from baikalctl.browser import Session
+from baikalctl.exceptions import UnexpectedServerResponse
+from baikalctl.models import (
+    Account,
+    AddBookRequest,
+    AddUserRequest,
+    DeleteBookRequest,
+    DeleteUserRequest,
+)
+from baikalctl.navigation import PAGE_BUDGET, Navigator
+
+from .baikal_emulator import Emulator
+
+
+class SavedPageDriver:
+    """serves a saved admin page as page_source, counting the reads"""
+
+    def __init__(self, html):
+        self.html = html
+        self.reads = 0
+
+    @property
+    def page_source(self):
+        self.reads += 1
+        return self.html
+
+
+class EmulatorElement:
+    """a parsed element standing in for a webdriver element: links are followed and buttons submit their form"""
+
+    def __init__(self, driver, tag):
+        self.driver = driver
+        self.tag = tag
+
+    @property
+    def text(self):
+        return pages.text(self.tag).strip()
+
+    def get_attribute(self, name):
+        value = self.tag.get(name)
+        return " ".join(value) if isinstance(value, list) else value
+
+    def find_elements(self, by, selector):
+        return [EmulatorElement(self.driver, tag) for tag in self.tag.select(selector)]
+
+    def clear(self):
+        self.tag["value"] = ""
+
+    def send_keys(self, text):
+        self.tag["value"] = self.tag.get("value", "") + text
+
+    def click(self):
+        if self.tag.name == "a":
+            self.driver.get(urljoin(self.driver.current_url, self.tag["href"]))
+            return
+        form = self.tag.find_parent("form")
+        action, fields = pages.form(pages.parse(f"<body>{form}</body>"), self.driver.current_url)
+        self.driver.load("POST", action, data=fields)
+
+
+class EmulatorDriver:
+    """a webdriver stand-in loading the emulator's admin pages over http, counting every page load"""
+
+    def __init__(self):
+        self.client = requests.Session()
+        self.current_url = None
+        self.page = None
+        self.page_source = ""
+        self.loads = 0
+
+    @property
+    def title(self):
+        return pages.title(self.page)
+
+    def get(self, url):
+        self.load("GET", url)
+
+    def load(self, method, url, **kwargs):
+        response = self.client.request(method, url, **kwargs)
+        self.loads += 1
+        self.current_url = response.url
+        self.page_source = response.text
+        self.page = pages.parse(response.text)
+
+    def find_elements(self, by, selector):
+        return [EmulatorElement(self, tag) for tag in self.page.select(selector)]
+
+    def find_element(self, by, selector):
+        elements = self.find_elements(by, selector)
+        if not elements:
+            raise NoSuchElementException(selector)
+        return elements[0]
+
+
+def snapshot_session(html):
+    # the table readers use only the driver's page_source, so the session is built without starting firefox
+    session = Session.__new__(Session)
+    session.driver = SavedPageDriver(html)
+    session.nav = Navigator()
+    session.snapshot = (None, None)
+    session.logger = logging.getLogger(__name__)
+    return session
+
+
+def emulator_session(emulator):
+    session = snapshot_session("")
+    session.driver = EmulatorDriver()
+    session.url = emulator.url
+    session.logged_in = False
+    session.account = None
+    session.last_used = 0.0
+    session.login_ttl = 300
+    session.ops = 0
+    return session
+
+
+@pytest.fixture
+def users_page(shared_datadir):
+    return snapshot_session((shared_datadir / "users.html").read_text())
+
+
+@pytest.fixture
+def books_page(shared_datadir):
+    return snapshot_session((shared_datadir / "addressbooks.html").read_text())
+
+
+def test_browser_user_rows(users_page):
+    rows = users_page._table_rows("users")
+    assert [pages.parse_user_row(row) for row in rows] == [
+        dict(
+            username="alice@example.com",
+            displayname="Alice Liddell",
+            email="alice@example.com",
+            uri="https://dav.example.com/baikal/dav.php/principals/alice@example.com/",
+        ),
+        dict(
+            username="bob@example.com",
+            displayname="",
+            email="bob@example.com",
+            uri="https://dav.example.com/baikal/dav.php/principals/bob@example.com/",
+        ),
+    ]
+    assert users_page._row_action_buttons("user", rows[1]) == {
+        "Calendars": "/baikal/admin/?/users/calendars/2/",
+        "Address Books": "/baikal/admin/?/users/addressbooks/2/",
+        "Edit": "/baikal/admin/?/users/edit/2/#form",
+        "Delete": "/baikal/admin/?/users/delete/2/#message",
+    }
+    assert pages.navbar_links(users_page._snapshot())["Logout"] == "/baikal/admin/?/logout/"
+    # every read of the same page shares one page_source snapshot until the page changes
+    users_page._table_rows("users")
+    assert users_page.driver.reads == 1
+    users_page.nav.changed()
+    users_page._table_rows("users")
+    assert users_page.driver.reads == 2
+
+
+def test_browser_address_book_link(shared_datadir):
+    html = (shared_datadir / "users.html").read_text()
+    rows = pages.table_rows(pages.parse(html))
+    assert pages.address_book_link(rows[0]) == "/baikal/admin/?/users/addressbooks/1/"
+    html = html.replace('<a class="btn btn-mini" href="/baikal/admin/?/users/addressbooks/2/">', "<a>")
+    with pytest.raises(pages.PageParseFailure, match="bob@example.com"):
+        pages.address_book_link(pages.table_rows(pages.parse(html))[1])
+
+
+def test_browser_book_rows(books_page):
+    rows = books_page._table_rows("addressbooks")
+    assert [pages.parse_book_row(row) for row in rows] == [
+        dict(
+            bookname="Default Address Book",
+            contacts=12,
+            description="Default Address Book for alice",
+            uri="https://dav.example.com/baikal/dav.php/addressbooks/alice@example.com/default/",
+            token="default",
+        ),
+        dict(
+            bookname="Work",
+            contacts=0,
+            description="",
+            uri="https://dav.example.com/baikal/dav.php/addressbooks/alice@example.com/a1b2c3d4-work/",
+            token="a1b2c3d4-work",
+        ),
+    ]
+    assert books_page._row_action_buttons("addressbook", rows[1]) == {
+        "Edit": "/baikal/admin/?/users/addressbooks/1/edit/7/#form",
+        "Delete": "/baikal/admin/?/users/addressbooks/1/delete/7/#message",
+    }
+    assert books_page._check_popups() == ["Done\nAddress Book Work has been created."]
+    with pytest.raises(UnexpectedServerResponse, match="Done: Address Book Work has been created."):
+        books_page._check_popups(require_none=True)
+
+
+@pytest.fixture
+def emulator():
+    with Emulator(users=3, books=2) as emulator:
+        yield emulator
+
+
+def assert_budget(session, operation, *args):
+    loads, driver_loads = session.nav.loads, session.driver.loads
+    result = getattr(session, operation)(*args)
+    # every page the driver loaded, by navigation, click or submit, is counted by the navigator
+    assert session.nav.loads - loads == session.driver.loads - driver_loads <= PAGE_BUDGET[operation]
+    return result
+
+
+def test_browser_user_add_delete(emulator):
+    session = emulator_session(emulator)
+    admin = Account(username=emulator.admin[0], password=emulator.admin[1])
+    session.login(admin)
+    request = AddUserRequest(username="new@example.com", displayname="New User", password="new_password")
+    user = assert_budget(session, "add_user", admin, request)
+    assert user.username == request.username
+    assert_budget(session, "delete_user", admin, DeleteUserRequest(username=request.username))
+    assert request.username not in [u.username for u in session.users(admin)]
+
+
+def test_browser_book_add_delete(emulator):
+    session = emulator_session(emulator)
+    admin = Account(username=emulator.admin[0], password=emulator.admin[1])
+    session.login(admin)
+    request = AddBookRequest(username="user0@example.com", bookname="Contacts", description="shared contacts")
+    book = assert_budget(session, "add_book", admin, request)
+    assert book.token == "user0-example-com-contacts"
+    assert_budget(session, "delete_book", admin, DeleteBookRequest(username=book.username, token=book.token))
+    assert book.token not in [b.token for b in session.books(admin, book.username)]
@@ -0,0 +1,113 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from baikalctl.cache import ReadCache, SingleFlight
+from baikalctl.models import Account
+
+ADMIN = Account(username="admin", password="password")
+
+
+class Reader:
+    def __init__(self, value):
+        self.value = value
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.value
+
+
+@pytest.fixture
+def cache():
+    return ReadCache(ttl=60, size=2)
+
+
+def test_cache_hit_miss(cache):
+    read = Reader(["user"])
+    assert cache.get(("users",), ADMIN, read) == ["user"]
+    assert cache.get(("users",), ADMIN, read) == ["user"]
+    assert read.calls == 1
+    assert cache.status()["hits"] == 1
+    assert cache.status()["misses"] == 1
+
+
+def test_cache_unknown_account(cache):
+    read = Reader([])
+    cache.get(("books", "nobody"), ADMIN, read)
+    cache.get(("books", "nobody"), Account(username="admin", password="wrong_password"), read)
+    assert read.calls == 2
+
+
+def test_cache_invalidate(cache):
+    users, books = Reader(["user"]), Reader([])
+    cache.get(("users",), ADMIN, users)
+    cache.get(("books", "nobody"), ADMIN, books)
+    cache.invalidate(("books", "nobody"))
+    cache.get(("users",), ADMIN, users)
+    cache.get(("books", "nobody"), ADMIN, books)
+    assert (users.calls, books.calls) == (1, 2)
+    assert cache.status()["invalidations"] == 1
+
+
+def test_cache_invalidate_during_read(cache):
+    def read():
+        cache.invalidate(("users",))
+        return ["stale"]
+
+    assert cache.get(("users",), ADMIN, read) == ["stale"]
+    assert cache.status()["entries"] == 0
+
+
+def test_cache_bounded(cache):
+    for i in range(3):
+        cache.get(("books", i), ADMIN, Reader(i))
+    assert list(cache.entries) == [("books", 1), ("books", 2)]
+
+
+def test_cache_ttl():
+    cache = ReadCache(ttl=0.05, size=2)
+    read = Reader([])
+    cache.get(("users",), ADMIN, read)
+    time.sleep(0.1)
+    cache.get(("users",), ADMIN, read)
+    assert read.calls == 2
+    cache = ReadCache(ttl=0, size=2)
+    cache.get(("users",), ADMIN, read)
+    cache.get(("users",), ADMIN, read)
+    assert read.calls == 4
+
+
+def test_singleflight():
+    flights = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def crawl():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return ["user"]
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        leader = executor.submit(flights.do, "users", crawl)
+        started.wait(5)
+        followers = [executor.submit(flights.do, "users", crawl) for _ in range(7)]
+        while flights.status()["waiting"] < 7:
+            time.sleep(0.01)
+        release.set()
+        results = [f.result() for f in [leader] + followers]
+    assert results == [["user"]] * 8
+    assert len(calls) == 1
+    status = flights.status()
+    assert (status["executions"], status["coalesced"], status["waiting"]) == (1, 7, 0)
+    assert status["coalescing_ratio"] == 7 / 8
+
+
+def test_singleflight_error():
+    flights = SingleFlight()
+    with pytest.raises(ValueError):
+        flights.do("users", lambda: int("x"))
+    assert flights.do("users", lambda: 1) == 1
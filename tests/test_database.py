@@ -0,0 +1,95 @@
+import hashlib
+
+import pytest
+import yaml
+
+from baikalctl.database import DatabaseSession, create_database, digest
+from baikalctl.exceptions import AddFailed, BrowserInterfaceFailure, DeleteFailed
+from baikalctl.models import (
+    Account,
+    AddBookRequest,
+    AddUserRequest,
+    DeleteBookRequest,
+    DeleteUserRequest,
+)
+
+REALM = "BaikalDAV"
+ADMIN_PASSWORD = "admin_password"
+
+
+@pytest.fixture
+def baikal_config(tmp_path):
+    db = tmp_path / "db.sqlite"
+    create_database(str(db))
+    config = tmp_path / "baikal.yaml"
+    admin_hash = hashlib.sha256(f"admin:{REALM}:{ADMIN_PASSWORD}".encode()).hexdigest()
+    config.write_text(
+        yaml.safe_dump(
+            dict(
+                system=dict(auth_realm=REALM, admin_passwordhash=admin_hash),
+                database=dict(sqlite_file=str(db), backend="sqlite"),
+            )
+        )
+    )
+    return config
+
+
+@pytest.fixture
+def session(baikal_config):
+    session = DatabaseSession(
+        url="http://localhost/baikal", cert="", key="", api_key="test_api_key", baikal_config=str(baikal_config)
+    )
+    yield session
+    session.shutdown()
+
+
+@pytest.fixture
+def admin():
+    return Account(username="admin", password=ADMIN_PASSWORD)
+
+
+def test_database_login(session, admin):
+    session.login(admin)
+    with pytest.raises(BrowserInterfaceFailure):
+        session.login(Account(username="admin", password="bad_password"))
+
+
+def test_database_users(session, admin):
+    request = AddUserRequest(username="user@example.com", displayname="Some User", password="user_password")
+    user = session.add_user(admin, request)
+    assert user.uri == "http://localhost/baikal/dav.php/principals/user@example.com/"
+    assert user.email == "user@example.com"
+    assert session.users(admin) == [user]
+    rows = session._query("SELECT digesta1 FROM users WHERE username = ?", user.username)
+    assert rows == [(digest(user.username, REALM, "user_password"),)]
+    with pytest.raises(AddFailed):
+        session.add_user(admin, request)
+
+    books = session.books(admin, user.username)
+    assert [b.token for b in books] == ["default"]
+
+    session.delete_user(admin, DeleteUserRequest(username=user.username))
+    assert session.users(admin) == []
+    assert session._query("SELECT COUNT(*) FROM addressbooks") == [(0,)]
+    assert session._query("SELECT COUNT(*) FROM calendarinstances") == [(0,)]
+    with pytest.raises(DeleteFailed):
+        session.delete_user(admin, DeleteUserRequest(username=user.username))
+
+
+def test_database_books(session, admin):
+    session.add_user(admin, AddUserRequest(username="user@example.com", displayname="user", password="password"))
+    request = AddBookRequest(username="user@example.com", bookname="Contacts", description="shared contacts")
+    book = session.add_book(admin, request)
+    assert book.token == "user-example-com-contacts"
+    assert book.uri == "http://localhost/baikal/dav.php/addressbooks/user@example.com/user-example-com-contacts/"
+    assert book.description == "shared contacts"
+    assert book in session.books(admin, "user@example.com")
+    with pytest.raises(AddFailed):
+        session.add_book(admin, request)
+    with pytest.raises(AddFailed):
+        session.add_book(admin, AddBookRequest(username="nobody@example.com", bookname="x", description=""))
+
+    session.delete_book(admin, DeleteBookRequest(username=book.username, token=book.token))
+    assert book.token not in [b.token for b in session.books(admin, book.username)]
+    with pytest.raises(DeleteFailed):
+        session.delete_book(admin, DeleteBookRequest(username=book.username, token=book.token))
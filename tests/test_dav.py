@@ -0,0 +1,50 @@
+import pytest
+
+from baikalctl.dav import DavClient
+from baikalctl.exceptions import UnexpectedServerResponse
+
+from .baikal_emulator import Emulator
+
+
+@pytest.fixture
+def emulator():
+    with Emulator(users=2, books=3) as emulator:
+        for user in emulator.users.values():
+            for i, book in enumerate(user["books"].values()):
+                book["contacts"] = i
+        yield emulator
+
+
+@pytest.fixture
+def dav(emulator):
+    dav = DavClient(emulator.url, "user0@example.com", "password", auth="basic", count_contacts=True)
+    yield dav
+    dav.shutdown()
+
+
+def test_dav_books(dav, emulator):
+    books = dav.books("user1@example.com")
+    assert [b.token for b in books] == ["default", "book-0", "book-1", "book-2"]
+    assert [b.contacts for b in books] == [0, 1, 2, 3]
+    assert books[1].bookname == "book 0"
+    assert books[1].description == "generated book 0"
+    assert books[1].username == "user1@example.com"
+    assert books[1].uri == f"{emulator.url}/dav.php/addressbooks/user1@example.com/book-0/"
+
+
+def test_dav_books_uncounted(emulator):
+    dav = DavClient(emulator.url, "user0@example.com", "password", auth="basic")
+    books = dav.books("user1@example.com")
+    assert [b.token for b in books] == ["default", "book-0", "book-1", "book-2"]
+    assert [b.contacts for b in books] == [0, 0, 0, 0]
+    dav.shutdown()
+
+
+def test_dav_books_unknown_user(dav):
+    assert dav.books("nobody@example.com") == []
+
+
+def test_dav_unauthorized(emulator):
+    dav = DavClient(emulator.url, "user0@example.com", "bad_password", auth="basic")
+    with pytest.raises(UnexpectedServerResponse):
+        dav.books("user1@example.com")
@@ -0,0 +1,179 @@
+import pytest
+
+from baikalctl.exceptions import (
+    AddFailed,
+    BrowserInterfaceFailure,
+    DeleteFailed,
+    InitFailed,
+    UnexpectedServerResponse,
+)
+from baikalctl.forms import FormSession
+from baikalctl.metrics import REGISTRY
+from baikalctl.models import (
+    Account,
+    AddBookRequest,
+    AddUserRequest,
+    DeleteBookRequest,
+    DeleteUserRequest,
+)
+from baikalctl.navigation import PAGE_BUDGET
+
+from .baikal_emulator import Emulator
+
+
+@pytest.fixture
+def emulator():
+    with Emulator(users=3, books=2) as emulator:
+        yield emulator
+
+
+@pytest.fixture
+def admin(emulator):
+    return Account(username=emulator.admin[0], password=emulator.admin[1])
+
+
+def form_session(emulator):
+    return FormSession(url=emulator.url, cert="", key="", api_key="test_api_key", log_level="DEBUG")
+
+
+@pytest.fixture
+def session(emulator):
+    session = form_session(emulator)
+    yield session
+    session.shutdown()
+
+
+def test_forms_login(session, admin):
+    def logouts():
+        return REGISTRY.get_sample_value("baikalctl_logouts_total", dict(backend="forms")) or 0
+
+    session.login(admin)
+    assert session.logged_in == admin.username
+    count = logouts()
+    session.logout()
+    assert not session.logged_in
+    # only a logout that ends a login is counted
+    session.logout()
+    assert logouts() == count + 1
+    with pytest.raises(UnexpectedServerResponse):
+        session.login(Account(username="admin", password="bad_password"))
+
+
+def test_forms_login_server_session(session, admin):
+    session.login(admin)
+    # the client forgets its login while the server cookie stays valid
+    session.logged_in = False
+    session.account = None
+    with pytest.raises(UnexpectedServerResponse):
+        session.login(Account(username="admin", password="bad_password"))
+    assert not session.logged_in
+    session.login(admin)
+    assert session.logged_in == admin.username
+
+
+def test_forms_login_cache(session, admin, emulator):
+    session.users(admin)
+    loads = session.page_loads
+    session.login(admin)
+    assert session.page_loads == loads
+
+    # a dropped server session is detected and the login repeated transparently
+    emulator.cookies.clear()
+    assert len(session.users(admin)) == 3
+    assert session.logged_in == admin.username
+
+    # an idle login expires
+    session.last_used -= session.login_ttl
+    loads = session.page_loads
+    session.login(admin)
+    assert session.page_loads > loads
+
+
+def test_forms_users(session, admin):
+    users = session.users(admin)
+    assert [u.username for u in users] == ["user0@example.com", "user1@example.com", "user2@example.com"]
+    assert users[1].displayname == "User 1"
+    assert users[1].uri.endswith("/dav.php/principals/user1@example.com/")
+    assert users[1].email == "user1@example.com"
+
+
+def test_forms_books(session, admin):
+    books = session.books(admin, "user2@example.com")
+    assert [b.token for b in books] == ["default", "book-0", "book-1"]
+    assert books[1].bookname == "book 0"
+    assert books[1].description == "generated book 0"
+    assert books[1].username == "user2@example.com"
+    assert session.books(admin, "nobody@example.com") == []
+
+
+def test_forms_book_links(session, admin):
+    links = session.book_links(admin)
+    assert list(links) == [f"user{i}@example.com" for i in range(3)]
+    loads = session.page_loads
+    for username, href in links.items():
+        assert session.books_at(admin, username, href) == session.books(admin, username)
+    # books_at loads one page; books also loads the users page to find the user's row
+    assert session.page_loads - loads == 3 * (1 + 2)
+
+
+def test_forms_navigation(session, admin):
+    session.users(admin)
+    loads, avoided = session.page_loads, session.nav.avoided
+    session.users(admin)
+    # a new operation reloads the users page, which another session may have changed
+    assert session.page_loads - loads == 1
+    session._find_user_row("user1@example.com")
+    session._find_user_row("user2@example.com")
+    assert session.page_loads - loads == 1
+    assert session.nav.avoided - avoided == 2
+
+
+def test_forms_user_add_delete(session, admin):
+    request = AddUserRequest(username="new@example.com", displayname="New User", password="new_password")
+    session.login(admin)
+    loads = session.page_loads
+    user = session.add_user(admin, request)
+    assert session.page_loads - loads <= PAGE_BUDGET["add_user"]
+    assert user.username == request.username
+    assert user.displayname == request.displayname
+    with pytest.raises(AddFailed):
+        session.add_user(admin, request)
+    loads = session.page_loads
+    session.delete_user(admin, DeleteUserRequest(username=request.username))
+    assert session.page_loads - loads <= PAGE_BUDGET["delete_user"]
+    assert request.username not in [u.username for u in session.users(admin)]
+    with pytest.raises(DeleteFailed):
+        session.delete_user(admin, DeleteUserRequest(username=request.username))
+
+
+def test_forms_book_add_delete(session, admin):
+    request = AddBookRequest(username="user0@example.com", bookname="Contacts", description="shared contacts")
+    session.login(admin)
+    loads = session.page_loads
+    book = session.add_book(admin, request)
+    assert session.page_loads - loads <= PAGE_BUDGET["add_book"]
+    assert book.token == "user0-example-com-contacts"
+    assert book.bookname == "contacts"
+    with pytest.raises(AddFailed):
+        session.add_book(admin, request)
+    loads = session.page_loads
+    session.delete_book(admin, DeleteBookRequest(username=book.username, token=book.token))
+    assert session.page_loads - loads <= PAGE_BUDGET["delete_book"]
+    assert book.token not in [b.token for b in session.books(admin, book.username)]
+    with pytest.raises(DeleteFailed):
+        session.delete_book(admin, DeleteBookRequest(username=book.username, token=book.token))
+    with pytest.raises(AddFailed):
+        session.add_book(admin, AddBookRequest(username="nobody@example.com", bookname="Contacts"))
+
+
+def test_forms_initialize():
+    with Emulator(initialized=False) as emulator:
+        session = form_session(emulator)
+        admin = Account(username="admin", password="new_admin_password")
+        with pytest.raises(BrowserInterfaceFailure):
+            session.login(admin)
+        assert session.initialize(admin) == dict(message="initialized")
+        with pytest.raises(InitFailed):
+            session.initialize(admin)
+        session.login(admin)
+        session.shutdown()
@@ -0,0 +1,114 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from baikalctl.jobs import JOBS_SCHEMA, JobQueue
+from baikalctl.models import Account
+
+ADMIN = Account(username="admin", password="admin_password")
+
+
+@pytest.fixture
+def filename(tmp_path):
+    return tmp_path / "jobs.db"
+
+
+def run(action, payload, account):
+    if action == "fail":
+        raise ValueError("bad request")
+    return dict(message=f"{action} {payload['username']} as {account.username}")
+
+
+def test_jobs_run(filename):
+    queue = JobQueue(filename)
+    queue.start(run)
+    try:
+        job = queue.submit("add_user", dict(username="user@example.com"), ADMIN)
+        assert job.state in ["queued", "running", "done"]
+        job = queue.wait(job.id, 5)
+        assert job.state == "done"
+        assert job.result == dict(message="add_user user@example.com as admin")
+        assert job.run_seconds >= 0
+        failed = queue.wait(queue.submit("fail", dict(username="x"), ADMIN).id, 5)
+        assert failed.state == "failed"
+        assert failed.error == "ValueError: bad request"
+        assert queue.status()["done"] == 1
+        assert queue.status()["failed"] == 1
+        assert queue.get("unknown") is None
+    finally:
+        queue.shutdown()
+
+
+def test_jobs_survive_restart(filename):
+    queue = JobQueue(filename)
+    ids = [queue.submit("add_user", dict(username=f"user{i}@example.com"), ADMIN).id for i in range(3)]
+    # a job claimed when the server stopped runs again
+    queue._claim()
+    assert queue.status()["depth"] == queue.depth() == 2
+    queue = JobQueue(filename)
+    assert queue.status()["depth"] == queue.depth() == 3
+    order = []
+    done = threading.Event()
+
+    def record(action, payload, account):
+        order.append(payload["username"])
+        if len(order) == 3:
+            done.set()
+        return {}
+
+    queue.start(record)
+    try:
+        assert done.wait(5)
+        assert order == [f"user{i}@example.com" for i in range(3)]
+        assert all(queue.wait(id, 5).state == "done" for id in ids)
+    finally:
+        queue.shutdown()
+    assert oct(filename.stat().st_mode & 0o777) == "0o600"
+
+
+def stored_accounts(filename):
+    with sqlite3.connect(filename) as db:
+        return dict(db.execute("SELECT id, account FROM jobs").fetchall())
+
+
+def test_jobs_forget_credentials(filename):
+    queue = JobQueue(filename, retention=60)
+    queue.start(run)
+    try:
+        queued = queue.submit("add_user", dict(username="user@example.com"), ADMIN)
+        assert queue.wait(queued.id, 5).state == "done"
+        failed = queue.wait(queue.submit("fail", dict(username="x"), ADMIN).id, 5)
+        assert failed.state == "failed"
+        assert stored_accounts(filename) == {queued.id: None, failed.id: None}
+    finally:
+        queue.shutdown()
+    with sqlite3.connect(filename) as db:
+        db.execute("UPDATE jobs SET finished=? WHERE id=?", (time.time() - 120, queued.id))
+    # finished jobs older than the retention are deleted when the queue starts, and then periodically
+    queue = JobQueue(filename, retention=60, purge_interval=0.05)
+    assert list(stored_accounts(filename)) == [failed.id]
+    assert queue.get(queued.id) is None
+    queue.start(run)
+    try:
+        with sqlite3.connect(filename) as db:
+            db.execute("UPDATE jobs SET finished=? WHERE id=?", (time.time() - 120, failed.id))
+        deadline = time.monotonic() + 5
+        while stored_accounts(filename) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert stored_accounts(filename) == {}
+    finally:
+        queue.shutdown()
+
+
+def test_jobs_migrate_account_column(filename):
+    with sqlite3.connect(filename) as db:
+        db.executescript(JOBS_SCHEMA.replace("account text,", "account text NOT NULL,"))
+        db.execute(
+            "INSERT INTO jobs (id, action, payload, account, state, created, finished) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            ("old", "add_user", "{}", ADMIN.model_dump_json(), "done", time.time(), time.time()),
+        )
+    queue = JobQueue(filename)
+    assert stored_accounts(filename) == {"old": None}
+    assert queue.get("old").state == "done"
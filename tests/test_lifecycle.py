@@ -0,0 +1,114 @@
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from baikalctl.browser import Session
+from baikalctl.lifecycle import DriverManager, process_tree, rss
+from baikalctl.pool import SessionPool
+
+
+class FakeDriverSession:
+    api_key = "fake_api_key"
+    account = None
+
+    def __init__(self, index=0, **kwargs):
+        self.index = index
+        self.driver = object()
+        self.ops = 0
+        self.responsive = True
+        self.recycled = []
+
+    def ping(self, timeout):
+        return self.responsive
+
+    def driver_pids(self):
+        return [os.getpid()]
+
+    def recycle(self, reason):
+        self.recycled.append(reason)
+        self.ops = 0
+        self.responsive = True
+
+    def shutdown(self):
+        pass
+
+
+@pytest.fixture
+def pool():
+    pool = SessionPool(3, timeout=1, factory=FakeDriverSession)
+    yield pool
+    pool.shutdown()
+
+
+def test_process_tree():
+    child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    try:
+        pids = process_tree(os.getpid())
+        assert pids[0] == os.getpid()
+        assert child.pid in pids
+        assert rss([child.pid]) > 0
+        assert rss(pids) > rss([child.pid])
+    finally:
+        child.kill()
+        child.wait()
+    assert rss([child.pid]) == 0
+
+
+def test_lifecycle_recycle(pool):
+    manager = DriverManager(pool, interval=60, max_ops=10, max_rss_mb=0)
+    hung, worn, fine = pool.sessions
+    hung.responsive = False
+    worn.ops = 10
+    fine.ops = 9
+    manager.check()
+    assert hung.recycled == ["hung"]
+    assert worn.recycled == ["ops"]
+    assert fine.recycled == []
+    assert manager.status()["recycles"] == dict(hung=1, ops=1)
+    assert manager.status()["sessions"][fine.index]["ops"] == 9
+    assert len(pool.idle) == 3
+
+
+def test_lifecycle_rss_and_busy(pool):
+    manager = DriverManager(pool, interval=60, max_rss_mb=1)
+    with pool.session() as busy:
+        manager.check()
+    assert busy.recycled == []
+    assert [s.recycled for s in pool.sessions if s is not busy] == [["rss"], ["rss"]]
+    unstarted = pool.sessions[0]
+    unstarted.driver = None
+    unstarted.recycled.clear()
+    manager.check()
+    assert unstarted.recycled == []
+
+
+class HungDriver:
+    def __init__(self):
+        self.release = threading.Event()
+        self.calls = 0
+
+    @property
+    def current_url(self):
+        self.calls += 1
+        self.release.wait()
+        return "about:blank"
+
+
+def test_ping_hung_driver():
+    # ping needs only the driver and index, so the browser session is built without starting firefox
+    session = Session.__new__(Session)
+    session.index = 0
+    session.pinging = None
+    session.driver = HungDriver()
+    try:
+        assert session.ping(0.05) is False
+        assert session.ping(0.05) is False
+        assert session.driver.calls == 1
+        assert len([t for t in threading.enumerate() if t.name == "ping-0"]) == 1
+        session.driver.release.set()
+        assert session.ping(1) is True
+    finally:
+        session.driver.release.set()
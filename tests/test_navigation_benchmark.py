@@ -0,0 +1,63 @@
+import logging
+import statistics
+import time
+from pathlib import Path
+
+import pytest
+
+from baikalctl import settings
+from baikalctl.browser import Session, SessionConfig
+from baikalctl.firefox_profile import FIREFOX
+from baikalctl.models import Account
+from baikalctl.navigation import ADMIN_PAGE, USERS_PAGE
+
+from .baikal_emulator import Emulator
+
+logger = logging.getLogger(__name__)
+
+NAVIGATIONS = 20
+ASSET_LATENCY = 0.02
+
+pytestmark = pytest.mark.skipif(not Path(FIREFOX).exists(), reason="firefox is not installed")
+
+
+def navigation_latency(tmp_path, monkeypatch, lean):
+    """per-navigation seconds and asset requests for alternating admin page loads by a logged in session"""
+    with Emulator(users=20, books=1, asset_latency=ASSET_LATENCY) as emulator:
+        config = dict(
+            url=emulator.url,
+            cert="",
+            key="",
+            api_key="benchmark",
+            lean=lean,
+            profile_name="benchmark",
+            profile_dir=str(tmp_path / ("lean" if lean else "default")),
+            profile_create_timeout=settings.PROFILE_CREATE_TIMEOUT,
+            profile_stabilize_time=settings.PROFILE_STABILIZE_TIME,
+        )
+        for name, value in config.items():
+            monkeypatch.setattr(SessionConfig, name, value, raising=False)
+        session = Session()
+        try:
+            session.login(Account(username=emulator.admin[0], password=emulator.admin[1]))
+            assets = emulator.asset_requests
+            latencies = []
+            for i in range(NAVIGATIONS):
+                start = time.perf_counter()
+                session._get(USERS_PAGE if i % 2 else ADMIN_PAGE)
+                latencies.append(time.perf_counter() - start)
+            return latencies, emulator.asset_requests - assets
+        finally:
+            session.shutdown()
+
+
+def test_navigation_benchmark(tmp_path, monkeypatch):
+    results = {}
+    for lean in [False, True]:
+        results["lean" if lean else "default"] = navigation_latency(tmp_path, monkeypatch, lean)
+    for mode, (latencies, assets) in results.items():
+        logger.warning(
+            f"{mode}: {NAVIGATIONS} navigations median={statistics.median(latencies) * 1000:.1f}ms "
+            f"max={max(latencies) * 1000:.1f}ms asset_requests={assets}"
+        )
+    assert results["lean"][1] < results["default"][1]
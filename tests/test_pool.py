@@ -0,0 +1,86 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from baikalctl.pool import PoolTimeout, SessionPool
+
+
+class FakeSession:
+    api_key = "fake_api_key"
+    account = None
+
+    def __init__(self, index=0, **kwargs):
+        self.index = index
+        self.resets = 0
+        self.closed = False
+
+    def reset(self, admin):
+        self.resets += 1
+
+    def warm(self, admin=None):
+        self.warmed = admin
+
+    def shutdown(self):
+        self.closed = True
+
+
+@pytest.fixture
+def pool():
+    pool = SessionPool(3, timeout=1, factory=FakeSession)
+    yield pool
+    pool.shutdown()
+
+
+def test_pool_checkout(pool):
+    assert [s.index for s in pool.sessions] == [0, 1, 2]
+    assert pool.api_key == FakeSession.api_key
+    assert pool.status() == dict(size=3, checked_out=0, idle=3, waiting=0)
+    with pool.session() as one:
+        with pool.session() as two:
+            assert one is not two
+            assert pool.status()["checked_out"] == 2
+    assert pool.status()["idle"] == 3
+
+
+def test_pool_account_affinity(pool):
+    with pool.session() as session:
+        session.account = "admin"
+        index = session.index
+    with pool.session(account="other") as session:
+        assert session.index != index
+    with pool.session(account="admin") as session:
+        assert session.index == index
+
+
+def test_pool_timeout(pool):
+    sessions = [pool.checkout() for _ in range(pool.size)]
+    with pytest.raises(PoolTimeout):
+        pool.checkout(timeout=0.1)
+    for session in sessions:
+        pool.checkin(session)
+    with pytest.raises(RuntimeError):
+        pool.checkin(sessions[0])
+
+
+def test_pool_concurrent(pool):
+    def work(_):
+        with pool.session() as session:
+            return session.index
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        indexes = list(executor.map(work, range(32)))
+    assert set(indexes) <= {0, 1, 2}
+    assert pool.status() == dict(size=3, checked_out=0, idle=3, waiting=0)
+
+
+def test_pool_reset_shutdown(pool):
+    pool.reset(None)
+    assert [s.resets for s in pool.sessions] == [1, 1, 1]
+    pool.shutdown()
+    assert all(s.closed for s in pool.sessions)
+
+
+def test_pool_warm(pool):
+    pool.warm("admin")
+    assert [s.warmed for s in pool.sessions] == ["admin"] * 3
+    assert pool.status()["idle"] == 3
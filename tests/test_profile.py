@@ -3,7 +3,16 @@ import logging
 import pytest
 
 from baikalctl import settings
-from baikalctl.firefox_profile import Profile, countFiles, run
+from baikalctl.firefox_profile import (
+    FINGERPRINT_FILE,
+    Profile,
+    commonName,
+    countFiles,
+    fingerprint,
+    loadCert,
+    pkcs12Bundle,
+    run,
+)
 
 logger = logging.getLogger(__name__)
 logger.setLevel("DEBUG")
@@ -42,3 +51,30 @@ def test_profile_create(shared_datadir, keypair):
         logger.info(f"after[{i}]: {cert}")
 
     assert len(after) == len(before) + 1
+
+
+def test_profile_fingerprint(shared_datadir, keypair):
+    pem, key = keypair
+    dir = shared_datadir / "profile"
+    dir.mkdir()
+    for name in ["cert9.db", "key4.db", "prefs.js"]:
+        (dir / name).touch()
+    (dir / FINGERPRINT_FILE).write_text(fingerprint(pem, key))
+    # a current profile is used as is, without running firefox or the NSS tools
+    profile = Profile("test", dir, 1, 1, logger, cert=pem, key=key)
+    assert profile.current()
+    clone = Profile("test", shared_datadir / "profile.1", 1, 1, logger, template=dir, cert=pem, key=key)
+    assert clone.current()
+    assert (clone.dir / "cert9.db").is_file()
+    key.write_text(key.read_text() + "\n")
+    assert fingerprint(pem, key) != profile.fingerprint
+
+
+def test_cert_in_process(shared_datadir, keypair):
+    pem, key = keypair
+    assert commonName(pem) == "test_client_certificate"
+    p12 = shared_datadir / "test.p12"
+    p12.write_bytes(pkcs12Bundle(pem, key, "test"))
+    assert commonName(p12) == "test_client_certificate"
+    certificate, private_key = loadCert(p12)
+    assert private_key is not None
@@ -0,0 +1,51 @@
+from baikalctl.models import Book, DesiredState
+from baikalctl.reconcile import describe, estimate_page_loads, plan
+
+CURRENT = {
+    "user0@example.com": [
+        Book(username="user0@example.com", bookname="default", token="default"),
+        Book(username="user0@example.com", bookname="contacts", token="user0-example-com-contacts"),
+    ],
+    "user1@example.com": [Book(username="user1@example.com", bookname="default", token="default")],
+}
+
+STATE = dict(
+    users=[
+        dict(
+            username="user0@example.com",
+            password="user0_password",
+            books=[dict(bookname="contacts"), dict(bookname="Family")],
+        ),
+        dict(username="new@example.com", password="new_password", books=[dict(bookname="contacts")]),
+    ]
+)
+
+
+def actions(steps):
+    return [(step.action, step.username, step.token) for step in describe(steps)]
+
+
+def test_reconcile_plan():
+    steps = plan(DesiredState(**STATE), CURRENT)
+    assert actions(steps) == [
+        ("add_book", "user0@example.com", "user0-example-com-family"),
+        ("add_user", "new@example.com", None),
+        ("add_book", "new@example.com", "new-example-com-contacts"),
+    ]
+    assert estimate_page_loads(steps, len(CURRENT)) == 1 + 2 + 3 + 2 + 3
+
+
+def test_reconcile_prune():
+    steps = plan(DesiredState(prune=True, **STATE), CURRENT)
+    assert actions(steps)[:1] == [("delete_user", "user1@example.com", None)]
+    assert len(steps) == 4
+    state = DesiredState(prune=True, users=[dict(username="user0@example.com", password="password", books=[])])
+    assert actions(plan(state, CURRENT)) == [
+        ("delete_user", "user1@example.com", None),
+        ("delete_book", "user0@example.com", "user0-example-com-contacts"),
+    ]
+
+
+def test_reconcile_converged():
+    state = DesiredState(users=[dict(username="user0@example.com", password="password", books=[])])
+    assert plan(state, CURRENT) == []